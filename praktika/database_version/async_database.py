@@ -0,0 +1,107 @@
+"""Асинхронный интерфейс к DatabaseManager
+
+Синхронные методы выполняются в отдельных пулах потоков: один поток для записи
+(SQLite допускает одного писателя) и несколько потоков для чтения, поэтому
+цикл событий asyncio не блокируется.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DatabaseManager
+
+WRITE_METHODS = (
+    'add_customer', 'update_customer', 'delete_customer',
+    'add_product', 'update_product', 'delete_product',
+    'create_order', 'create_orders_bulk', 'update_order_status', 'update_order_statuses', 'delete_order',
+    'rebuild_summaries', 'clear_database', 'fill_test_data',
+)
+
+READ_METHODS = (
+    'get_all_customers', 'get_customer_by_id', 'search_customers',
+    'get_all_products', 'get_product_by_id', 'search_products',
+    'get_all_orders', 'get_orders_by_customer',
+    'get_popular_products', 'get_average_order_value', 'get_total_revenue',
+    'get_orders_count', 'get_customers_count', 'get_products_count',
+    'get_best_customer', 'get_top_customers', 'get_orders_by_month', 'get_revenue_by_month',
+    'get_period_totals', 'get_orders_by_period', 'get_revenue_by_period',
+    'get_dashboard_snapshot', 'check_summaries',
+)
+
+_END = object()
+
+
+class AsyncDatabaseManager:
+    """Awaitable-версии методов DatabaseManager.
+
+    Отмена корутины до начала выполнения снимает задачу из очереди. Уже начатая
+    операция доводится до конца в своем потоке: транзакция либо фиксируется
+    целиком, либо откатывается, но никогда не остается наполовину выполненной.
+    """
+
+    def __init__(self, db_name="orders.db", readers=4, **kwargs):
+        kwargs.setdefault('pool_size', readers + 1)
+        self.db = DatabaseManager(db_name, **kwargs)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+
+    async def _run(self, executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, lambda: func(*args, **kwargs))
+
+    async def _iterate(self, generator):
+        pending = None
+        try:
+            while True:
+                pending = self._readers.submit(next, generator, _END)
+                item = await asyncio.wrap_future(pending)
+                if item is _END:
+                    return
+                yield item
+        finally:
+            # Между страницами генератор не держит соединение, закрытие мгновенное.
+            # При отмене во время чтения страницы next() еще выполняется в потоке:
+            # генератор закрывается в том же потоке, когда next() завершится
+            if pending is not None and not pending.done():
+                pending.add_done_callback(lambda _: generator.close())
+            else:
+                generator.close()
+
+    def iter_customers(self, batch_size=500):
+        return self._iterate(self.db.iter_customers(batch_size))
+
+    def iter_products(self, batch_size=500):
+        return self._iterate(self.db.iter_products(batch_size))
+
+    def iter_orders(self, batch_size=500, with_products=True):
+        return self._iterate(self.db.iter_orders(batch_size, with_products))
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+def _async_method(name, write):
+    async def method(self, *args, **kwargs):
+        executor = self._writer if write else self._readers
+        return await self._run(executor, getattr(self.db, name), *args, **kwargs)
+    method.__name__ = name
+    method.__qualname__ = f"AsyncDatabaseManager.{name}"
+    method.__doc__ = getattr(DatabaseManager, name).__doc__
+    return method
+
+
+for _name in WRITE_METHODS:
+    setattr(AsyncDatabaseManager, _name, _async_method(_name, write=True))
+for _name in READ_METHODS:
+    setattr(AsyncDatabaseManager, _name, _async_method(_name, write=False))
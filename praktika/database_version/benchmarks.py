@@ -0,0 +1,1001 @@
+"""Бенчмарки DatabaseManager
+
+Запуск: python benchmarks.py <бенчмарк> [--ops N]
+Полный прогон горячих путей с сохранением в JSON:
+    python benchmarks.py suite [--compare benchmark_results/<прошлый прогон>.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from async_database import AsyncDatabaseManager
+from connection_pool import PROFILES
+from data_generator import format_report, generate_data
+from database import DatabaseManager
+from instrumentation import percentile
+from order_intake import OrderIntake
+from numpy_analytics import DEFAULT_EDGES, DEFAULT_PERCENTILES, _python_distribution, order_value_distribution
+from parallel_analytics import ParallelAnalytics
+from summaries import SUMMARY_SOURCES
+
+
+def _measure(func, ops):
+    """Возвращает количество операций в секунду"""
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    elapsed = time.perf_counter() - start
+    return ops / elapsed if elapsed > 0 else float('inf')
+
+
+def _temp_db_path(name):
+    return os.path.join(tempfile.mkdtemp(prefix="praktika_bench_"), name)
+
+
+def _seed_orders(db, orders, customers=1000, products=500, items_per_order=3, seed=42):
+    """Быстрое заполнение БД заказами напрямую через executemany"""
+    rng = random.Random(seed)
+    with db.connection() as conn:
+        conn.executemany(
+            "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?)",
+            ((f"Клиент {i}", f"client{i}@example.com", "") for i in range(customers))
+        )
+        prices = [rng.randint(100, 50000) for _ in range(products)]
+        conn.executemany(
+            "INSERT INTO products (name, price, quantity) VALUES (?, ?, ?)",
+            ((f"Товар {i}", price, 1000000) for i, price in enumerate(prices))
+        )
+        conn.executemany(
+            "INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
+            ((rng.randint(1, customers), rng.randint(100, 100000),
+              rng.choice(('pending', 'completed', 'cancelled'))) for _ in range(orders))
+        )
+        lines = ((order_id, rng.randint(1, products), rng.randint(1, 3))
+                 for order_id in range(1, orders + 1) for _ in range(items_per_order))
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total) VALUES (?, ?, ?, ?, ?)",
+            ((order_id, product_id, quantity, prices[product_id - 1], prices[product_id - 1] * quantity)
+             for order_id, product_id, quantity in lines)
+        )
+        conn.commit()
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_pool(args):
+    """Пул соединений против открытия соединения на каждый вызов"""
+    ops = args.ops
+    db = DatabaseManager(_temp_db_path("pool.db"))
+    product_ids = [db.add_product(f"Товар {i}", 100 + i, 10) for i in range(100)]
+
+    def connect_per_call(i):
+        # Поведение DatabaseManager до появления пула
+        conn = sqlite3.connect(db.db_name)
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM products WHERE id = ?", (product_ids[i % 100],))
+        cursor.fetchone()
+        conn.close()
+
+    def pooled(i):
+        db.get_product_by_id(product_ids[i % 100])
+
+    before = _measure(connect_per_call, ops)
+    after = _measure(pooled, ops)
+    db.close()
+
+    print(f"get_product_by_id, {ops} операций")
+    print(f"   Соединение на вызов: {before:,.0f} оп/с")
+    print(f"   Пул соединений:      {after:,.0f} оп/с")
+    print(f"   Ускорение: x{after / before:.1f}")
+
+
+def _legacy_get_all_orders(db):
+    """get_all_orders до исправления N+1: отдельный запрос товаров на каждый заказ"""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT o.id, o.customer_id, o.total_amount, o.status, o.created_date, c.name
+            FROM orders o
+            JOIN customers c ON o.customer_id = c.id
+            ORDER BY o.created_date DESC
+        ''')
+        orders = []
+        for row in cursor.fetchall():
+            cursor.execute('''
+                SELECT p.name, oi.quantity, p.price
+                FROM order_items oi
+                JOIN products p ON oi.product_id = p.id
+                WHERE oi.order_id = ?
+            ''', (row[0],))
+            products = [{'name': r[0], 'quantity': r[1], 'price': r[2]} for r in cursor.fetchall()]
+            orders.append({'id': row[0], 'products': products})
+        return orders
+
+
+def bench_orders(args):
+    """Загрузка всех заказов: N+1 запросов против одного запроса товаров"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"orders_{size}.db"))
+        _seed_orders(db, size)
+
+        print(f"\nЗаказов: {size:,}")
+        if size <= args.legacy_max:
+            elapsed, _ = _timed(lambda: _legacy_get_all_orders(db))
+            print(f"   N+1 запросов:          {elapsed:8.2f} с")
+        else:
+            print(f"   N+1 запросов:          пропущено (--legacy-max {args.legacy_max})")
+        elapsed, orders = _timed(db.get_all_orders)
+        print(f"   get_all_orders:        {elapsed:8.2f} с ({len(orders):,} заказов)")
+        elapsed, _ = _timed(lambda: db.get_all_orders(with_products=False))
+        print(f"   без товаров:           {elapsed:8.2f} с")
+        db.close()
+
+
+def bench_bulk(args):
+    """create_order в цикле против create_orders_bulk"""
+    rng = random.Random(1)
+    orders = [
+        (rng.randint(1, 100), [{'product_id': rng.randint(1, 200), 'quantity': rng.randint(1, 3)}
+                               for _ in range(rng.randint(1, 4))])
+        for _ in range(args.ops)
+    ]
+
+    timings = {}
+    for name in ("create_order", "create_orders_bulk"):
+        db = DatabaseManager(_temp_db_path(f"{name}.db"))
+        _seed_orders(db, 0, customers=100, products=200)
+        if name == "create_order":
+            elapsed, _ = _timed(lambda: [db.create_order(c, items) for c, items in orders])
+        else:
+            elapsed, _ = _timed(lambda: db.create_orders_bulk(orders))
+        timings[name] = elapsed
+        db.close()
+
+    print(f"Создание {args.ops:,} заказов")
+    for name, elapsed in timings.items():
+        print(f"   {name:<20} {elapsed:8.2f} с ({args.ops / elapsed:,.0f} заказов/с)")
+    print(f"   Ускорение: x{timings['create_order'] / timings['create_orders_bulk']:.1f}")
+
+
+def _order_worker(db_name, customer_id, product_id, attempts):
+    """Процесс-писатель: создает заказы на одну единицу товара, возвращает число успешных"""
+    db = DatabaseManager(db_name, pool_size=1, busy_retries=20)
+    created = 0
+    for _ in range(attempts):
+        order_id, _ = db.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}])
+        if order_id:
+            created += 1
+    db.close()
+    return created
+
+
+def run_order_writers(db_name, customer_id, product_id, writers, attempts):
+    """Запускает writers процессов, каждый делает attempts попыток заказа"""
+    with multiprocessing.Pool(writers) as pool:
+        return pool.starmap(_order_worker, [(db_name, customer_id, product_id, attempts)] * writers)
+
+
+def bench_stock(args):
+    """Пропускная способность create_order при нескольких процессах-писателях"""
+    print(f"Создание {args.ops:,} заказов несколькими процессами")
+    for writers in args.writers:
+        db = DatabaseManager(_temp_db_path(f"stock_{writers}.db"))
+        customer_id = db.add_customer("Клиент", "stock@example.com", "")
+        product_id = db.add_product("Товар", 100, args.ops)
+        db.close()
+
+        elapsed, created = _timed(lambda: run_order_writers(
+            db.db_name, customer_id, product_id, writers, args.ops // writers))
+        print(f"   Писателей: {writers}  {elapsed:6.2f} с  {sum(created) / elapsed:8,.0f} заказов/с")
+
+
+def bench_profiles(args):
+    """Один писатель и несколько читателей одновременно для каждого профиля PRAGMA"""
+    readers = args.readers
+    print(f"Писатель + {readers} читателей, {args.duration} с на профиль")
+    for profile in PROFILES:
+        db = DatabaseManager(_temp_db_path(f"profile_{profile}.db"), pool_size=readers + 1, profile=profile)
+        _seed_orders(db, 10000, customers=100, products=200)
+        stop = threading.Event()
+        counts = {'writes': 0, 'reads': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def writer():
+            while not stop.is_set():
+                try:
+                    db.create_order(1, [{'product_id': 1, 'quantity': 1}])
+                    with lock:
+                        counts['writes'] += 1
+                except Exception:
+                    with lock:
+                        counts['errors'] += 1
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    db.get_total_revenue()
+                    db.get_orders_count()
+                    with lock:
+                        counts['reads'] += 1
+                except Exception:
+                    with lock:
+                        counts['errors'] += 1
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        db.close()
+
+        print(f"   {profile:<11} запись: {counts['writes'] / args.duration:8,.0f} оп/с   "
+              f"чтение: {counts['reads'] / args.duration:8,.0f} оп/с   ошибок: {counts['errors']}")
+
+
+ANALYTICS_METHODS = [
+    'get_popular_products', 'get_average_order_value', 'get_total_revenue', 'get_orders_count',
+    'get_best_customer', 'get_orders_by_month', 'get_revenue_by_month',
+]
+
+
+def bench_analytics(args):
+    """Время аналитических методов (сводные таблицы) против пересчета по orders"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"analytics_{size}.db"))
+        _seed_orders(db, size)
+        print(f"\nЗаказов: {size:,}")
+        for name in ANALYTICS_METHODS:
+            elapsed, _ = _timed(getattr(db, name))
+            print(f"   {name:<26} {elapsed * 1000:10.2f} мс")
+        elapsed, problems = _timed(db.check_summaries)
+        print(f"   {'полный пересчет (проверка)':<26} {elapsed * 1000:10.2f} мс, расхождений: {len(problems)}")
+        db.close()
+
+
+def _legacy_dashboard(db):
+    """Главный экран аналитики до get_dashboard_snapshot: пять запросов и загрузка всех заказов"""
+    db.get_orders_count()
+    db.get_customers_count()
+    db.get_products_count()
+    db.get_total_revenue()
+    db.get_average_order_value()
+    orders = db.get_all_orders(with_products=False)
+    statuses = {s: len([o for o in orders if o.status == s]) for s in ('completed', 'pending', 'cancelled')}
+    return statuses, max(orders, key=lambda x: x.total_amount) if orders else None
+
+
+def bench_dashboard(args):
+    """Общая статистика: отдельные запросы против get_dashboard_snapshot"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"dashboard_{size}.db"))
+        _seed_orders(db, size)
+        legacy, _ = _timed(lambda: _legacy_dashboard(db))
+        snapshot, _ = _timed(db.get_dashboard_snapshot)
+        print(f"\nЗаказов: {size:,}")
+        print(f"   Отдельные запросы + get_all_orders: {legacy * 1000:10.2f} мс")
+        print(f"   get_dashboard_snapshot:             {snapshot * 1000:10.2f} мс")
+        db.close()
+
+
+def bench_async(args):
+    """Смешанная нагрузка: синхронный API против AsyncDatabaseManager"""
+    rng = random.Random(3)
+    # 80% чтений товара и сводки, 20% создания заказов
+    requests = [rng.choice(['product', 'product', 'product', 'dashboard', 'order']) for _ in range(args.ops)]
+
+    def arguments(kind):
+        if kind == 'product':
+            return 'get_product_by_id', (rng.randint(1, 200),)
+        if kind == 'dashboard':
+            return 'get_dashboard_snapshot', ()
+        return 'create_order', (rng.randint(1, 100), [{'product_id': rng.randint(1, 200), 'quantity': 1}])
+
+    calls = [arguments(kind) for kind in requests]
+
+    db = DatabaseManager(_temp_db_path("sync.db"))
+    _seed_orders(db, 10000, customers=100, products=200)
+    sync_elapsed, _ = _timed(lambda: [getattr(db, name)(*params) for name, params in calls])
+    db.close()
+
+    async def run_async():
+        async with AsyncDatabaseManager(_temp_db_path("async.db"), readers=args.readers) as adb:
+            _seed_orders(adb.db, 10000, customers=100, products=200)
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def call(name, params):
+                async with semaphore:
+                    return await getattr(adb, name)(*params)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(call(name, params) for name, params in calls))
+            return time.perf_counter() - start
+
+    async_elapsed = asyncio.run(run_async())
+    print(f"{args.ops:,} запросов (80% чтение, 20% запись)")
+    print(f"   Синхронно:              {args.ops / sync_elapsed:8,.0f} запросов/с")
+    print(f"   Async, {args.concurrency:>3} одновременно: {args.ops / async_elapsed:8,.0f} запросов/с "
+          f"({args.readers} читателей, 1 писатель)")
+
+
+def bench_parallel(args):
+    """Отчеты по исходным таблицам: одно соединение против пула процессов"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"parallel_{size}.db"))
+        _seed_orders(db, size)
+        with db.connection() as conn:
+            single_revenue, _ = _timed(lambda: conn.execute('''
+                SELECT strftime('%Y-%m', created_date), SUM(total_amount)
+                FROM orders WHERE status = 'completed' GROUP BY 1
+            ''').fetchall())
+            single_products, _ = _timed(lambda: conn.execute(SUMMARY_SOURCES['stats_product_sales']).fetchall())
+        db.close()
+
+        print(f"\nЗаказов: {size:,} (строк заказов: {size * 3:,})")
+        print(f"   {'процессов':<10} {'выручка/мес':>12} {'товары':>10}")
+        print(f"   {'1 (SQL)':<10} {single_revenue:11.2f}с {single_products:9.2f}с")
+        for workers in args.workers:
+            with ParallelAnalytics(db.db_name, workers=workers) as engine:
+                engine.get_orders_by_month()  # запуск процессов не входит в замер
+                revenue, _ = _timed(engine.get_revenue_by_month)
+                products, _ = _timed(engine.get_popular_products)
+            print(f"   {workers:<10} {revenue:11.2f}с {products:9.2f}с")
+
+
+def _legacy_distribution(db):
+    """Анализ чеков до NumPy: загрузка всех заказов и проход по списку на каждый диапазон"""
+    orders = db.get_all_orders(with_products=False)
+    values = [o.total_amount for o in orders if o.status == 'completed']
+    ranges = DEFAULT_EDGES
+    counts = [len([v for v in values if ranges[i] <= v < ranges[i + 1]]) for i in range(len(ranges) - 1)]
+    return min(values), max(values), counts
+
+
+def bench_distribution(args):
+    """Распределение сумм заказов: исходный Python-вариант против NumPy"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"distribution_{size}.db"))
+        _seed_orders(db, size)
+
+        def python_single_pass():
+            with db.connection() as conn:
+                values = [row[0] for row in conn.execute(
+                    "SELECT total_amount FROM orders WHERE status = 'completed'")]
+            return _python_distribution(values, DEFAULT_EDGES, DEFAULT_PERCENTILES)
+
+        legacy, _ = _timed(lambda: _legacy_distribution(db))
+        python, _ = _timed(python_single_pass)
+        vectorised, _ = _timed(lambda: order_value_distribution(db))
+        print(f"\nЗаказов: {size:,}")
+        print(f"   get_all_orders + списки:      {legacy * 1000:10.1f} мс")
+        print(f"   Python, один проход:          {python * 1000:10.1f} мс")
+        print(f"   order_value_distribution:     {vectorised * 1000:10.1f} мс")
+        db.close()
+
+
+def _directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def bench_columnar(args):
+    """Аналитика по memory-mapped столбцам против SQLite (сводные таблицы и полный пересчет)"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"columnar_{size}.db"))
+        _seed_orders(db, size)
+        directory = os.path.join(os.path.dirname(db.db_name), "columns")
+        export_time, _ = _timed(lambda: db.export_columnar(directory))
+        print(f"\nЗаказов: {size:,}")
+        print(f"   экспорт: {export_time:.2f} с, {_directory_size(directory) / 2 ** 20:.1f} МБ "
+              f"(БД с WAL {sum(os.path.getsize(p) for p in (db.db_name, db.db_name + '-wal') if os.path.exists(p)) / 2 ** 20:.1f} МБ)")
+
+        sqlite_times = {name: _timed(getattr(db, name))[0] for name in ANALYTICS_METHODS}
+        with db.connection() as conn:
+            full_scan, _ = _timed(lambda: [conn.execute(source).fetchall() for source in SUMMARY_SOURCES.values()])
+        db.attach_columnar(directory)
+        print(f"   {'метод':<26} {'SQLite, мс':>12} {'столбцы, мс':>12}")
+        for name in ANALYTICS_METHODS:
+            elapsed, _ = _timed(getattr(db, name))
+            print(f"   {name:<26} {sqlite_times[name] * 1000:12.2f} {elapsed * 1000:12.2f}")
+        columnar_all, _ = _timed(lambda: [getattr(db, name)() for name in ANALYTICS_METHODS])
+        print(f"   {'полный пересчет / все методы':<26} {full_scan * 1000:12.2f} {columnar_all * 1000:12.2f}")
+        db.close()
+
+
+def _legacy_order_dicts(db):
+    """get_all_orders до моделей: словарь на заказ и словарь на каждую позицию"""
+    with db.connection() as conn:
+        orders = [
+            {'id': row[0], 'customer_id': row[1], 'total_amount': row[2], 'status': row[3],
+             'created_date': row[4], 'customer_name': row[5], 'products': []}
+            for row in conn.execute('''
+                SELECT o.id, o.customer_id, o.total_amount, o.status, o.created_date, c.name
+                FROM orders o
+                JOIN customers c ON o.customer_id = c.id
+                ORDER BY o.created_date DESC
+            ''')
+        ]
+        orders_by_id = {order['id']: order for order in orders}
+        for order_id, name, quantity, price in conn.execute('''
+            SELECT oi.order_id, p.name, oi.quantity, p.price
+            FROM order_items oi
+            JOIN products p ON oi.product_id = p.id
+            ORDER BY oi.order_id, oi.id
+        '''):
+            orders_by_id[order_id]['products'].append({'name': name, 'quantity': quantity, 'price': price})
+        return orders
+
+
+def _traced_bytes(func):
+    """Память, занятая результатом func (tracemalloc), и время вызова"""
+    tracemalloc.start()
+    try:
+        elapsed, result = _timed(func)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return size, elapsed, len(result)
+
+
+def bench_memory(args):
+    """Память на загруженный заказ: словари против моделей со __slots__"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"memory_{size}.db"))
+        frozen = DatabaseManager(db.db_name, frozen_models=True)
+        generate_data(db, customers=max(100, size // 10), products=max(100, size // 100), orders=size)
+        print(f"\nЗаказов: {size:,}")
+        for label, func in (("словари (до)", lambda: _legacy_order_dicts(db)),
+                            ("Order со __slots__", db.get_all_orders),
+                            ("FrozenOrder", frozen.get_all_orders)):
+            used, elapsed, count = _traced_bytes(func)
+            print(f"   {label:<20} {used / count:8.0f} байт/заказ  {used / 2 ** 20:9.1f} МБ  {elapsed:7.2f} с")
+        frozen.close()
+        db.close()
+
+
+def _legacy_update_customer(db, customer_id, **values):
+    """update_customer до реестра запросов: текст UPDATE зависит от набора полей"""
+    updates = [f"{column} = ?" for column in values]
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE customers SET {', '.join(updates)} WHERE id = ?", [*values.values(), customer_id])
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def bench_statements(args):
+    """Задержка одиночных CRUD-операций: кэш скомпилированных запросов и канонический UPDATE"""
+    path = _temp_db_path("statements.db")
+    db = DatabaseManager(path, profile='throughput')
+    generate_data(db, customers=1000, products=500, orders=1000)
+    db.close()
+    unique = itertools.count()
+
+    def cases(db, rng):
+        def fields(i):
+            # Случайный непустой набор полей - до реестра это разные тексты UPDATE
+            values = {'name': f"Клиент {i}", 'email': f"stmt{next(unique)}@example.com", 'phone': f"+7900{i:07d}"}
+            chosen = rng.sample(sorted(values), rng.randint(1, 3))
+            return {column: values[column] for column in chosen}
+
+        return [
+            ('get_customer_by_id', lambda i: db.get_customer_by_id(rng.randint(1, 1000))),
+            ('get_product_by_id', lambda i: db.get_product_by_id(rng.randint(1, 500))),
+            ('update_customer', lambda i: db.update_customer(rng.randint(1, 1000), **fields(i))),
+            ('update_customer (до)', lambda i: _legacy_update_customer(db, rng.randint(1, 1000), **fields(i))),
+            ('update_product', lambda i: db.update_product(rng.randint(1, 500), price=rng.randint(100, 50000))),
+            ('add+delete_customer', lambda i: db.delete_customer(
+                db.add_customer("Клиент", f"stmt{next(unique)}@example.com", ""))),
+        ]
+
+    print(f"Одиночные CRUD-операции, {args.ops} вызовов, p50/p99 в мкс")
+    print(f"   {'операция':<22} {'без кэша':>18} {'cached_statements=128':>24}")
+    results = {}
+    for size in (0, 128):
+        db = DatabaseManager(path, profile='throughput', cached_statements=size)
+        for name, func in cases(db, random.Random(args.seed)):
+            results.setdefault(name, []).append(_run_case(func, args.ops, args.duration))
+        db.close()
+    for name, (uncached, with_cache) in results.items():
+        print(f"   {name:<22} {uncached['p50_ms'] * 1000:8.1f} / {uncached['p99_ms'] * 1000:7.1f}"
+              f" {with_cache['p50_ms'] * 1000:13.1f} / {with_cache['p99_ms'] * 1000:8.1f}")
+
+
+def _legacy_update_order_status(db, order_id, status):
+    """update_order_status до пакетного API: транзакция на каждый заказ, без проверки перехода"""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (status, order_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def bench_statuses(args):
+    """Смена статусов заказов: по одному против пакетов update_order_statuses"""
+    ops = args.ops
+    db = DatabaseManager(_temp_db_path("statuses.db"))
+    _seed_orders(db, ops * 3)
+    with db.connection() as conn:
+        conn.execute("UPDATE orders SET status = 'pending'")
+        conn.commit()
+    rng = random.Random(args.seed)
+    changes = [(order_id, rng.choice(('completed', 'cancelled'))) for order_id in range(1, ops * 3 + 1)]
+
+    before, _ = _timed(lambda: [_legacy_update_order_status(db, *change) for change in changes[:ops]])
+    single, _ = _timed(lambda: [db.update_order_status(*change) for change in changes[ops:ops * 2]])
+    batch_size = 1000
+    batched, _ = _timed(lambda: [db.update_order_statuses(changes[start:start + batch_size])
+                                 for start in range(ops * 2, ops * 3, batch_size)])
+    assert db.check_summaries() == []
+    db.close()
+
+    print(f"Смена статусов {ops} заказов (половина - отмены с возвратом товаров)")
+    print(f"   По одному, без проверок (до):    {ops / before:10,.0f} заказов/с")
+    print(f"   update_order_status:             {ops / single:10,.0f} заказов/с")
+    print(f"   update_order_statuses по {batch_size}:  {ops / batched:10,.0f} заказов/с")
+    print(f"   Ускорение пакетов: x{before / batched:.0f}")
+
+
+SEARCH_QUERIES = [
+    ('customers', "иван"),
+    ('customers', "ivanova12"),
+    ('customers', "7905"),
+    ('products', "ноутбук hp"),
+    ('products', "мышь logi"),
+]
+
+
+def _like_search(db, table, text, limit=20):
+    """Поиск до FTS5: LIKE '%...%' по каждому слову во всех текстовых колонках (полный просмотр)"""
+    columns = ('name', 'email', 'phone') if table == 'customers' else ('name',)
+    words = text.split()
+    condition = " AND ".join("(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")" for _ in words)
+    params = [f"%{word}%" for word in words for _ in columns]
+    with db.connection() as conn:
+        return conn.execute(f"SELECT * FROM {table} WHERE {condition} LIMIT ?", params + [limit]).fetchall()
+
+
+def bench_search(args):
+    """Поиск клиентов и товаров: FTS5 против LIKE '%...%'"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"search_{size}.db"))
+        generate_data(db, customers=size, products=size, orders=0)
+        search = {'customers': db.search_customers, 'products': db.search_products}
+        print(f"\nКлиентов и товаров: {size:,}; p50 / p99, мс")
+        for table, text in SEARCH_QUERIES:
+            fts = _run_case(lambda i: search[table](text), args.ops, args.max_seconds)
+            like = _run_case(lambda i: _like_search(db, table, text), args.ops, args.max_seconds)
+            print(f"   {table:<10} {text!r:<14} FTS5 {fts['p50_ms']:8.3f} / {fts['p99_ms']:8.3f}"
+                  f"   LIKE {like['p50_ms']:8.3f} / {like['p99_ms']:8.3f}   x{like['p50_ms'] / fts['p50_ms']:.1f}")
+        db.close()
+
+
+def _joined_order_products(db, orders, page=True):
+    """Товары заказов до цен в order_items: соединение с products ради названия и текущей цены.
+
+    page=False - товары всех заказов одним запросом, как в get_all_orders.
+    """
+    where, params = "", []
+    if page:
+        where = f"WHERE oi.order_id IN ({', '.join('?' * len(orders))})"
+        params = [order.id for order in orders]
+    orders_by_id = {order.id: order for order in orders}
+    names = {}
+    with db.connection() as conn:
+        for order_id, name, quantity, price in conn.execute(f'''
+            SELECT oi.order_id, p.name, oi.quantity, p.price
+            FROM order_items oi
+            JOIN products p ON oi.product_id = p.id
+            {where}
+            ORDER BY oi.order_id, oi.id
+        ''', params):
+            orders_by_id[order_id].products.append(db.models.OrderItem(names.setdefault(name, name), quantity, price))
+    return orders
+
+
+def bench_order_lines(args):
+    """Чтение заказов с позициями: соединение с products против цен из order_items"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"order_lines_{size}.db"))
+        generate_data(db, customers=max(100, size // 10), products=max(100, size // 100), orders=size)
+        print(f"\nЗаказов: {size:,}; страница из 100 заказов, p50 / p99, мс")
+        for label, func in (
+                ("соединение с products (до)", lambda i: _joined_order_products(
+                    db, list(itertools.islice(db.iter_orders(100, with_products=False), 100)))),
+                ("цены из order_items", lambda i: list(itertools.islice(db.iter_orders(100), 100)))):
+            stats = _run_case(func, args.ops, args.max_seconds)
+            print(f"   {label:<28} {stats['p50_ms']:8.3f} / {stats['p99_ms']:8.3f}")
+        elapsed, _ = _timed(lambda: _joined_order_products(db, db.get_all_orders(with_products=False), page=False))
+        print(f"   все заказы, соединение (до): {elapsed:8.2f} с")
+        elapsed, _ = _timed(db.get_all_orders)
+        print(f"   все заказы, get_all_orders:  {elapsed:8.2f} с")
+        db.close()
+
+
+# Гранулярность, начало и конец диапазона; формат strftime для группировки до created_ts
+PERIOD_CASES = [
+    ('hour', "2024-11-25", "2024-12-02", '%Y-%m-%d %H:00'),
+    ('day', "2024-01-01", "2025-01-01", '%Y-%m-%d'),
+    ('week', "2024-01-01", "2025-01-01", '%Y-%W'),
+    ('month', "2023-01-01", "2026-01-01", '%Y-%m'),
+]
+
+
+def _strftime_periods(db, start, end, fmt):
+    """Группировка до created_ts: strftime для каждой строки, без пустых периодов"""
+    with db.connection() as conn:
+        return conn.execute(f'''
+            SELECT strftime('{fmt}', created_date) AS period, COUNT(*),
+                   TOTAL(CASE WHEN status = 'completed' THEN total_amount END)
+            FROM orders
+            WHERE created_date >= ? AND created_date < ?
+            GROUP BY period ORDER BY period
+        ''', (start, end)).fetchall()
+
+
+def bench_periods(args):
+    """Заказы и выручка за период: индекс по created_ts против strftime по created_date"""
+    for size in args.sizes:
+        db = DatabaseManager(_temp_db_path(f"periods_{size}.db"))
+        generate_data(db, customers=max(100, size // 10), products=max(100, size // 100), orders=size)
+        print(f"\nЗаказов: {size:,}; p50, мс")
+        for granularity, start, end, fmt in PERIOD_CASES:
+            before = _run_case(lambda i: _strftime_periods(db, start, end, fmt), args.ops, args.max_seconds)
+            after = _run_case(lambda i: db.get_period_totals(start, end, granularity), args.ops, args.max_seconds)
+            periods = len(db.get_period_totals(start, end, granularity))
+            print(f"   {granularity:<6} {start} - {end} ({periods} периодов): strftime {before['p50_ms']:9.1f}"
+                  f"   created_ts {after['p50_ms']:9.1f}   x{before['p50_ms'] / after['p50_ms']:.1f}")
+        db.close()
+
+
+def bench_catalog(args):
+    """Каталог товаров в памяти: чтение товаров и create_order против запросов к SQLite"""
+    for size in args.sizes:
+        products = max(1000, size // 10)
+        path = _temp_db_path(f"catalog_{size}.db")
+        plain = DatabaseManager(path)
+        _seed_orders(plain, size, customers=1000, products=products)
+        cached = DatabaseManager(path, catalog=True)
+        rng = random.Random(args.seed)
+        ids = [rng.randint(1, products) for _ in range(args.ops)]
+
+        def order(db, i):
+            return db.create_order(i % 1000 + 1, [{'product_id': ids[(i + k) % len(ids)], 'quantity': 1}
+                                                  for k in range(3)])
+
+        print(f"\nЗаказов: {size:,}, товаров: {products:,}; p50 / p99, мкс")
+        for name, case in [('get_product_by_id', lambda db, i: db.get_product_by_id(ids[i])),
+                           ('create_order, 3 позиции', order)]:
+            before = _run_case(lambda i: case(plain, i), args.ops, args.max_seconds)
+            after = _run_case(lambda i: case(cached, i), args.ops, args.max_seconds)
+            print(f"   {name:<24} SQLite {before['p50_ms'] * 1000:8.1f} / {before['p99_ms'] * 1000:8.1f}"
+                  f"   каталог {after['p50_ms'] * 1000:8.1f} / {after['p99_ms'] * 1000:8.1f}"
+                  f"   x{before['p50_ms'] / after['p50_ms']:.1f}")
+        before, _ = _timed(plain.get_all_products)
+        after, _ = _timed(cached.get_all_products)
+        print(f"   {'get_all_products':<24} SQLite {before * 1000:8.1f} мс   каталог {after * 1000:8.1f} мс")
+
+        # Запись из другого соединения сбрасывает каталог, следующее чтение загружает его заново
+        plain.update_product(ids[0], price=1)
+        reload, product = _timed(lambda: cached.get_product_by_id(ids[0]))
+        assert product.price == 1
+        stats = cached.catalog.stats()
+        print(f"   перезагрузка после чужой записи {reload * 1000:.1f} мс; попаданий {stats['hit_rate'] * 100:.1f}%,"
+              f" загрузок {stats['loads']}, память {stats['memory_bytes'] / 2 ** 20:.1f} МБ")
+        cached.close()
+        plain.close()
+
+
+# (max_batch, max_latency в секундах) для OrderIntake
+INTAKE_SETTINGS = [(1, 0.0), (64, 0.0), (8, 0.001), (32, 0.002), (128, 0.005), (512, 0.02)]
+
+
+def _intake_load(create, threads, duration):
+    """threads потоков вызывают create(номер потока) в течение duration секунд; задержки вызовов"""
+    stop = threading.Event()
+    samples = []
+    lock = threading.Lock()
+
+    def client(number):
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            create(number)
+            local.append(time.perf_counter() - start)
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=client, args=(number,)) for number in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in workers:
+        t.join()
+    return _latency_stats(samples, time.perf_counter() - started)
+
+
+def bench_intake(args):
+    """Групповая фиксация заказов: пропускная способность против задержки при разных пакетах"""
+    threads = args.concurrency
+    print(f"{threads} потоков создают заказы {args.duration} с; профиль durable (fsync на каждую фиксацию)")
+    print(f"   {'вариант':<28} {'заказов/с':>10} {'p50, мс':>9} {'p99, мс':>9} {'пакет':>7}")
+
+    def prepare(name):
+        db = DatabaseManager(_temp_db_path(f"intake_{name}.db"), pool_size=min(threads, 8))
+        _seed_orders(db, 0, customers=threads, products=100)
+        return db
+
+    def order(number):
+        return number + 1, [{'product_id': number % 100 + 1, 'quantity': 1},
+                            {'product_id': (number * 7 + 3) % 100 + 1, 'quantity': 2}]
+
+    db = prepare("direct")
+    stats = _intake_load(lambda number: db.create_order(*order(number)), threads, args.duration)
+    print(f"   {'create_order':<28} {stats['ops_per_sec']:10,.0f} {stats['p50_ms']:9.2f} {stats['p99_ms']:9.2f}"
+          f" {1:7.1f}")
+    db.close()
+
+    for max_batch, max_latency in INTAKE_SETTINGS:
+        db = prepare(f"{max_batch}")
+        with OrderIntake(db, max_batch=max_batch, max_latency=max_latency) as intake:
+            stats = _intake_load(lambda number: intake.create_order(*order(number)), threads, args.duration)
+        name = f"OrderIntake {max_batch}/{max_latency * 1000:g} мс"
+        print(f"   {name:<28} {stats['ops_per_sec']:10,.0f} {stats['p50_ms']:9.2f} {stats['p99_ms']:9.2f}"
+              f" {intake.orders / max(intake.batches, 1):7.1f}")
+        db.close()
+
+
+def bench_generate(args):
+    """Скорость синтетического генератора при разном числе процессов"""
+    for size in args.sizes:
+        print(f"\nЗаказов: {size:,}")
+        for shards in args.workers:
+            db = DatabaseManager(_temp_db_path(f"generate_{size}_{shards}.db"))
+            report = generate_data(db, customers=max(100, size // 10), products=max(100, size // 100),
+                                   orders=size, shards=shards)
+            print(f"   процессов: {shards:<3} {format_report(report)}")
+            db.close()
+
+
+SUITE_ANALYTICS = ANALYTICS_METHODS + [
+    'get_customers_count', 'get_products_count', 'get_top_customers', 'get_dashboard_snapshot',
+]
+
+
+def _latency_stats(samples, elapsed):
+    ordered = sorted(samples)
+    return {
+        'iterations': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p90_ms': percentile(ordered, 90) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'ops_per_sec': len(ordered) / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def _run_case(func, limit, max_seconds, min_iterations=3):
+    """Вызывает func(i) до limit раз или пока не истечет max_seconds (не меньше min_iterations)"""
+    samples = []
+    started = time.perf_counter()
+    for i in range(limit):
+        if i >= min_iterations and time.perf_counter() - started > max_seconds:
+            break
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    return _latency_stats(samples, time.perf_counter() - started) if samples else None
+
+
+def _hot_path_cases(db, seed):
+    """Горячие пути DatabaseManager: (имя, функция от номера итерации, максимум итераций или None)"""
+    rng = random.Random(seed)
+    customers = db.get_customers_count()
+    products = db.get_products_count()
+    with db.connection() as conn:
+        # Остатков должно хватить на все заказы бенчмарка
+        conn.execute("UPDATE products SET quantity = 1000000")
+        conn.commit()
+        pending = [row[0] for row in conn.execute("SELECT id FROM orders WHERE status = 'pending' ORDER BY id")]
+    rng.shuffle(pending)
+    added_customers, added_products, added_orders = [], [], []
+    unique = itertools.count()
+
+    def random_lines():
+        return [{'product_id': rng.randint(1, products), 'quantity': rng.randint(1, 3)}
+                for _ in range(rng.randint(1, 3))]
+
+    cases = [
+        ('add_customer', lambda i: added_customers.append(
+            db.add_customer(f"Клиент бенчмарка {i}", f"bench{next(unique)}@example.com", "")), None),
+        ('get_customer_by_id', lambda i: db.get_customer_by_id(rng.randint(1, customers)), None),
+        ('update_customer', lambda i: db.update_customer(rng.randint(1, customers), phone=f"+7900{i:07d}"), None),
+        ('get_all_customers', lambda i: db.get_all_customers(), None),
+        ('delete_customer', lambda i: db.delete_customer(added_customers.pop()), lambda: len(added_customers)),
+        ('add_product', lambda i: added_products.append(db.add_product(f"Товар бенчмарка {i}", 100, 1000000)), None),
+        ('get_product_by_id', lambda i: db.get_product_by_id(rng.randint(1, products)), None),
+        ('update_product', lambda i: db.update_product(rng.randint(1, products), price=rng.randint(100, 50000)), None),
+        ('get_all_products', lambda i: db.get_all_products(), None),
+        ('delete_product', lambda i: db.delete_product(added_products.pop()), lambda: len(added_products)),
+        ('create_order', lambda i: added_orders.append(
+            db.create_order(rng.randint(1, customers), random_lines())[0]), None),
+        ('create_orders_bulk_100', lambda i: db.create_orders_bulk(
+            [(rng.randint(1, customers), random_lines()) for _ in range(100)]), None),
+        ('get_all_orders', lambda i: db.get_all_orders(), None),
+        ('iter_orders_first_page', lambda i: next(db.iter_orders(100)), None),
+        ('get_orders_by_customer', lambda i: db.get_orders_by_customer(rng.randint(1, customers)), None),
+        ('update_order_status', lambda i: db.update_order_status(pending.pop(), 'completed'), lambda: len(pending)),
+        ('delete_order', lambda i: db.delete_order(added_orders.pop()), lambda: len(added_orders)),
+    ]
+    cases += [(name, lambda i, method=getattr(db, name): method(), None) for name in SUITE_ANALYTICS]
+    return cases
+
+
+def _git_revision():
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# Метод перцентилей в JSON; в прогонах без него p50/p90/p99 могли быть завышены округлением
+PERCENTILE_METHOD = 'nearest-rank'
+
+
+def run_suite(sizes, ops=5000, max_seconds=1.0, seed=42, progress=None, directory=None):
+    """Засевает БД каждого размера и замеряет все горячие пути; возвращает словарь для JSON"""
+    results = {
+        'meta': {
+            'revision': _git_revision(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ops': ops, 'max_seconds': max_seconds, 'seed': seed,
+            'percentile': PERCENTILE_METHOD,
+        },
+        'sizes': {},
+    }
+    for size in sizes:
+        name = f"suite_{size}.db"
+        db = DatabaseManager(os.path.join(directory, name) if directory else _temp_db_path(name))
+        generate_data(db, customers=max(100, size // 10), products=max(100, size // 100), orders=size, seed=seed)
+        cases = {}
+        for name, func, limit in _hot_path_cases(db, seed):
+            stats = _run_case(func, min(ops, limit()) if limit else ops, max_seconds)
+            if stats:
+                cases[name] = stats
+                if progress:
+                    progress(size, name, stats)
+        results['sizes'][str(size)] = cases
+        db.close()
+    return results
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """Сравнение p50 двух прогонов: (размер, случай, было, стало, отношение, регрессия)"""
+    rows = []
+    for size, cases in current['sizes'].items():
+        for name, stats in cases.items():
+            before = baseline.get('sizes', {}).get(size, {}).get(name)
+            if before is None or not before['p50_ms']:
+                continue
+            ratio = stats['p50_ms'] / before['p50_ms']
+            rows.append((size, name, before['p50_ms'], stats['p50_ms'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def bench_suite(args):
+    """Все горячие пути: перцентили задержек и пропускная способность, результат в JSON"""
+    def progress(size, name, stats):
+        print(f"   {size:>9,} {name:<26} p50 {stats['p50_ms']:9.3f}  p90 {stats['p90_ms']:9.3f}  "
+              f"p99 {stats['p99_ms']:9.3f} мс  {stats['ops_per_sec']:10,.0f} оп/с  ({stats['iterations']})")
+
+    results = run_suite(args.sizes, args.ops, args.max_seconds, args.seed, progress)
+    output = args.output or os.path.join(
+        "benchmark_results",
+        f"suite_{results['meta']['revision'] or 'unknown'}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, results, args.threshold)
+        print(f"\nСравнение с {args.compare} ({baseline['meta'].get('revision')}), p50:")
+        if baseline['meta'].get('percentile') != PERCENTILE_METHOD:
+            print("   Внимание: перцентили прошлого прогона вычислены другим методом, сравнение неточно")
+        for size, name, before, after, ratio, regression in rows:
+            mark = "  РЕГРЕССИЯ" if regression else ""
+            print(f"   {int(size):>9,} {name:<26} {before:9.3f} -> {after:9.3f} мс  x{ratio:5.2f}{mark}")
+        print(f"Регрессий (медленнее более чем на {args.threshold:.0%}): {sum(row[5] for row in rows)}")
+
+
+BENCHMARKS = {
+    'pool': (bench_pool, "Пул соединений против соединения на вызов"),
+    'orders': (bench_orders, "Загрузка заказов с товарами (N+1)"),
+    'bulk': (bench_bulk, "Пакетное создание заказов"),
+    'intake': (bench_intake, "Прием заказов из многих потоков с групповой фиксацией"),
+    'catalog': (bench_catalog, "Каталог товаров в памяти против чтения из SQLite"),
+    'stock': (bench_stock, "Конкурентное списание остатков"),
+    'profiles': (bench_profiles, "Профили PRAGMA: конкурентные чтение и запись"),
+    'analytics': (bench_analytics, "Аналитические методы"),
+    'dashboard': (bench_dashboard, "Общая статистика одним запросом"),
+    'async': (bench_async, "AsyncDatabaseManager против синхронного API"),
+    'parallel': (bench_parallel, "Параллельные отчеты в пуле процессов"),
+    'distribution': (bench_distribution, "Распределение сумм заказов на NumPy"),
+    'columnar': (bench_columnar, "Аналитика по колоночному экспорту (.npy, mmap)"),
+    'generate': (bench_generate, "Генератор синтетических данных"),
+    'order_lines': (bench_order_lines, "Позиции заказов: соединение с products против цен в order_items"),
+    'periods': (bench_periods, "Аналитика за период: индекс по времени против strftime"),
+    'memory': (bench_memory, "Память на загруженный заказ: словари против моделей"),
+    'search': (bench_search, "Поиск клиентов и товаров: FTS5 против LIKE"),
+    'statuses': (bench_statuses, "Пакетная смена статусов заказов"),
+    'statements': (bench_statements, "Одиночные CRUD-операции и кэш скомпилированных запросов"),
+    'suite': (bench_suite, "Все горячие пути: перцентили, JSON, сравнение прогонов"),
+}
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+# Бенчмарки со своими размерами БД по умолчанию
+BENCHMARK_SIZES = {
+    'periods': [100000, 1000000, 10000000],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Бенчмарки DatabaseManager",
+        epilog="\n".join(f"{name}: {info[1]}" for name, info in sorted(BENCHMARKS.items())),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--ops', type=int, default=5000, help="Количество операций")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help=f"Размеры БД (количество заказов), по умолчанию {DEFAULT_SIZES}; "
+                             + "; ".join(f"{name}: {sizes}" for name, sizes in BENCHMARK_SIZES.items()))
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help="Максимальный размер БД для медленного исходного варианта")
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Количество процессов-писателей")
+    parser.add_argument('--readers', type=int, default=4, help="Количество потоков-читателей")
+    parser.add_argument('--duration', type=float, default=3.0, help="Длительность замера, с")
+    parser.add_argument('--concurrency', type=int, default=64, help="Одновременных async-запросов и потоков intake")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Количество процессов для параллельных отчетов")
+    parser.add_argument('--max-seconds', type=float, default=1.0, help="suite: время на один замер, с")
+    parser.add_argument('--seed', type=int, default=42, help="suite: seed генератора данных")
+    parser.add_argument('--output', help="suite: файл JSON (по умолчанию benchmark_results/)")
+    parser.add_argument('--compare', help="suite: JSON прошлого прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.2, help="suite: допустимое замедление p50")
+    args = parser.parse_args()
+    if args.sizes is None:
+        args.sizes = BENCHMARK_SIZES.get(args.benchmark, DEFAULT_SIZES)
+    BENCHMARKS[args.benchmark][0](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Каталог товаров в памяти процесса
+
+Необязательный кэш всех товаров по id (DatabaseManager(catalog=True)), загружается
+целиком при первом обращении. Изменения товаров, сделанные этим DatabaseManager
+(CRUD товаров, списание и возврат остатков заказами), переносятся в каталог в момент
+фиксации транзакции (write-through).
+
+Записи других соединений и процессов обнаруживаются через PRAGMA data_version: его
+значение в соединении меняется, если с прошлого запроса базу изменило любое другое
+соединение. Для каждого соединения пула запоминается последнее увиденное значение;
+изменение сбрасывает каталог, и он загружается заново при следующем обращении.
+Собственные фиксации соединения data_version не меняют, поэтому запись через то же
+соединение каталог сохраняет, а запись через другое соединение пула лишь вызывает
+лишнюю перезагрузку.
+"""
+import sys
+import threading
+
+PRODUCT_ROWS = "SELECT id, name, price, quantity FROM products ORDER BY id"
+PRODUCT_ROW = "SELECT id, name, price, quantity FROM products WHERE id = ?"
+
+
+class ProductCatalog:
+    """Товары по id; хранятся строки (id, name, price, quantity), объекты model создаются при чтении"""
+
+    def __init__(self, model):
+        self.model = model
+        self._rows = None
+        # id(соединения) -> (соединение, data_version); ссылка на соединение не дает переиспользовать id
+        self._versions = {}
+        self._lock = threading.RLock()
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'invalidations': 0, 'write_throughs': 0}
+
+    def _check(self, conn):
+        """Сбрасывает каталог, если базу изменило другое соединение"""
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        seen = self._versions.get(id(conn))
+        self._versions[id(conn)] = (conn, version)
+        if self._rows is not None and (seen is None or seen[1] != version):
+            self._rows = None
+            self._stats['invalidations'] += 1
+
+    def rows(self, conn):
+        """Актуальные строки каталога по id.
+
+        Внутри транзакции вызывать до ее собственных изменений товаров.
+        """
+        with self._lock:
+            self._check(conn)
+            if self._rows is None:
+                self._rows = {row[0]: row for row in conn.execute(PRODUCT_ROWS)}
+                self._stats['loads'] += 1
+                self._stats['misses'] += 1
+            else:
+                self._stats['hits'] += 1
+            return self._rows
+
+    def get(self, conn, product_id):
+        row = self.rows(conn).get(product_id)
+        return None if row is None else self.model(*row)
+
+    def products(self, conn):
+        """Все товары в порядке id"""
+        with self._lock:
+            rows = list(self.rows(conn).values())
+        return [self.model(*row) for row in rows]
+
+    def commit(self, conn, stock=None, product_id=None):
+        """Фиксирует транзакцию conn и переносит ее изменения в каталог.
+
+        stock - изменения остатков {product_id: разница}; product_id - товар, строка
+        которого перечитывается из транзакции (добавление, изменение, удаление).
+        Под блокировкой каталога: перезагрузка не вклинится между фиксацией и
+        переносом и не учтет изменение дважды.
+        """
+        with self._lock:
+            if self._rows is None:
+                conn.commit()
+                return
+            row = None if product_id is None else conn.execute(PRODUCT_ROW, (product_id,)).fetchone()
+            conn.commit()
+
+            if product_id is not None:
+                if row is None:
+                    self._rows.pop(product_id, None)
+                else:
+                    self._rows[product_id] = row
+            for changed_id, delta in (stock or {}).items():
+                row = self._rows.get(changed_id)
+                if row is not None:
+                    self._rows[changed_id] = (*row[:3], row[3] + delta)
+            self._stats['write_throughs'] += 1
+
+    def invalidate(self):
+        """Сброс каталога после массовых изменений в обход write-through"""
+        with self._lock:
+            if self._rows is not None:
+                self._rows = None
+                self._stats['invalidations'] += 1
+
+    def _memory(self):
+        """Приблизительный объем каталога в байтах: словарь, строки и их значения"""
+        if self._rows is None:
+            return 0
+        size = sys.getsizeof(self._rows)
+        for row in self._rows.values():
+            size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        return size
+
+    def stats(self):
+        """Счетчики попаданий, загрузок и сбросов, размер и память"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = 0 if self._rows is None else len(self._rows)
+            stats['memory_bytes'] = self._memory()
+            total = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / total if total else 0.0
+            return stats
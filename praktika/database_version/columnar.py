@@ -0,0 +1,451 @@
+"""Колоночный экспорт базы данных и аналитика по memory-mapped столбцам
+
+Каждый столбец таблицы сохраняется в отдельный файл .npy, описание - в manifest.json:
+- числа: int64 / float64 (NULL в дробных столбцах -> NaN);
+- статусы: коды int8 + словарь значений в манифесте (NULL - значение null в словаре);
+- даты: int64, секунды Unix (NULL -> минимальное int64, в datetime64 это NaT);
+- строки: байты UTF-8 подряд (.data.npy) + смещения int64 (.offsets.npy), NULL -> "".
+
+Для целых, дат и строк со значениями NULL пишется маска (.nulls.npy, ключ 'nulls'
+в манифесте): любое значение столбца допустимо, и отличить NULL по нему нельзя.
+ColumnarStore.valid возвращает маску строк без NULL, импорт восстанавливает по ней NULL.
+
+Файлы открываются через numpy.load(mmap_mode='r'), данные не копируются в память.
+
+Запуск:
+    python columnar.py export orders.db <каталог>
+    python columnar.py import <каталог> orders.db
+"""
+import argparse
+import functools
+import json
+import os
+from datetime import datetime, timezone
+
+from periods import period_bounds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FORMAT_VERSION = 4
+CHUNK_SIZE = 100000
+# Значения в строках NULL (сами NULL отмечены маской); для дат это NaT
+NULL_INT = 0
+NULL_TIMESTAMP = -2 ** 63
+
+TABLE_COLUMNS = {
+    'customers': [('id', 'int64'), ('name', 'utf8'), ('email', 'utf8'), ('phone', 'utf8')],
+    'products': [('id', 'int64'), ('name', 'utf8'), ('price', 'float64'), ('quantity', 'int64')],
+    'orders': [('id', 'int64'), ('customer_id', 'int64'), ('total_amount', 'float64'),
+               ('status', 'dict'), ('created_date', 'timestamp')],
+    'order_items': [('id', 'int64'), ('order_id', 'int64'), ('product_id', 'int64'), ('quantity', 'int64'),
+                    ('unit_price', 'float64'), ('line_total', 'float64')],
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Для колоночного формата требуется пакет numpy")
+
+
+def _fill(array, cursor, convert=None):
+    position = 0
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        values = [row[0] for row in rows]
+        array[position:position + len(values)] = convert(values) if convert else values
+        position += len(values)
+    return position
+
+
+def _export_nulls(conn, spec, prefix, table, column, rows):
+    """Маска NULL столбца (.nulls.npy), если в нем есть NULL"""
+    if not conn.execute(f"SELECT COUNT(*) - COUNT({column}) FROM {table}").fetchone()[0]:
+        return
+    mask = np.lib.format.open_memmap(prefix + ".nulls.npy", mode='w+', dtype='bool', shape=(rows,))
+    _fill(mask, conn.execute(f"SELECT {column} IS NULL FROM {table} ORDER BY id"))
+    mask.flush()
+    spec['nulls'] = os.path.basename(prefix + ".nulls.npy")
+
+
+def _export_column(conn, directory, table, column, kind, rows):
+    prefix = os.path.join(directory, f"{table}.{column}")
+    open_memmap = np.lib.format.open_memmap
+
+    if kind in ('int64', 'float64'):
+        null = NULL_INT if kind == 'int64' else np.nan
+        array = open_memmap(prefix + ".npy", mode='w+', dtype=kind, shape=(rows,))
+        _fill(array, conn.execute(f"SELECT {column} FROM {table} ORDER BY id"),
+              lambda values: [null if v is None else v for v in values])
+        array.flush()
+        spec = {'kind': kind, 'file': os.path.basename(prefix + ".npy")}
+        if kind == 'int64':
+            _export_nulls(conn, spec, prefix, table, column, rows)
+        return spec
+
+    if kind == 'timestamp':
+        array = open_memmap(prefix + ".npy", mode='w+', dtype='int64', shape=(rows,))
+        _fill(array, conn.execute(
+            f"SELECT CAST(strftime('%s', {column}) AS INTEGER) FROM {table} ORDER BY id"),
+              lambda values: [NULL_TIMESTAMP if v is None else v for v in values])
+        array.flush()
+        spec = {'kind': kind, 'file': os.path.basename(prefix + ".npy")}
+        _export_nulls(conn, spec, prefix, table, column, rows)
+        return spec
+
+    if kind == 'dict':
+        values = [row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM {table} ORDER BY 1")]
+        codes = {value: code for code, value in enumerate(values)}
+        array = open_memmap(prefix + ".npy", mode='w+', dtype='int8', shape=(rows,))
+        _fill(array, conn.execute(f"SELECT {column} FROM {table} ORDER BY id"),
+              lambda chunk: [codes[v] for v in chunk])
+        array.flush()
+        return {'kind': kind, 'file': os.path.basename(prefix + ".npy"), 'values': values}
+
+    if kind == 'utf8':
+        total = int(conn.execute(
+            f"SELECT TOTAL(LENGTH(CAST(COALESCE({column}, '') AS BLOB))) FROM {table}").fetchone()[0])
+        offsets = open_memmap(prefix + ".offsets.npy", mode='w+', dtype='int64', shape=(rows + 1,))
+        data = open_memmap(prefix + ".data.npy", mode='w+', dtype='uint8', shape=(total,))
+        cursor = conn.execute(f"SELECT COALESCE({column}, '') FROM {table} ORDER BY id")
+        row, position = 0, 0
+        offsets[0] = 0
+        while True:
+            chunk = cursor.fetchmany(CHUNK_SIZE)
+            if not chunk:
+                break
+            encoded = [value.encode('utf-8') for value, in chunk]
+            blob = b"".join(encoded)
+            data[position:position + len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+            offsets[row + 1:row + 1 + len(encoded)] = position + np.cumsum([len(e) for e in encoded])
+            row += len(encoded)
+            position += len(blob)
+        offsets.flush()
+        data.flush()
+        spec = {'kind': kind,
+                'offsets': os.path.basename(prefix + ".offsets.npy"),
+                'data': os.path.basename(prefix + ".data.npy")}
+        _export_nulls(conn, spec, prefix, table, column, rows)
+        return spec
+
+    raise ValueError(f"Неизвестный тип столбца: {kind}")
+
+
+def export_columnar(db, directory):
+    """Экспорт всех таблиц в колоночный формат; возвращает манифест"""
+    _require_numpy()
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        'format': FORMAT_VERSION,
+        'source': os.path.abspath(db.db_name),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'tables': {},
+    }
+    with db.connection() as conn:
+        # Все таблицы читаются из одного снимка данных
+        conn.execute("BEGIN")
+        try:
+            for table, columns in TABLE_COLUMNS.items():
+                rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                manifest['tables'][table] = {
+                    'rows': rows,
+                    'columns': {name: _export_column(conn, directory, table, name, kind, rows)
+                                for name, kind in columns},
+                }
+        finally:
+            conn.rollback()
+
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+class StringColumn:
+    """Строковый столбец поверх memory-mapped смещений и байтов"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+
+class ColumnarStore:
+    """Доступ к экспортированным столбцам без копирования в память"""
+
+    def __init__(self, directory):
+        _require_numpy()
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата: {self.manifest.get('format')}")
+        self._columns = {}
+
+    def _load(self, name):
+        return np.load(os.path.join(self.directory, name), mmap_mode='r')
+
+    def rows(self, table):
+        return self.manifest['tables'][table]['rows']
+
+    def column(self, table, name):
+        key = (table, name)
+        if key not in self._columns:
+            spec = self.manifest['tables'][table]['columns'][name]
+            if spec['kind'] == 'utf8':
+                self._columns[key] = StringColumn(self._load(spec['offsets']), self._load(spec['data']))
+            else:
+                self._columns[key] = self._load(spec['file'])
+        return self._columns[key]
+
+    def valid(self, table, name):
+        """Маска строк, в которых значение столбца не NULL"""
+        spec = self.manifest['tables'][table]['columns'][name]
+        if spec['kind'] == 'float64':
+            return ~np.isnan(self.column(table, name))
+        if 'nulls' in spec:
+            return ~self._load(spec['nulls'])
+        return np.ones(self.rows(table), dtype=bool)
+
+    def dictionary(self, table, name):
+        """Значения словарного столбца по кодам"""
+        return self.manifest['tables'][table]['columns'][name]['values']
+
+    def code(self, table, name, value):
+        """Код значения словарного столбца (-1, если значения нет)"""
+        values = self.dictionary(table, name)
+        return values.index(value) if value in values else -1
+
+    def row_index(self, table, ids):
+        """Номера строк таблицы по id (id в экспорте отсортированы); -1 для отсутствующих"""
+        id_column = self.column(table, 'id')
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(id_column):
+            return np.full(len(ids), -1, dtype=np.int64)
+        index = np.minimum(np.searchsorted(id_column, ids), len(id_column) - 1)
+        return np.where(id_column[index] == ids, index, -1)
+
+
+class ColumnarAnalytics:
+    """Аналитические методы DatabaseManager, вычисляемые по колоночному экспорту"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _status_mask(self, status, negate=False):
+        codes = self.store.column('orders', 'status')
+        mask = codes == self.store.code('orders', 'status', status)
+        return ~mask if negate else mask
+
+    def _names(self, table, ids):
+        names = self.store.column(table, 'name')
+        return [names[i] if i >= 0 else None for i in self.store.row_index(table, ids)]
+
+    def _top(self, table, keys, weights, limit):
+        """Топ limit ключей по сумме весов с именами из table"""
+        if not len(keys):
+            return []
+        totals = np.bincount(keys, weights=weights)
+        candidates = np.flatnonzero(totals)
+        order = candidates[np.argsort(-totals[candidates], kind='stable')]
+        result = []
+        # Берем с запасом на случай удаленных записей без имени
+        for key, name in zip(order[:limit * 2], self._names(table, order[:limit * 2])):
+            if name is not None:
+                result.append((name, totals[key]))
+            if len(result) == limit:
+                break
+        return result
+
+    def _months(self, mask=None):
+        """Месяцы заказов (с маской mask); заказы без даты пропускаются"""
+        dated = self.store.valid('orders', 'created_date')
+        if mask is not None:
+            dated &= mask
+        dates = self.store.column('orders', 'created_date')[dated]
+        return dates.astype('datetime64[s]').astype('datetime64[M]')
+
+    def get_popular_products(self, limit=5):
+        known = self.store.valid('order_items', 'product_id')
+        product_ids = self.store.column('order_items', 'product_id')[known]
+        quantities = self.store.column('order_items', 'quantity')[known]
+        return [(name, int(total)) for name, total in self._top('products', product_ids, quantities, limit)]
+
+    def get_average_order_value(self):
+        totals = self.store.column('orders', 'total_amount')[self._status_mask('cancelled', negate=True)]
+        return float(totals.mean()) if totals.size else 0
+
+    def get_total_revenue(self):
+        return float(self.store.column('orders', 'total_amount')[self._status_mask('completed')].sum())
+
+    def get_orders_count(self):
+        return self.store.rows('orders')
+
+    def get_customers_count(self):
+        return self.store.rows('customers')
+
+    def get_products_count(self):
+        return self.store.rows('products')
+
+    def get_top_customers(self, limit=5):
+        mask = self._status_mask('completed')
+        customer_ids = self.store.column('orders', 'customer_id')[mask]
+        totals = self.store.column('orders', 'total_amount')[mask]
+        valid = self.store.valid('orders', 'customer_id')[mask]
+        return [(name, float(total))
+                for name, total in self._top('customers', customer_ids[valid], totals[valid], limit)]
+
+    def get_best_customer(self):
+        top = self.get_top_customers(1)
+        return top[0] if top else ("Нет данных", 0)
+
+    def get_orders_by_month(self):
+        months, counts = np.unique(self._months(), return_counts=True)
+        return [(str(month), int(count)) for month, count in zip(months, counts)]
+
+    def get_revenue_by_month(self):
+        mask = self._status_mask('completed')
+        months, inverse = np.unique(self._months(mask), return_inverse=True)
+        mask &= self.store.valid('orders', 'created_date')
+        revenue = np.bincount(inverse, weights=self.store.column('orders', 'total_amount')[mask])
+        return [(str(month), float(total)) for month, total in zip(months, revenue)]
+
+    def _period_counts(self, start, end, granularity, mask=None, weights=None):
+        labels, bounds = period_bounds(start, end, granularity)
+        if not labels:
+            return labels, []
+        timestamps = self.store.column('orders', 'created_date')
+        inside = (timestamps >= bounds[0]) & (timestamps < bounds[-1])
+        if mask is not None:
+            inside &= mask
+        index = np.searchsorted(bounds, timestamps[inside], side='right') - 1
+        weights = None if weights is None else weights[inside]
+        return labels, np.bincount(index, weights=weights, minlength=len(labels))
+
+    def get_period_totals(self, start, end, granularity='day'):
+        labels, counts = self._period_counts(start, end, granularity)
+        _, revenue = self._period_counts(start, end, granularity, self._status_mask('completed'),
+                                         self.store.column('orders', 'total_amount'))
+        return [(label, int(count), float(total)) for label, count, total in zip(labels, counts, revenue)]
+
+    def get_dashboard_snapshot(self):
+        status_codes = self.store.column('orders', 'status')
+        totals = self.store.column('orders', 'total_amount')
+        status_counts = {status: int(np.count_nonzero(status_codes == self.store.code('orders', 'status', status)))
+                         for status in ('completed', 'pending', 'cancelled')}
+
+        top_order = None
+        if len(totals):
+            # Самый крупный заказ, у которого есть клиент
+            customer_rows = self.store.row_index('customers', self.store.column('orders', 'customer_id'))
+            candidates = np.flatnonzero(customer_rows >= 0)
+            if len(candidates):
+                best = candidates[np.argmax(totals[candidates])]
+                top_order = {
+                    'id': int(self.store.column('orders', 'id')[best]),
+                    'total_amount': float(totals[best]),
+                    'customer_name': self.store.column('customers', 'name')[customer_rows[best]],
+                }
+
+        return {
+            'orders_count': self.get_orders_count(),
+            'customers_count': self.get_customers_count(),
+            'products_count': self.get_products_count(),
+            'total_revenue': self.get_total_revenue(),
+            'average_order_value': self.get_average_order_value(),
+            'status_counts': status_counts,
+            'top_order': top_order,
+        }
+
+
+def columnar_capable(method):
+    """Отвечает из колоночного экспорта, если он подключен к DatabaseManager"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.columnar is not None:
+            return getattr(self.columnar, method.__name__)(*args, **kwargs)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def import_columnar(directory, db):
+    """Загрузка колоночного экспорта в пустую базу данных DatabaseManager"""
+    store = ColumnarStore(directory)
+    with db.connection() as conn:
+        for table in TABLE_COLUMNS:
+            if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False, f"Таблица {table} не пуста, импорт возможен только в пустую базу"
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, columns in TABLE_COLUMNS.items():
+                names = [name for name, _ in columns]
+                readers = []
+                for name, kind in columns:
+                    column = store.column(table, name)
+                    if kind == 'dict':
+                        values = store.dictionary(table, name)
+                        readers.append(lambda i, c=column, v=values: v[c[i]])
+                    elif kind == 'timestamp':
+                        readers.append(lambda i, c=column: datetime.fromtimestamp(int(c[i]), timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+                    elif kind == 'int64':
+                        readers.append(lambda i, c=column: int(c[i]))
+                    elif kind == 'float64':
+                        readers.append(lambda i, c=column: float(c[i]))
+                    else:
+                        readers.append(lambda i, c=column: c[i])
+                    valid = store.valid(table, name)
+                    if not valid.all():
+                        readers[-1] = lambda i, read=readers[-1], v=valid: read(i) if v[i] else None
+
+                placeholders = ", ".join("?" * len(names))
+                rows = store.rows(table)
+                for start in range(0, rows, CHUNK_SIZE):
+                    conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})",
+                        ([read(i) for read in readers] for i in range(start, min(start + CHUNK_SIZE, rows)))
+                    )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            return False, f"Ошибка при импорте: {str(e)}"
+    db.query_cache.bump(*TABLE_COLUMNS)
+    if db.catalog is not None:
+        db.catalog.invalidate()
+    return True, "Импортировано: " + ", ".join(f"{table} - {store.rows(table)}" for table in TABLE_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Колоночный экспорт/импорт базы данных заказов")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="Экспорт БД в каталог")
+    export_parser.add_argument('db_name')
+    export_parser.add_argument('directory')
+    import_parser = subparsers.add_parser('import', help="Импорт каталога в пустую БД")
+    import_parser.add_argument('directory')
+    import_parser.add_argument('db_name')
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db = DatabaseManager(args.db_name)
+    if args.command == 'export':
+        manifest = export_columnar(db, args.directory)
+        for table, info in manifest['tables'].items():
+            print(f"{table}: {info['rows']} строк")
+    else:
+        success, message = import_columnar(args.directory, db)
+        print(message)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Профили настроек SQLite, применяемые к каждому новому соединению
+PROFILES = {
+    # Как было до профилей: журнал отката, полная синхронизация
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    # WAL: читатели не блокируют писателя и наоборот, без потери надежности
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    # WAL с отложенной синхронизацией, крупным кэшем и mmap.
+    # При сбое питания можно потерять последние транзакции, но не целостность БД
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
+
+PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+
+def resolve_profile(profile):
+    """Имя профиля или словарь PRAGMA -> проверенный словарь настроек"""
+    if profile is None:
+        return {}
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Неизвестный профиль: {profile}. Доступны: {', '.join(PROFILES)}")
+        return dict(PROFILES[profile])
+    unknown = set(profile) - set(PRAGMAS)
+    if unknown:
+        raise ValueError(f"Неподдерживаемые PRAGMA: {', '.join(sorted(unknown))}")
+    for name, value in profile.items():
+        # Значения подставляются в текст PRAGMA, поэтому допускаются только числа и слова
+        if not str(value).lstrip('-').isalnum():
+            raise ValueError(f"Недопустимое значение PRAGMA {name}: {value}")
+    return dict(profile)
+
+
+class ConnectionPool:
+    """Потокобезопасный пул долгоживущих соединений SQLite"""
+
+    def __init__(self, db_name, size=5, timeout=10.0, health_check_interval=30.0, profile=None,
+                 factory=sqlite3.Connection, wait_listener=None, cached_statements=128):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+        if cached_statements < 0:
+            raise ValueError("Размер кэша запросов не может быть отрицательным")
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.pragmas = resolve_profile(profile)
+        self.factory = factory
+        # Скомпилированных запросов в кэше каждого соединения (0 - без кэша)
+        self.cached_statements = cached_statements
+        # Вызывается с временем ожидания соединения в секундах
+        self.wait_listener = wait_listener
+
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._condition = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._last_used = {}
+
+    def _connect(self):
+        # Соединения переходят между потоками, поэтому проверку потока отключаем:
+        # в каждый момент соединение принадлежит только одному потоку
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, factory=self.factory,
+                               cached_statements=self.cached_statements)
+        try:
+            for name in PRAGMAS:
+                if name in self.pragmas:
+                    conn.execute(f"PRAGMA {name} = {self.pragmas[name]}")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Пул соединений закрыт")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Нет свободных соединений в пуле")
+                self._condition.wait(remaining)
+
+        if conn is None:
+            try:
+                return self._connect()
+            except Exception:
+                with self._condition:
+                    self._created -= 1
+                    self._condition.notify()
+                raise
+
+        # Проверка "здоровья" соединения, простаивавшего дольше интервала
+        last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            self._last_used.pop(id(conn), None)
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._condition:
+                    self._created -= 1
+                    self._condition.notify()
+                raise
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._condition:
+            if self._closed:
+                self._last_used.pop(id(conn), None)
+                conn.close()
+                self._created -= 1
+                return
+            self._last_used[id(conn)] = time.monotonic()
+            self._idle.append(conn)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение текущему потоку.
+
+        Повторный (вложенный) запрос из того же потока получает то же соединение.
+        При исключении незавершенная транзакция откатывается.
+        """
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        started = time.perf_counter()
+        conn = self._acquire()
+        if self.wait_listener is not None:
+            self.wait_listener(time.perf_counter() - started)
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def stats(self):
+        """Текущее состояние пула"""
+        with self._condition:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+            }
+
+    def close(self):
+        """Закрывает все свободные соединения; занятые закроются при возврате"""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                conn = self._idle.pop()
+                self._last_used.pop(id(conn), None)
+                conn.close()
+                self._created -= 1
+            self._condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,9 +1,13 @@
 from database import DatabaseManager
+from numpy_analytics import bucket_label, order_value_distribution
 
 
 class ConsoleAnalyticsInterface:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, profile=False):
+        # Записи консоли управления (другой процесс) сбрасывают кэш через PRAGMA data_version,
+        # поэтому срок жизни записей не ограничен.
+        # Профилирование замедляет запросы и включается явно (main_analytics.py --profile)
+        self.db = DatabaseManager(cache_size=128, cache_ttl=None, instrument=profile)
 
     def display_menu(self):
         print("\n=== СИСТЕМА УЧЕТА ЗАКАЗОВ - АНАЛИТИКА ===")
@@ -13,6 +17,10 @@ class ConsoleAnalyticsInterface:
         print("4. Лучший клиент")
         print("5. Заказы по месяцам")
         print("6. Выручка по месяцам")
+        print("7. Проверка сводных таблиц")
+        print("8. Статистика кэша запросов")
+        print("9. Профилирование запросов")
+        print("10. Заказы и выручка за период")
         print("0. Выход")
 
     def run(self):
@@ -32,6 +40,14 @@ class ConsoleAnalyticsInterface:
                 self.show_orders_by_month()
             elif choice == '6':
                 self.show_revenue_by_month()
+            elif choice == '7':
+                self.check_summaries()
+            elif choice == '8':
+                self.show_cache_stats()
+            elif choice == '9':
+                self.show_query_profile()
+            elif choice == '10':
+                self.show_period_statistics()
             elif choice == '0':
                 print("Выход из программы...")
                 break
@@ -41,33 +57,26 @@ class ConsoleAnalyticsInterface:
     def show_general_statistics(self):
         print("\n--- ОБЩАЯ СТАТИСТИКА ---")
 
-        total_orders = self.db.get_orders_count()
-        total_customers = self.db.get_customers_count()
-        total_products = self.db.get_products_count()
-        total_revenue = self.db.get_total_revenue()
-        avg_order_value = self.db.get_average_order_value()
+        snapshot = self.db.get_dashboard_snapshot()
 
-        print(f"📊 Общее количество заказов: {total_orders}")
-        print(f"👥 Общее количество клиентов: {total_customers}")
-        print(f"📦 Общее количество товаров: {total_products}")
-        print(f"💰 Общая выручка: {total_revenue:.2f} руб.")
-        print(f"💳 Средний чек: {avg_order_value:.2f} руб.")
+        print(f"📊 Общее количество заказов: {snapshot['orders_count']}")
+        print(f"👥 Общее количество клиентов: {snapshot['customers_count']}")
+        print(f"📦 Общее количество товаров: {snapshot['products_count']}")
+        print(f"💰 Общая выручка: {snapshot['total_revenue']:.2f} руб.")
+        print(f"💳 Средний чек: {snapshot['average_order_value']:.2f} руб.")
 
         # Дополнительная статистика
-        orders = self.db.get_all_orders()
-        if orders:
-            completed_orders = len([o for o in orders if o['status'] == 'completed'])
-            pending_orders = len([o for o in orders if o['status'] == 'pending'])
-            cancelled_orders = len([o for o in orders if o['status'] == 'cancelled'])
+        if snapshot['orders_count']:
+            completed_orders = snapshot['status_counts']['completed']
 
             print(f"\n📈 Статусы заказов:")
             print(f"   ✅ Выполнено: {completed_orders}")
-            print(f"   ⏳ В ожидании: {pending_orders}")
-            print(f"   ❌ Отменено: {cancelled_orders}")
+            print(f"   ⏳ В ожидании: {snapshot['status_counts']['pending']}")
+            print(f"   ❌ Отменено: {snapshot['status_counts']['cancelled']}")
 
             # Самый дорогой заказ
-            if completed_orders > 0:
-                max_order = max(orders, key=lambda x: x['total_amount'])
+            max_order = snapshot['top_order']
+            if completed_orders > 0 and max_order:
                 print(f"\n🏆 Самый дорогой заказ:")
                 print(f"   Заказ №{max_order['id']}: {max_order['total_amount']:.2f} руб.")
                 print(f"   Клиент: {max_order['customer_name']}")
@@ -97,30 +106,22 @@ class ConsoleAnalyticsInterface:
 
         print(f"💳 Средний чек за все заказы: {avg_value:.2f} руб.")
 
-        # Дополнительная аналитика по чекам
-        orders = self.db.get_all_orders()
-        if orders:
-            completed_orders = [o for o in orders if o['status'] == 'completed']
-            if completed_orders:
-                order_values = [o['total_amount'] for o in completed_orders]
-                min_value = min(order_values)
-                max_value = max(order_values)
-
-                print(f"📊 Анализ чеков выполненных заказов:")
-                print(f"   Минимальный чек: {min_value:.2f} руб.")
-                print(f"   Максимальный чек: {max_value:.2f} руб.")
-                print(f"   Средний чек: {avg_value:.2f} руб.")
-
-                # Распределение по диапазонам
-                ranges = [0, 1000, 5000, 10000, 50000, float('inf')]
-                range_labels = ["до 1,000", "1,000-5,000", "5,000-10,000", "10,000-50,000", "свыше 50,000"]
-
-                print(f"\n📈 Распределение заказов по сумме:")
-                for i in range(len(ranges) - 1):
-                    count = len([v for v in order_values if ranges[i] <= v < ranges[i + 1]])
-                    if count > 0:
-                        percentage = (count / len(order_values)) * 100
-                        print(f"   {range_labels[i]} руб.: {count} заказов ({percentage:.1f}%)")
+        # Дополнительная аналитика по чекам выполненных заказов
+        distribution = order_value_distribution(self.db)
+        if distribution:
+            print(f"📊 Анализ чеков выполненных заказов:")
+            print(f"   Минимальный чек: {distribution['min']:.2f} руб.")
+            print(f"   Максимальный чек: {distribution['max']:.2f} руб.")
+            print(f"   Средний чек: {avg_value:.2f} руб.")
+            print(f"   Медиана: {distribution['percentiles'][50]:.2f} руб., "
+                  f"90% заказов до {distribution['percentiles'][90]:.2f} руб.")
+
+            # Распределение по диапазонам
+            print(f"\n📈 Распределение заказов по сумме:")
+            for low, high, count in distribution['histogram']:
+                if count > 0:
+                    percentage = (count / distribution['count']) * 100
+                    print(f"   {bucket_label(low, high)} руб.: {count} заказов ({percentage:.1f}%)")
 
     def show_best_customer(self):
         print("\n--- ЛУЧШИЙ КЛИЕНТ ---")
@@ -133,21 +134,7 @@ class ConsoleAnalyticsInterface:
         # Топ-5 клиентов
         print(f"\n📊 Топ-5 клиентов по сумме заказов:")
 
-        conn = self.db._get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT c.name, SUM(o.total_amount) as total_spent
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.id
-            WHERE o.status = 'completed'
-            GROUP BY c.id, c.name
-            ORDER BY total_spent DESC
-            LIMIT 5
-        ''')
-
-        top_customers = cursor.fetchall()
-        conn.close()
+        top_customers = self.db.get_top_customers(5)
 
         for i, (name, spent) in enumerate(top_customers, 1):
             print(f"{i}. {name}: {spent:.2f} руб.")
@@ -210,7 +197,88 @@ class ConsoleAnalyticsInterface:
             avg_monthly = total_revenue / len(monthly_revenue)
             print(f"📊 Средняя месячная выручка: {avg_monthly:.2f} руб.")
 
-    def _get_connection(self):
-        """Вспомогательный метод для получения соединения (для аналитических запросов)"""
-        import sqlite3
-        return sqlite3.connect(self.db.db_name)
\ No newline at end of file
+    def show_period_statistics(self):
+        print("\n--- ЗАКАЗЫ И ВЫРУЧКА ЗА ПЕРИОД ---")
+
+        try:
+            start = input("Начало периода (ГГГГ-ММ-ДД): ").strip()
+            end = input("Конец периода, не включая (ГГГГ-ММ-ДД): ").strip()
+            granularity = input("Шаг (hour/day/week/month) [day]: ").strip() or 'day'
+            totals = self.db.get_period_totals(start, end, granularity)
+        except ValueError as e:
+            print(f"Неверные параметры: {e}")
+            return
+
+        if not totals:
+            print("Пустой период.")
+            return
+
+        for label, count, total in totals:
+            print(f"   {label}: {count} заказов, выручка {total:.2f} руб.")
+        print(f"\n📈 Всего заказов: {sum(count for _, count, _ in totals)}, "
+              f"выручка: {sum(total for _, _, total in totals):.2f} руб.")
+
+    def check_summaries(self):
+        print("\n--- ПРОВЕРКА СВОДНЫХ ТАБЛИЦ ---")
+
+        problems = self.db.check_summaries()
+        if not problems:
+            print("✅ Сводные таблицы согласованы с данными")
+            return
+
+        print(f"❌ Найдено расхождений: {len(problems)}")
+        for table, key, expected, actual in problems[:10]:
+            print(f"   {table} [{key}]: ожидалось {expected}, сохранено {actual}")
+
+        confirmation = input("Пересчитать сводные таблицы? (да/нет): ").strip().lower()
+        if confirmation == 'да':
+            success, message = self.db.rebuild_summaries()
+            print(message)
+
+    def show_cache_stats(self):
+        print("\n--- КЭШ ЗАПРОСОВ ---")
+
+        stats = self.db.query_cache.stats()
+        print(f"📦 Записей: {stats['size']} из {stats['max_size']}")
+        print(f"✅ Попаданий: {stats['hits']}")
+        print(f"❌ Промахов: {stats['misses']} (доля попаданий {stats['hit_rate'] * 100:.1f}%)")
+        print(f"🔄 Устарело после записи: {stats['invalidations']}")
+        print(f"⌛ Истек срок жизни: {stats['expirations']}")
+        print(f"🗑 Вытеснено: {stats['evictions']}")
+
+    def show_query_profile(self, limit=10):
+        print("\n--- ПРОФИЛИРОВАНИЕ ЗАПРОСОВ ---")
+
+        if self.db.instrumentation is None:
+            print("Профилирование выключено. Запустите: python main_analytics.py --profile")
+            return
+
+        snapshot = self.db.instrumentation.snapshot()
+
+        print(f"\n⏱ Методы (топ {limit} по суммарному времени):")
+        methods = sorted(snapshot['methods'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        for name, stats in methods[:limit]:
+            print(f"   {name:<28} вызовов: {stats['count']:>6}  всего: {stats['total_ms']:9.1f} мс  "
+                  f"p50: {stats['p50_ms']:7.2f}  p99: {stats['p99_ms']:7.2f} мс")
+
+        print(f"\n🗄 SQL-запросы (топ {limit} по суммарному времени):")
+        statements = sorted(snapshot['statements'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        for sql, stats in statements[:limit]:
+            print(f"   {sql[:90]}")
+            print(f"      вызовов: {stats['count']}  всего: {stats['total_ms']:.1f} мс  "
+                  f"p99: {stats['p99_ms']:.2f} мс  строк: {stats['rows']}")
+
+        wait = snapshot['connection_wait']
+        print(f"\n🔌 Ожидание соединения: {wait['count']} раз, всего {wait['total_ms']:.1f} мс, "
+              f"макс. {wait['max_ms']:.2f} мс")
+
+        slow = snapshot['slow_queries']
+        print(f"\n🐢 Медленные запросы (дольше {self.db.instrumentation.slow_threshold * 1000:.0f} мс): {len(slow)}")
+        for entry in slow[-5:]:
+            print(f"   [{entry['time']}] {entry['ms']:.1f} мс: {entry['sql'][:90]}")
+            for step in entry['plan'] or []:
+                print(f"      {step}")
+
+        if input("\nСбросить статистику? (да/нет): ").strip().lower() == 'да':
+            self.db.instrumentation.reset()
+            print("Статистика сброшена")
\ No newline at end of file
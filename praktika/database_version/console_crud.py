@@ -2,8 +2,50 @@ from database import DatabaseManager
 
 
 class ConsoleCRUDInterface:
+    PAGE_SIZE = 20
+
     def __init__(self):
-        self.db = DatabaseManager()
+        # Товары читаются из каталога в памяти: поиск товара при вводе заказа не обращается к БД
+        self.db = DatabaseManager(catalog=True)
+
+    def _show_paged(self, items, print_item):
+        """Постраничный вывод; возвращает количество показанных записей"""
+        shown = 0
+        for item in items:
+            if shown and shown % self.PAGE_SIZE == 0:
+                answer = input(f"-- Показано {shown}. Enter - следующая страница, q - выход: ").strip().lower()
+                if answer == 'q':
+                    break
+            print_item(item)
+            shown += 1
+        return shown
+
+    def _search_pages(self, search, text):
+        """Результаты поиска, запрашиваемые у БД по одной странице"""
+        offset = 0
+        while True:
+            page = search(text, limit=self.PAGE_SIZE, offset=offset)
+            yield from page
+            if len(page) < self.PAGE_SIZE:
+                return
+            offset += self.PAGE_SIZE
+
+    def _choose_id(self, prompt, search, print_item):
+        """ID из ввода; текст вместо числа запускает поиск. None - пустой ввод"""
+        while True:
+            text = input(prompt).strip()
+            if not text:
+                return None
+            if text.isdigit():
+                return int(text)
+            if not self._show_paged(self._search_pages(search, text), print_item):
+                print("Ничего не найдено.")
+
+    def _print_customer(self, customer):
+        print(f"ID: {customer.id}, Имя: {customer.name}, Email: {customer.email}, Телефон: {customer.phone}")
+
+    def _print_product(self, product):
+        print(f"ID: {product.id}, Название: {product.name}, Цена: {product.price}, Кол-во: {product.quantity}")
 
     def display_menu(self):
         print("\n=== СИСТЕМА УЧЕТА ЗАКАЗОВ - УПРАВЛЕНИЕ ===")
@@ -21,6 +63,7 @@ class ConsoleCRUDInterface:
         print("3. Найти клиента по ID")
         print("4. Редактировать клиента")
         print("5. Удалить клиента")
+        print("6. Поиск клиентов")
         print("0. Назад")
 
     def display_products_menu(self):
@@ -30,6 +73,8 @@ class ConsoleCRUDInterface:
         print("3. Найти товар по ID")
         print("4. Редактировать товар")
         print("5. Удалить товар")
+        print("6. Поиск товаров")
+        print("7. Каталог товаров в памяти")
         print("0. Назад")
 
     def display_orders_menu(self):
@@ -77,20 +122,23 @@ class ConsoleCRUDInterface:
                 self.update_customer()
             elif choice == '5':
                 self.delete_customer()
+            elif choice == '6':
+                self.search_customers()
             elif choice == '0':
                 break
             else:
                 print("Неверный выбор!")
 
     def show_all_customers(self):
-        customers = self.db.get_all_customers()
-        if not customers:
+        print("\n--- Все клиенты ---")
+        shown = self._show_paged(self.db.iter_customers(batch_size=self.PAGE_SIZE), self._print_customer)
+        if not shown:
             print("Клиенты не найдены.")
-            return
 
-        print("\n--- Все клиенты ---")
-        for customer in customers:
-            print(f"ID: {customer.id}, Имя: {customer.name}, Email: {customer.email}, Телефон: {customer.phone}")
+    def search_customers(self):
+        text = input("Имя, email или телефон (можно начало слова): ").strip()
+        if not self._show_paged(self._search_pages(self.db.search_customers, text), self._print_customer):
+            print("Клиенты не найдены.")
 
     def add_customer(self):
         print("\n--- Добавление клиента ---")
@@ -175,20 +223,34 @@ class ConsoleCRUDInterface:
                 self.update_product()
             elif choice == '5':
                 self.delete_product()
+            elif choice == '6':
+                self.search_products()
+            elif choice == '7':
+                self.show_catalog_stats()
             elif choice == '0':
                 break
             else:
                 print("Неверный выбор!")
 
     def show_all_products(self):
-        products = self.db.get_all_products()
-        if not products:
+        print("\n--- Все товары ---")
+        shown = self._show_paged(self.db.iter_products(batch_size=self.PAGE_SIZE), self._print_product)
+        if not shown:
             print("Товары не найдены.")
-            return
 
-        print("\n--- Все товары ---")
-        for product in products:
-            print(f"ID: {product.id}, Название: {product.name}, Цена: {product.price}, Кол-во: {product.quantity}")
+    def search_products(self):
+        text = input("Название (можно начало слова): ").strip()
+        if not self._show_paged(self._search_pages(self.db.search_products, text), self._print_product):
+            print("Товары не найдены.")
+
+    def show_catalog_stats(self):
+        print("\n--- Каталог товаров в памяти ---")
+
+        stats = self.db.catalog.stats()
+        print(f"Товаров: {stats['size']}, память: {stats['memory_bytes'] / 1024:.1f} КБ")
+        print(f"Попаданий: {stats['hits']}, загрузок: {stats['loads']} (доля попаданий {stats['hit_rate'] * 100:.1f}%)")
+        print(f"Сбросов (запись другим соединением или процессом): {stats['invalidations']}")
+        print(f"Изменений, записанных в каталог: {stats['write_throughs']}")
 
     def add_product(self):
         print("\n--- Добавление товара ---")
@@ -280,56 +342,45 @@ class ConsoleCRUDInterface:
                 print("Неверный выбор!")
 
     def show_all_orders(self):
-        orders = self.db.get_all_orders()
-        if not orders:
+        print("\n--- Все заказы ---")
+        shown = self._show_paged(self.db.iter_orders(batch_size=self.PAGE_SIZE), self._print_order)
+        if not shown:
             print("Заказы не найдены.")
-            return
 
-        print("\n--- Все заказы ---")
-        for order in orders:
-            print(f"\nЗаказ №{order['id']}")
-            print(f"Клиент: {order['customer_name']} (ID: {order['customer_id']})")
-            print(f"Сумма: {order['total_amount']}")
-            print(f"Статус: {order['status']}")
-            print(f"Дата: {order['created_date']}")
-            print("Товары:")
-            for product in order['products']:
-                print(f"  - {product['name']}: {product['quantity']} шт. x {product['price']} руб.")
+    def _print_order(self, order):
+        print(f"\nЗаказ №{order.id}")
+        print(f"Клиент: {order.customer_name} (ID: {order.customer_id})")
+        print(f"Сумма: {order.total_amount}")
+        print(f"Статус: {order.status}")
+        print(f"Дата: {order.created_date}")
+        print("Товары:")
+        for product in order.products:
+            print(f"  - {product.name}: {product.quantity} шт. x {product.price} руб.")
 
     def create_order(self):
         print("\n--- Создание заказа ---")
 
-        customers = self.db.get_all_customers()
-        if not customers:
-            print("Нет клиентов для создания заказа!")
-            return
-
-        print("Доступные клиенты:")
-        for customer in customers:
-            print(f"ID: {customer.id}, Имя: {customer.name}")
-
-        try:
-            customer_id = int(input("Введите ID клиента: ").strip())
-        except ValueError:
-            print("Неверный формат ID!")
-            return
-
-        products = self.db.get_all_products()
-        if not products:
-            print("Нет товаров для заказа!")
+        # Вместо вывода всех клиентов и товаров - поиск по введенному тексту
+        customer_id = self._choose_id("Введите ID клиента или имя/email/телефон для поиска: ",
+                                      self.db.search_customers, self._print_customer)
+        if customer_id is None:
+            print("Клиент не выбран!")
             return
 
-        print("\nДоступные товары:")
-        for product in products:
-            print(f"ID: {product.id}, Название: {product.name}, Цена: {product.price}, В наличии: {product.quantity}")
-
         order_products = []
         while True:
             try:
-                product_id = int(input("Введите ID товара (0 для завершения): ").strip())
-                if product_id == 0:
+                product_id = self._choose_id("\nВведите ID товара или название для поиска (0 для завершения): ",
+                                             self.db.search_products, self._print_product)
+                if not product_id:
                     break
 
+                product = self.db.get_product_by_id(product_id)
+                if not product:
+                    print("Товар не найден!")
+                    continue
+                print(f"{product.name}: {product.price} руб., в наличии {product.quantity}")
+
                 quantity = int(input("Введите количество: ").strip())
 
                 if quantity <= 0:
@@ -380,11 +431,8 @@ class ConsoleCRUDInterface:
                 print("Неверный статус!")
                 return
 
-            success = self.db.update_order_status(order_id, status)
-            if success:
-                print("Статус заказа обновлен!")
-            else:
-                print("Заказ не найден!")
+            success, message = self.db.update_order_statuses([(order_id, status)])[0]
+            print(f"{message}!" if success else message)
         except ValueError:
             print("Неверный формат ID!")
 
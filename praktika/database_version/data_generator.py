@@ -0,0 +1,361 @@
+"""Генератор синтетических данных для нагрузочных испытаний
+
+Данные детерминированы: одинаковые seed и параметры дают одинаковую базу при
+любом количестве процессов (заказы генерируются блоками, у каждого блока свой
+генератор случайных чисел, а запись идет в порядке блоков).
+
+Распределения:
+- популярность товаров и активность клиентов - закон Ципфа;
+- даты заказов - сезонность по месяцам и выходным, id растут вместе с датой;
+- статусы - фиксированная доля completed/pending/cancelled.
+
+Сгенерированный остаток товара - начальный запас с запасом на ожидаемый спрос.
+Незавершенные и выполненные заказы списывают свои позиции при записи (в порядке
+блоков, поэтому результат не зависит от числа процессов); заказ, которому не
+хватило остатка, записывается отмененным. Отмена и удаление заказа возвращают на
+склад ровно то, что было списано. Загрузка идет одной
+транзакцией BEGIN IMMEDIATE пакетами executemany, триггеры сводных таблиц и
+поисковых индексов на время загрузки отключаются, а сводные таблицы и индексы
+пересчитываются в конце. Если
+добавляется больше заказов, чем уже есть в БД, вторичные индексы удаляются и
+строятся заново после загрузки - это быстрее, чем обновлять их построчно.
+
+Запуск:
+    python data_generator.py orders.db --customers 100000 --products 10000 --orders 1000000 --shards 4
+"""
+import argparse
+import bisect
+import itertools
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+
+from search import search_triggers_suspended
+from summaries import summary_triggers_suspended
+
+BLOCK_SIZE = 10000
+TABLES = ('customers', 'products', 'orders', 'order_items')
+
+FIRST_NAMES = [
+    ("Иван", "ivan", "m"), ("Петр", "petr", "m"), ("Сергей", "sergey", "m"), ("Алексей", "aleksey", "m"),
+    ("Дмитрий", "dmitriy", "m"), ("Андрей", "andrey", "m"), ("Михаил", "mikhail", "m"), ("Олег", "oleg", "m"),
+    ("Мария", "maria", "f"), ("Анна", "anna", "f"), ("Елена", "elena", "f"), ("Ольга", "olga", "f"),
+    ("Наталья", "natalya", "f"), ("Татьяна", "tatyana", "f"), ("Ирина", "irina", "f"), ("Светлана", "svetlana", "f"),
+]
+LAST_NAMES = [
+    ("Иванов", "ivanov"), ("Петров", "petrov"), ("Сидоров", "sidorov"), ("Смирнов", "smirnov"),
+    ("Кузнецов", "kuznetsov"), ("Попов", "popov"), ("Соколов", "sokolov"), ("Морозов", "morozov"),
+    ("Волков", "volkov"), ("Козлов", "kozlov"), ("Лебедев", "lebedev"), ("Новиков", "novikov"),
+]
+EMAIL_DOMAINS = ["mail.ru", "yandex.ru", "gmail.com", "bk.ru"]
+
+# Категория и диапазон цен
+PRODUCT_CATEGORIES = [
+    ("Ноутбук", 30000, 150000), ("Монитор", 8000, 60000), ("Клавиатура", 800, 12000),
+    ("Мышь", 400, 6000), ("Наушники", 1000, 30000), ("Веб-камера", 1500, 12000),
+    ("Микрофон", 2000, 25000), ("Коврик для мыши", 200, 3000), ("Смартфон", 10000, 120000),
+    ("Планшет", 12000, 90000), ("Колонки", 1500, 40000), ("Роутер", 1500, 20000),
+]
+BRANDS = ["HP", "Sony", "Logitech", "Samsung", "Xiaomi", "Asus", "Lenovo", "Dell", "Acer", "Apple"]
+
+# Сезонность: вес заказов по месяцам (пик - ноябрь/декабрь) и по выходным
+MONTH_WEIGHTS = (0.80, 0.75, 0.90, 0.95, 1.00, 0.90, 0.85, 0.90, 1.00, 1.10, 1.35, 1.60)
+WEEKEND_WEIGHT = 1.2
+
+STATUS_MIX = (('completed', 0.70), ('pending', 0.20), ('cancelled', 0.10))
+ITEMS_PER_ORDER = ((1, 0.40), (2, 0.30), (3, 0.20), (4, 0.10))
+ITEM_QUANTITY = ((1, 0.70), (2, 0.20), (3, 0.10))
+
+_worker_state = None
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def zipf_weights(count, exponent):
+    """Кумулятивные веса закона Ципфа для рангов 1..count"""
+    return _cumulative(1.0 / rank ** exponent for rank in range(1, count + 1))
+
+
+def _choice_table(pairs):
+    values, weights = zip(*pairs)
+    return list(values), _cumulative(weights)
+
+
+def _choices(rng, table, k):
+    values, cum_weights = table
+    return rng.choices(values, cum_weights=cum_weights, k=k)
+
+
+def _day_weights(start, end):
+    days = (end - start).days + 1
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weight = MONTH_WEIGHTS[day.month - 1]
+        if day.weekday() >= 5:
+            weight *= WEEKEND_WEIGHT
+        weights.append(weight)
+    return _cumulative(weights)
+
+
+def _generate_customers(rng, first_id, count):
+    for customer_id in range(first_id, first_id + count):
+        first, first_latin, gender = rng.choice(FIRST_NAMES)
+        last, last_latin = rng.choice(LAST_NAMES)
+        if gender == "f":
+            last, last_latin = last + "а", last_latin + "a"
+        email = f"{first_latin}.{last_latin}{customer_id}@{rng.choice(EMAIL_DOMAINS)}"
+        phone = f"+79{rng.randrange(10 ** 9):09d}"
+        yield customer_id, f"{first} {last}", email, phone
+
+
+def _generate_products(rng, first_id, count):
+    for product_id in range(first_id, first_id + count):
+        category, low, high = rng.choice(PRODUCT_CATEGORIES)
+        # Логарифмически равномерная цена: дешевых моделей больше, чем дорогих
+        price = round(low * (high / low) ** rng.random(), -1)
+        name = f"{category} {rng.choice(BRANDS)} {rng.randint(100, 999)}"
+        yield product_id, name, price, rng.randint(10, 1000)
+
+
+def _mean(pairs):
+    return sum(value * weight for value, weight in pairs) / sum(weight for _, weight in pairs)
+
+
+def _initial_stock(product_ids, product_cum, orders):
+    """Добавка к остатку товара: ожидаемый спрос незавершенных и выполненных заказов с запасом в 3 сигмы"""
+    share = 1 - dict(STATUS_MIX)['cancelled'] / sum(weight for _, weight in STATUS_MIX)
+    units = orders * share * _mean(ITEMS_PER_ORDER) * _mean(ITEM_QUANTITY)
+    stock = {}
+    previous = 0.0
+    for product_id, cumulative in zip(product_ids, product_cum):
+        expected = units * (cumulative - previous) / product_cum[-1]
+        previous = cumulative
+        stock[product_id] = math.ceil(expected + 3 * math.sqrt(expected))
+    return stock
+
+
+def _reserve_stock(orders, items, stock):
+    """Списывает позиции заказов (кроме отмененных) с остатков stock.
+
+    Заказ, которому не хватает остатка, становится отмененным. Возвращает строки заказов.
+    """
+    lines = {}
+    for item in items:
+        lines.setdefault(item[0], []).append(item)
+    result = []
+    for order in orders:
+        if order[3] != 'cancelled':
+            order_lines = lines.get(order[0], ())
+            # Товары в позициях одного заказа не повторяются
+            if all(stock[product_id] >= quantity for _, product_id, quantity, _, _ in order_lines):
+                for _, product_id, quantity, _, _ in order_lines:
+                    stock[product_id] -= quantity
+            else:
+                order = (*order[:3], 'cancelled', order[4])
+        result.append(order)
+    return result
+
+
+def _next_id(conn, table):
+    """Первый свободный id таблицы с AUTOINCREMENT: id из sqlite_sequence не используются повторно"""
+    return conn.execute(
+        "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0)) + 1", (table,)
+    ).fetchone()[0]
+
+
+def _advance_sequence(conn, table, last_id):
+    """Сдвигает sqlite_sequence таблицы до last_id после вставки строк с явными id"""
+    updated = conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (last_id, table))
+    if not updated.rowcount:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, last_id))
+
+
+@contextmanager
+def _indexes_deferred(conn):
+    """Вторичные индексы таблиц удаляются и создаются заново после загрузки"""
+    placeholders = ", ".join("?" * len(TABLES))
+    indexes = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({placeholders})", TABLES
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    yield
+    for _, sql in indexes:
+        conn.execute(sql)
+
+
+def _init_worker(state):
+    global _worker_state
+    _worker_state = state
+
+
+def _generate_order_block(block):
+    """Заказы и позиции блока block; результат зависит только от seed и номера блока"""
+    state = _worker_state
+    rng = random.Random(f"{state['seed']}:orders:{block}")
+    first = block * BLOCK_SIZE
+    count = min(BLOCK_SIZE, state['orders'] - first)
+
+    # Блок занимает свой отрезок распределения дат, поэтому даты растут вместе с id
+    day_cum = state['day_cum']
+    low = day_cum[-1] * first / state['orders']
+    high = day_cum[-1] * (first + count) / state['orders']
+    timestamps = []
+    for point in sorted(low + (high - low) * rng.random() for _ in range(count)):
+        day = min(bisect.bisect_left(day_cum, point), len(day_cum) - 1)
+        day_start = day_cum[day - 1] if day else 0.0
+        # Положение точки внутри веса дня задает время суток
+        fraction = (point - day_start) / (day_cum[day] - day_start)
+        timestamps.append(day * 86400 + min(int(fraction * 86400), 86399))
+
+    customers = rng.choices(state['customer_ids'], cum_weights=state['customer_cum'], k=count)
+    statuses = _choices(rng, state['statuses'], count)
+    item_counts = _choices(rng, state['items_per_order'], count)
+
+    orders, items = [], []
+    for i in range(count):
+        order_id = state['order_base'] + first + i
+        lines = {}
+        for product_id in rng.choices(state['product_ids'], cum_weights=state['product_cum'], k=item_counts[i]):
+            lines[product_id] = lines.get(product_id, 0) + _choices(rng, state['item_quantity'], 1)[0]
+        total = 0
+        for product_id, quantity in lines.items():
+            price = state['prices'][product_id - state['product_base']]
+            total += price * quantity
+            items.append((order_id, product_id, quantity, price, price * quantity))
+        created = state['start'] + timedelta(seconds=timestamps[i])
+        orders.append((order_id, customers[i], total, statuses[i], created.strftime('%Y-%m-%d %H:%M:%S')))
+    return orders, items
+
+
+def generate_data(db, customers=10000, products=1000, orders=100000, seed=42, shards=1,
+                  product_skew=1.1, customer_skew=0.6, start=date(2023, 1, 1), end=date(2025, 12, 31),
+                  batch_size=50000, defer_indexes=None):
+    """Заполняет БД синтетическими данными; возвращает отчет с количеством строк и скоростью.
+
+    shards > 1 - заказы генерируются в нескольких процессах, запись остается в одном
+    соединении (SQLite допускает одного писателя). Данные добавляются к существующим.
+    defer_indexes=None - перестраивать индексы, только если данных добавляется больше, чем есть.
+    """
+    started = time.perf_counter()
+    rng = random.Random(f"{seed}:catalog")
+    counts = {'customers': customers, 'products': products, 'orders': orders, 'order_items': 0}
+
+    with db.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            customer_base = _next_id(conn, 'customers')
+            product_base = _next_id(conn, 'products')
+            order_base = _next_id(conn, 'orders')
+            if defer_indexes is None:
+                defer_indexes = orders >= conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+            with summary_triggers_suspended(conn), search_triggers_suspended(conn), \
+                    (_indexes_deferred(conn) if defer_indexes else nullcontext()):
+                generated = _generate_customers(rng, customer_base, customers)
+                while True:
+                    batch = list(itertools.islice(generated, batch_size))
+                    if not batch:
+                        break
+                    conn.executemany("INSERT INTO customers (id, name, email, phone) VALUES (?, ?, ?, ?)", batch)
+
+                catalog = list(_generate_products(rng, product_base, products))
+                stock = {row[0]: row[3] for row in catalog}
+                if orders and customers and products:
+                    # Ранги популярности назначаются товарам и клиентам в случайном порядке
+                    product_ids = [row[0] for row in catalog]
+                    rng.shuffle(product_ids)
+                    customer_ids = list(range(customer_base, customer_base + customers))
+                    rng.shuffle(customer_ids)
+                    product_cum = zipf_weights(products, product_skew)
+                    for product_id, extra in _initial_stock(product_ids, product_cum, orders).items():
+                        stock[product_id] += extra
+                for i in range(0, len(catalog), batch_size):
+                    conn.executemany("INSERT INTO products (id, name, price, quantity) VALUES (?, ?, ?, ?)",
+                                     [(*row[:3], stock[row[0]]) for row in catalog[i:i + batch_size]])
+
+                if orders and customers and products:
+                    state = {
+                        'seed': seed, 'orders': orders, 'order_base': order_base,
+                        'product_base': product_base, 'prices': [row[2] for row in catalog],
+                        'product_ids': product_ids, 'product_cum': product_cum,
+                        'customer_ids': customer_ids, 'customer_cum': zipf_weights(customers, customer_skew),
+                        'start': datetime.combine(start, datetime.min.time()), 'day_cum': _day_weights(start, end),
+                        'statuses': _choice_table(STATUS_MIX),
+                        'items_per_order': _choice_table(ITEMS_PER_ORDER),
+                        'item_quantity': _choice_table(ITEM_QUANTITY),
+                    }
+                    blocks = range((orders + BLOCK_SIZE - 1) // BLOCK_SIZE)
+                    executor = None
+                    if shards > 1:
+                        executor = ProcessPoolExecutor(max_workers=shards, initializer=_init_worker,
+                                                       initargs=(state,))
+                        results = executor.map(_generate_order_block, blocks)
+                    else:
+                        _init_worker(state)
+                        results = map(_generate_order_block, blocks)
+                    try:
+                        for order_rows, item_rows in results:
+                            order_rows = _reserve_stock(order_rows, item_rows, stock)
+                            conn.executemany(
+                                "INSERT INTO orders (id, customer_id, total_amount, status, created_date) "
+                                "VALUES (?, ?, ?, ?, ?)", order_rows)
+                            conn.executemany(
+                                "INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total) "
+                                "VALUES (?, ?, ?, ?, ?)", item_rows)
+                            counts['order_items'] += len(item_rows)
+                    finally:
+                        if executor is not None:
+                            executor.shutdown(cancel_futures=True)
+                    conn.executemany("UPDATE products SET quantity = ? WHERE id = ?",
+                                     [(quantity, product_id) for product_id, quantity in stock.items()])
+                else:
+                    counts['orders'] = 0
+            for table, base in (('customers', customer_base), ('products', product_base), ('orders', order_base)):
+                if counts[table]:
+                    _advance_sequence(conn, table, base + counts[table] - 1)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    db.query_cache.bump(*TABLES)
+    if db.catalog is not None:
+        db.catalog.invalidate()
+
+    seconds = time.perf_counter() - started
+    rows = sum(counts.values())
+    return dict(counts, rows=rows, seconds=seconds, rows_per_sec=rows / seconds if seconds > 0 else float('inf'))
+
+
+def format_report(report):
+    """Отчет generate_data одной строкой"""
+    return (f"Добавлено: {report['customers']} клиентов, {report['products']} товаров, "
+            f"{report['orders']} заказов, {report['order_items']} позиций "
+            f"за {report['seconds']:.2f} с ({report['rows_per_sec']:,.0f} строк/с)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных")
+    parser.add_argument('db_name', nargs='?', default="orders.db")
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shards', type=int, default=1, help="Процессов для генерации заказов")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    with DatabaseManager(args.db_name) as db:
+        report = generate_data(db, args.customers, args.products, args.orders, seed=args.seed, shards=args.shards)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
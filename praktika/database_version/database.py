@@ -1,593 +1,921 @@
+import random
 import sqlite3
+import time
 from datetime import datetime
-from models import Customer, Product, Order
+from catalog import ProductCatalog
+from connection_pool import ConnectionPool
+from data_generator import format_report, generate_data
+from instrumentation import Instrumentation
+from migrations import migrate
+from query_cache import QueryCache, cached, invalidates
+from columnar import ColumnarAnalytics, ColumnarStore, columnar_capable, export_columnar
+from search import match_expression, search_query, search_triggers_suspended
+from summaries import SUMMARY_SOURCES, check_summaries, rebuild_summaries
+from models import FROZEN_MODELS, MODELS, row_factory
+from periods import period_totals
+from statements import STATEMENTS, canonical_update
+
+# Ограничение на количество параметров в одном IN (...)
+MAX_IN_PARAMS = 900
+
+
+def _fetch_in(cursor, query, ids):
+    """Выполняет query с IN ({placeholders}) по частям и возвращает все строки"""
+    ids = list(ids)
+    rows = []
+    for start in range(0, len(ids), MAX_IN_PARAMS):
+        chunk = ids[start:start + MAX_IN_PARAMS]
+        cursor.execute(query.format(placeholders=", ".join("?" * len(chunk))), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def _is_busy_error(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
 
 
 class DatabaseManager:
-    def __init__(self, db_name="orders.db"):
+    def __init__(self, db_name="orders.db", pool_size=5, pool_timeout=10.0,
+                 busy_retries=5, busy_backoff=0.05, profile="durable", cache_size=0, cache_ttl=30.0,
+                 instrument=False, frozen_models=False, cached_statements=128, catalog=False):
         self.db_name = db_name
+        # Классы моделей: со __slots__, при frozen_models=True - неизменяемые
+        self.models = FROZEN_MODELS if frozen_models else MODELS
+        # Каталог товаров в памяти процесса; None - товары читаются из SQLite
+        self.catalog = ProductCatalog(self.models.Product) if catalog else None
+        # Профилирование: True или готовый Instrumentation (например, с другим порогом медленных запросов)
+        if instrument is True:
+            instrument = Instrumentation()
+        self.instrumentation = instrument or None
+        if self.instrumentation is not None:
+            self.pool = ConnectionPool(db_name, size=pool_size, timeout=pool_timeout, profile=profile,
+                                       cached_statements=cached_statements,
+                                       factory=self.instrumentation.connection_factory,
+                                       wait_listener=self.instrumentation.record_wait)
+            self.instrumentation.instrument(self)
+        else:
+            self.pool = ConnectionPool(db_name, size=pool_size, timeout=pool_timeout, profile=profile,
+                                       cached_statements=cached_statements)
+        # Кэш аналитики; cache_size=0 - выключен
+        self.query_cache = QueryCache(max_size=cache_size, ttl=cache_ttl)
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff
+        # Колоночный экспорт для аналитики; None - запросы идут в SQLite
+        self.columnar = None
         self.init_database()
 
+    def _retry_on_busy(self, func, *args):
+        """Повторяет транзакцию при SQLITE_BUSY с экспоненциальной задержкой"""
+        for attempt in range(self.busy_retries + 1):
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if not _is_busy_error(e) or attempt == self.busy_retries:
+                    raise
+                delay = self.busy_backoff * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+
+    def connection(self):
+        """Соединение из пула (контекстный менеджер)"""
+        return self.pool.connection()
+
+    def _commit(self, conn, stock=None, product_id=None):
+        """Фиксация транзакции; при включенном каталоге товаров изменения переносятся в него"""
+        if self.catalog is None:
+            conn.commit()
+        else:
+            self.catalog.commit(conn, stock, product_id)
+
+    def close(self):
+        """Закрытие всех соединений пула"""
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def export_columnar(self, directory):
+        """Экспорт таблиц в колоночный формат (.npy + manifest.json)"""
+        return export_columnar(self, directory)
+
+    def attach_columnar(self, directory):
+        """Аналитические методы начинают отвечать по колоночному экспорту из directory"""
+        self.columnar = ColumnarAnalytics(ColumnarStore(directory))
+        self.query_cache.clear()
+
+    def detach_columnar(self):
+        """Возврат аналитики к запросам в SQLite"""
+        self.columnar = None
+        self.query_cache.clear()
+
     def init_database(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                quantity INTEGER NOT NULL
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER,
-                total_amount REAL NOT NULL,
-                status TEXT DEFAULT 'pending',
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers (id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER,
-                product_id INTEGER,
-                quantity INTEGER NOT NULL,
-                FOREIGN KEY (order_id) REFERENCES orders (id),
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        """Создание/обновление схемы до последней версии миграций"""
+        with self.connection() as conn:
+            migrate(conn)
 
     # CRUD для клиентов
+    @invalidates('customers')
     def add_customer(self, name, email, phone):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?)",
-                (name, email, phone)
-            )
-            conn.commit()
-            customer_id = cursor.lastrowid
-            return customer_id
-        except sqlite3.IntegrityError:
-            return None
-        finally:
-            conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STATEMENTS['insert_customer'], (name, email, phone))
+                conn.commit()
+                customer_id = cursor.lastrowid
+                return customer_id
+            except sqlite3.IntegrityError:
+                return None
 
     def get_all_customers(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM customers")
-        customers = []
-        for row in cursor.fetchall():
-            customers.append(Customer(id=row[0], name=row[1], email=row[2], phone=row[3]))
-        conn.close()
-        return customers
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(self.models.Customer)
+            cursor.execute("SELECT * FROM customers")
+            return cursor.fetchall()
+
+    def iter_customers(self, batch_size=500):
+        """Постраничный обход клиентов (курсор по id)"""
+        last_id = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = row_factory(self.models.Customer)
+                cursor.execute(
+                    "SELECT * FROM customers WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )
+                customers = cursor.fetchmany(batch_size)
+            yield from customers
+            if len(customers) < batch_size:
+                return
+            last_id = customers[-1].id
 
     def get_customer_by_id(self, customer_id):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM customers WHERE id = ?", (customer_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return Customer(id=row[0], name=row[1], email=row[2], phone=row[3])
-        return None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(self.models.Customer)
+            cursor.execute(STATEMENTS['customer_by_id'], (customer_id,))
+            return cursor.fetchone()
 
+    @invalidates('customers')
     def update_customer(self, customer_id, name=None, email=None, phone=None):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        updates = []
-        params = []
-
-        if name:
-            updates.append("name = ?")
-            params.append(name)
-        if email:
-            updates.append("email = ?")
-            params.append(email)
-        if phone:
-            updates.append("phone = ?")
-            params.append(phone)
-
-        if not updates:
-            return False
-
-        params.append(customer_id)
-        query = f"UPDATE customers SET {', '.join(updates)} WHERE id = ?"
-
-        cursor.execute(query, params)
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        return success
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            # Пустые строки, как и None, означают "не менять"
+            update = canonical_update('customers', customer_id,
+                                      {'name': name or None, 'email': email or None, 'phone': phone or None})
+            if update is None:
+                return False
 
+            cursor.execute(*update)
+            conn.commit()
+            success = cursor.rowcount > 0
+            return success
+
+    @invalidates('customers')
     def delete_customer(self, customer_id):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE customer_id = ?", (customer_id,))
-        order_count = cursor.fetchone()[0]
+            cursor.execute(STATEMENTS['customer_orders_count'], (customer_id,))
+            order_count = cursor.fetchone()[0]
 
-        if order_count > 0:
-            conn.close()
-            return False, "Нельзя удалить клиента с существующими заказами"
+            if order_count > 0:
+                return False, "Нельзя удалить клиента с существующими заказами"
 
-        cursor.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        return success, "Клиент удален" if success else "Клиент не найден"
+            cursor.execute(STATEMENTS['delete_customer'], (customer_id,))
+            conn.commit()
+            success = cursor.rowcount > 0
+            return success, "Клиент удален" if success else "Клиент не найден"
+
+    def search_customers(self, text, limit=20, offset=0):
+        """Поиск клиентов по имени, email и телефону (префиксы слов), лучшие совпадения первыми"""
+        return self._search('customers', self.models.Customer, text, limit, offset)
+
+    def _search(self, table, model, text, limit, offset):
+        match = match_expression(text)
+        if match is None:
+            return []
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(model)
+            cursor.execute(search_query(table), (match, limit, offset))
+            return cursor.fetchall()
 
     # CRUD для товаров
+    @invalidates('products')
     def add_product(self, name, price, quantity):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO products (name, price, quantity) VALUES (?, ?, ?)",
-            (name, price, quantity)
-        )
-        conn.commit()
-        product_id = cursor.lastrowid
-        conn.close()
-        return product_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(STATEMENTS['insert_product'], (name, price, quantity))
+            product_id = cursor.lastrowid
+            self._commit(conn, product_id=product_id)
+            return product_id
 
     def get_all_products(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products")
-        products = []
-        for row in cursor.fetchall():
-            products.append(Product(id=row[0], name=row[1], price=row[2], quantity=row[3]))
-        conn.close()
-        return products
+        with self.connection() as conn:
+            if self.catalog is not None:
+                return self.catalog.products(conn)
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(self.models.Product)
+            cursor.execute("SELECT * FROM products")
+            return cursor.fetchall()
+
+    def iter_products(self, batch_size=500):
+        """Постраничный обход товаров (курсор по id)"""
+        last_id = 0
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = row_factory(self.models.Product)
+                cursor.execute(
+                    "SELECT * FROM products WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )
+                products = cursor.fetchmany(batch_size)
+            yield from products
+            if len(products) < batch_size:
+                return
+            last_id = products[-1].id
 
     def get_product_by_id(self, product_id):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return Product(id=row[0], name=row[1], price=row[2], quantity=row[3])
-        return None
-
+        with self.connection() as conn:
+            if self.catalog is not None:
+                return self.catalog.get(conn, product_id)
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(self.models.Product)
+            cursor.execute(STATEMENTS['product_by_id'], (product_id,))
+            return cursor.fetchone()
+
+    def search_products(self, text, limit=20, offset=0):
+        """Поиск товаров по названию (префиксы слов), лучшие совпадения первыми"""
+        return self._search('products', self.models.Product, text, limit, offset)
+
+    @invalidates('products')
     def update_product(self, product_id, name=None, price=None, quantity=None):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        updates = []
-        params = []
-
-        if name:
-            updates.append("name = ?")
-            params.append(name)
-        if price is not None:
-            updates.append("price = ?")
-            params.append(price)
-        if quantity is not None:
-            updates.append("quantity = ?")
-            params.append(quantity)
-
-        if not updates:
-            return False
-
-        params.append(product_id)
-        query = f"UPDATE products SET {', '.join(updates)} WHERE id = ?"
-
-        cursor.execute(query, params)
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        return success
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            update = canonical_update('products', product_id,
+                                      {'name': name or None, 'price': price, 'quantity': quantity})
+            if update is None:
+                return False
+
+            cursor.execute(*update)
+            self._commit(conn, product_id=product_id)
+            success = cursor.rowcount > 0
+            return success
 
+    @invalidates('products')
     def delete_product(self, product_id):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT COUNT(*) FROM order_items WHERE product_id = ?", (product_id,))
-        usage_count = cursor.fetchone()[0]
+            cursor.execute(STATEMENTS['product_items_count'], (product_id,))
+            usage_count = cursor.fetchone()[0]
 
-        if usage_count > 0:
-            conn.close()
-            return False, "Нельзя удалить товар, который используется в заказах"
+            if usage_count > 0:
+                return False, "Нельзя удалить товар, который используется в заказах"
 
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        return success, "Товар удален" if success else "Товар не найден"
+            cursor.execute(STATEMENTS['delete_product'], (product_id,))
+            self._commit(conn, product_id=product_id)
+            success = cursor.rowcount > 0
+            return success, "Товар удален" if success else "Товар не найден"
 
     # Операции с заказами
+    @invalidates('orders', 'order_items', 'products')
     def create_order(self, customer_id, products):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT id FROM customers WHERE id = ?", (customer_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return None, "Клиент не найден"
+        return self._retry_on_busy(self._create_order, customer_id, products)
+
+    def _create_order(self, customer_id, products):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            # Блокировка записи берется сразу: проверка и списание остатков атомарны
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(STATEMENTS['customer_exists'], (customer_id,))
+                if not cursor.fetchone():
+                    conn.rollback()
+                    return None, "Клиент не найден"
+
+                # Цены и остатки из каталога читаются до списаний этой транзакции
+                catalog = None if self.catalog is None else self.catalog.rows(conn)
+                total_amount = 0
+                lines = []
+                taken = {}
+                for product in products:
+                    # Условное списание: остаток не может уйти в минус
+                    cursor.execute(STATEMENTS['reserve_stock'],
+                                   (product['quantity'], product['product_id'], product['quantity']))
+                    reserved = cursor.rowcount > 0
+
+                    if catalog is None:
+                        cursor.execute(STATEMENTS['product_price_stock'], (product['product_id'],))
+                        result = cursor.fetchone()
+                    else:
+                        row = catalog.get(product['product_id'])
+                        result = row and (row[2], row[3] - taken.get(product['product_id'], 0))
+                    if not result:
+                        conn.rollback()
+                        return None, f"Товар с ID {product['product_id']} не найден"
+
+                    price, available_quantity = result
+                    if not reserved:
+                        conn.rollback()
+                        return None, f"Недостаточно товара с ID {product['product_id']}. Доступно: {available_quantity}"
+
+                    taken[product['product_id']] = taken.get(product['product_id'], 0) + product['quantity']
+                    total_amount += price * product['quantity']
+                    # Цена фиксируется на момент заказа
+                    lines.append((product['product_id'], product['quantity'], price, price * product['quantity']))
+
+                cursor.execute(STATEMENTS['insert_order'], (customer_id, total_amount, 'pending'))
+                order_id = cursor.lastrowid
+
+                cursor.executemany(STATEMENTS['insert_order_item'], [(order_id, *line) for line in lines])
+
+                self._commit(conn, stock={product_id: -quantity for product_id, quantity in taken.items()})
+                return order_id, "Заказ успешно создан"
+            except Exception:
+                conn.rollback()
+                raise
+
+    @invalidates('orders', 'order_items', 'products')
+    def create_orders_bulk(self, orders):
+        """Пакетное создание заказов в одной транзакции.
+
+        orders - список пар (customer_id, products) в формате create_order.
+        Возвращает список (order_id, сообщение) для каждого заказа в исходном порядке;
+        заказы, не прошедшие проверку, не создаются и не мешают остальным.
+        """
+        orders = list(orders)
+        if not orders:
+            return []
+        return self._retry_on_busy(self._create_orders_bulk, orders)
+
+    def _create_orders_bulk(self, orders):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                customer_ids = {customer_id for customer_id, _ in orders}
+                product_ids = {item['product_id'] for _, items in orders for item in items}
+
+                known_customers = {row[0] for row in _fetch_in(
+                    cursor, "SELECT id FROM customers WHERE id IN ({placeholders})", customer_ids)}
+                if self.catalog is None:
+                    catalog = {row[0]: (row[1], row[2]) for row in _fetch_in(
+                        cursor, "SELECT id, price, quantity FROM products WHERE id IN ({placeholders})", product_ids)}
+                else:
+                    rows = self.catalog.rows(conn)
+                    catalog = {product_id: rows[product_id][2:] for product_id in product_ids if product_id in rows}
+                stock = {product_id: quantity for product_id, (_, quantity) in catalog.items()}
+
+                cursor.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'orders'), 0), "
+                               "COALESCE((SELECT MAX(id) FROM orders), 0))")
+                next_order_id = cursor.fetchone()[0] + 1
+
+                results = []
+                order_rows = []
+                item_rows = []
+                stock_changes = {}
+                for customer_id, items in orders:
+                    if customer_id not in known_customers:
+                        results.append((None, "Клиент не найден"))
+                        continue
+
+                    requested = {}
+                    error = None
+                    for item in items:
+                        product_id = item['product_id']
+                        if product_id not in catalog:
+                            error = f"Товар с ID {product_id} не найден"
+                            break
+                        requested[product_id] = requested.get(product_id, 0) + item['quantity']
+                        if requested[product_id] > stock[product_id]:
+                            error = f"Недостаточно товара с ID {product_id}. Доступно: {stock[product_id]}"
+                            break
+                    if error:
+                        results.append((None, error))
+                        continue
+
+                    order_id = next_order_id
+                    next_order_id += 1
+                    total_amount = sum(catalog[item['product_id']][0] * item['quantity'] for item in items)
+                    order_rows.append((order_id, customer_id, total_amount, 'pending'))
+                    for item in items:
+                        price = catalog[item['product_id']][0]
+                        item_rows.append((order_id, item['product_id'], item['quantity'], price, price * item['quantity']))
+                    for product_id, quantity in requested.items():
+                        stock[product_id] -= quantity
+                        stock_changes[product_id] = stock_changes.get(product_id, 0) + quantity
+                    results.append((order_id, "Заказ успешно создан"))
+
+                cursor.executemany(
+                    "INSERT INTO orders (id, customer_id, total_amount, status) VALUES (?, ?, ?, ?)",
+                    order_rows
+                )
+                cursor.executemany(STATEMENTS['insert_order_item'], item_rows)
+                cursor.executemany(
+                    "UPDATE products SET quantity = quantity - ? WHERE id = ?",
+                    [(quantity, product_id) for product_id, quantity in stock_changes.items()]
+                )
+                self._commit(conn, stock={product_id: -quantity for product_id, quantity in stock_changes.items()})
+                return results
+            except Exception:
+                conn.rollback()
+                raise
+
+    def get_all_orders(self, with_products=True):
+        """Все заказы; товары загружаются одним запросом для всех заказов сразу"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(self.models.Order)
 
-        total_amount = 0
-        for product in products:
-            cursor.execute("SELECT price, quantity FROM products WHERE id = ?", (product['product_id'],))
-            result = cursor.fetchone()
-            if not result:
-                conn.close()
-                return None, f"Товар с ID {product['product_id']} не найден"
-
-            price, available_quantity = result
-            if product['quantity'] > available_quantity:
-                conn.close()
-                return None, f"Недостаточно товара с ID {product['product_id']}. Доступно: {available_quantity}"
-
-            total_amount += price * product['quantity']
-
-        cursor.execute(
-            "INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
-            (customer_id, total_amount, 'pending')
-        )
-        order_id = cursor.lastrowid
-
-        for product in products:
-            cursor.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)",
-                (order_id, product['product_id'], product['quantity'])
-            )
-
-            cursor.execute(
-                "UPDATE products SET quantity = quantity - ? WHERE id = ?",
-                (product['quantity'], product['product_id'])
-            )
-
-        conn.commit()
-        conn.close()
-        return order_id, "Заказ успешно создан"
-
-    def get_all_orders(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT o.id, o.customer_id, o.total_amount, o.status, o.created_date,
-                   c.name as customer_name
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.id
-            ORDER BY o.created_date DESC
-        ''')
-
-        orders = []
-        for row in cursor.fetchall():
             cursor.execute('''
-                SELECT p.name, oi.quantity, p.price
-                FROM order_items oi
-                JOIN products p ON oi.product_id = p.id
-                WHERE oi.order_id = ?
-            ''', (row[0],))
-
-            products = []
-            for item_row in cursor.fetchall():
-                products.append({
-                    'name': item_row[0],
-                    'quantity': item_row[1],
-                    'price': item_row[2]
-                })
-
-            order_info = {
-                'id': row[0],
-                'customer_id': row[1],
-                'total_amount': row[2],
-                'status': row[3],
-                'created_date': row[4],
-                'customer_name': row[5],
-                'products': products
-            }
-            orders.append(order_info)
-
-        conn.close()
-        return orders
+                SELECT o.id, o.customer_id, o.total_amount, o.status, o.created_date,
+                       c.name as customer_name
+                FROM orders o
+                JOIN customers c ON o.customer_id = c.id
+                ORDER BY o.created_date DESC
+            ''')
+
+            orders = cursor.fetchall()
+
+            if with_products and orders:
+                # Товары всех заказов одним запросом вместо запроса на каждый заказ;
+                # названия - только для товаров, встречающихся в позициях
+                self._attach_order_products(conn, orders, '''
+                    SELECT order_id, product_id, quantity, unit_price
+                    FROM order_items
+                    ORDER BY order_id, id
+                ''')
+
+            return orders
+
+    def iter_orders(self, batch_size=500, with_products=True):
+        """Постраничный обход заказов от новых к старым (курсор по created_date, id).
+
+        Заказы без даты идут последними, как в ORDER BY created_date DESC: сравнение
+        с NULL в курсоре ложно, поэтому они обходятся отдельно, курсором по id.
+        """
+        for first, following in (("o.created_date IS NOT NULL", "(o.created_date, o.id) < (?, ?)"),
+                                 ("o.created_date IS NULL", "o.created_date IS NULL AND o.id < ?")):
+            last_key = None
+            while True:
+                with self.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.row_factory = row_factory(self.models.Order)
+                    if last_key is None:
+                        where, params = first, ()
+                    else:
+                        where, params = following, last_key if last_key[0] is not None else last_key[1:]
+                    cursor.execute(f'''
+                        SELECT o.id, o.customer_id, o.total_amount, o.status, o.created_date,
+                               c.name as customer_name
+                        FROM orders o
+                        JOIN customers c ON o.customer_id = c.id
+                        WHERE {where}
+                        ORDER BY o.created_date DESC, o.id DESC
+                        LIMIT ?
+                    ''', (*params, batch_size))
+                    orders = cursor.fetchmany(batch_size)
+
+                    if with_products and orders:
+                        placeholders = ", ".join("?" * len(orders))
+                        self._attach_order_products(conn, orders, f'''
+                            SELECT order_id, product_id, quantity, unit_price
+                            FROM order_items
+                            WHERE order_id IN ({placeholders})
+                            ORDER BY order_id, id
+                        ''', [order.id for order in orders])
+
+                yield from orders
+                if len(orders) < batch_size:
+                    break
+                last_key = (orders[-1].created_date, orders[-1].id)
+
+    def _attach_order_products(self, conn, orders, query, params=()):
+        """Раскладывает строки (order_id, product_id, quantity, unit_price) по заказам за один проход.
+
+        Названия загружаются только для товаров из этих строк, одна строка на название
+        товара вместо копии в каждой позиции.
+        """
+        rows = conn.execute(query, params).fetchall()
+        names = dict(_fetch_in(conn.cursor(), "SELECT id, name FROM products WHERE id IN ({placeholders})",
+                               {row[1] for row in rows}))
+        orders_by_id = {order.id: order for order in orders}
+        order_item = self.models.OrderItem
+        for order_id, product_id, quantity, price in rows:
+            order = orders_by_id.get(order_id)
+            if order is not None:
+                order.products.append(order_item(names.get(product_id), quantity, price))
 
     def get_orders_by_customer(self, customer_id):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT o.id, o.total_amount, o.status, o.created_date,
-                   c.name, c.email
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.id
-            WHERE o.customer_id = ?
-        ''', (customer_id,))
-
-        orders = []
-        for row in cursor.fetchall():
-            order = {
-                'id': row[0],
-                'total_amount': row[1],
-                'status': row[2],
-                'created_date': row[3],
-                'customer_name': row[4],
-                'customer_email': row[5]
-            }
-            orders.append(order)
-
-        conn.close()
-        return orders
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
+            cursor.execute('''
+                SELECT o.id, o.total_amount, o.status, o.created_date,
+                       c.name, c.email
+                FROM orders o
+                JOIN customers c ON o.customer_id = c.id
+                WHERE o.customer_id = ?
+            ''', (customer_id,))
+
+            orders = []
+            for row in cursor.fetchall():
+                order = {
+                    'id': row[0],
+                    'total_amount': row[1],
+                    'status': row[2],
+                    'created_date': row[3],
+                    'customer_name': row[4],
+                    'customer_email': row[5]
+                }
+                orders.append(order)
+
+            return orders
+
+    @invalidates('orders', 'products')
     def update_order_status(self, order_id, status):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE orders SET status = ? WHERE id = ?",
-            (status, order_id)
-        )
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        return success
-
+        """Смена статуса одного заказа по правилам update_order_statuses"""
+        return self._retry_on_busy(self._update_order_statuses, [(order_id, status)])[0][0]
+
+    @invalidates('orders', 'products')
+    def update_order_statuses(self, changes):
+        """Пакетная смена статусов заказов в одной транзакции.
+
+        changes - список пар (order_id, status). Разрешены только переходы из
+        таблицы order_status_transitions (pending -> completed/cancelled); при
+        отмене товары заказа возвращаются на склад. Пары применяются по порядку.
+        Возвращает список (успех, сообщение) для каждой пары в исходном порядке.
+        """
+        return self._retry_on_busy(self._update_order_statuses, changes)
+
+    def _update_order_statuses(self, changes):
+        changes = list(changes)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                transitions = {(old, new): restock for old, new, restock
+                               in cursor.execute(STATEMENTS['order_transitions'])}
+                current = dict(_fetch_in(cursor, "SELECT id, status FROM orders WHERE id IN ({placeholders})",
+                                         {order_id for order_id, _ in changes}))
+
+                results = []
+                updates = []
+                cancelled = []
+                for order_id, status in changes:
+                    old = current.get(order_id)
+                    if old is None:
+                        results.append((False, "Заказ не найден"))
+                        continue
+                    restock = transitions.get((old, status))
+                    if restock is None:
+                        results.append((False, f"Недопустимая смена статуса: {old} -> {status}"))
+                        continue
+                    current[order_id] = status
+                    updates.append((status, order_id))
+                    if restock:
+                        cancelled.append(order_id)
+                    results.append((True, "Статус заказа обновлен"))
+
+                cursor.executemany(STATEMENTS['transition_order_status'], updates)
+                if cursor.rowcount != len(updates):
+                    # Переходы проверены под блокировкой записи, расхождение - ошибка схемы
+                    raise sqlite3.IntegrityError("Смена статуса отклонена таблицей переходов")
+
+                restock = {}
+                for product_id, quantity in _fetch_in(
+                        cursor, "SELECT product_id, quantity FROM order_items WHERE order_id IN ({placeholders})",
+                        cancelled):
+                    restock[product_id] = restock.get(product_id, 0) + quantity
+                cursor.executemany(STATEMENTS['restock'],
+                                   [(quantity, product_id) for product_id, quantity in restock.items()])
+
+                self._commit(conn, stock=restock)
+                return results
+            except Exception:
+                conn.rollback()
+                raise
+
+    @invalidates('orders', 'order_items', 'products')
     def delete_order(self, order_id):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("SELECT product_id, quantity FROM order_items WHERE order_id = ?", (order_id,))
-            items = cursor.fetchall()
-
-            for product_id, quantity in items:
-                cursor.execute(
-                    "UPDATE products SET quantity = quantity + ? WHERE id = ?",
-                    (quantity, product_id)
-                )
-
-            cursor.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
-            cursor.execute("DELETE FROM orders WHERE id = ?", (order_id,))
-
-            conn.commit()
-            success = cursor.rowcount > 0
-            return success, "Заказ удален" if success else "Заказ не найден"
+            return self._retry_on_busy(self._delete_order, order_id)
         except Exception as e:
-            conn.rollback()
             return False, f"Ошибка при удалении заказа: {str(e)}"
-        finally:
-            conn.close()
+
+    def _delete_order(self, order_id):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            # Блокировка записи берется до чтения позиций: параллельные отмена или удаление
+            # того же заказа не вернут его товары на склад второй раз
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                restock = {}
+                for product_id, quantity in cursor.execute(STATEMENTS['order_reserved_items'], (order_id,)).fetchall():
+                    restock[product_id] = restock.get(product_id, 0) + quantity
+                cursor.executemany(STATEMENTS['restock'],
+                                   [(quantity, product_id) for product_id, quantity in restock.items()])
+
+                cursor.execute(STATEMENTS['delete_order_items'], (order_id,))
+                cursor.execute(STATEMENTS['delete_order'], (order_id,))
+                success = cursor.rowcount > 0
+
+                self._commit(conn, stock=restock)
+                return success, "Заказ удален" if success else "Заказ не найден"
+            except Exception:
+                conn.rollback()
+                raise
 
     # ВЫЧИСЛИТЕЛЬНЫЙ ЭКСПЕРИМЕНТ - Аналитические функции
+    @cached('order_items', 'products')
+    @columnar_capable
     def get_popular_products(self, limit=5):
         """Самые популярные товары"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT p.name, SUM(oi.quantity) as total_sold
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.id
-            GROUP BY p.id, p.name
-            ORDER BY total_sold DESC
-            LIMIT ?
-        ''', (limit,))
-
-        popular_products = cursor.fetchall()
-        conn.close()
-        return popular_products
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
+            cursor.execute('''
+                SELECT p.name, s.total_sold
+                FROM stats_product_sales s
+                JOIN products p ON s.product_id = p.id
+                WHERE s.total_sold > 0
+                ORDER BY s.total_sold DESC
+                LIMIT ?
+            ''', (limit,))
+
+            popular_products = cursor.fetchall()
+            return popular_products
+
+    @cached('orders')
+    @columnar_capable
     def get_average_order_value(self):
         """Средний чек заказов"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT AVG(total_amount) FROM orders WHERE status != 'cancelled'")
-        result = cursor.fetchone()
-        avg_value = result[0] if result[0] else 0
-        conn.close()
-        return avg_value
+            cursor.execute('''
+                SELECT SUM(total_amount) / SUM(order_count)
+                FROM stats_status
+                WHERE status != 'cancelled' AND order_count > 0
+            ''')
+            result = cursor.fetchone()
+            avg_value = result[0] if result[0] else 0
+            return avg_value
 
+    @cached('orders')
+    @columnar_capable
     def get_total_revenue(self):
         """Общая выручка"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT SUM(total_amount) FROM orders WHERE status = 'completed'")
-        result = cursor.fetchone()
-        total_revenue = result[0] if result[0] else 0
-        conn.close()
-        return total_revenue
+            cursor.execute("SELECT total_amount FROM stats_status WHERE status = 'completed' AND order_count > 0")
+            result = cursor.fetchone() or (None,)
+            total_revenue = result[0] if result[0] else 0
+            return total_revenue
 
+    @cached('orders')
+    @columnar_capable
     def get_orders_count(self):
         """Общее количество заказов"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT COUNT(*) FROM orders")
-        result = cursor.fetchone()
-        count = result[0] if result[0] else 0
-        conn.close()
-        return count
+            cursor.execute("SELECT SUM(order_count) FROM stats_status")
+            result = cursor.fetchone()
+            count = result[0] if result[0] else 0
+            return count
 
+    @cached('customers')
+    @columnar_capable
     def get_customers_count(self):
         """Общее количество клиентов"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT COUNT(*) FROM customers")
-        result = cursor.fetchone()
-        count = result[0] if result[0] else 0
-        conn.close()
-        return count
+            cursor.execute("SELECT COUNT(*) FROM customers")
+            result = cursor.fetchone()
+            count = result[0] if result[0] else 0
+            return count
 
+    @cached('products')
+    @columnar_capable
     def get_products_count(self):
         """Общее количество товаров"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT COUNT(*) FROM products")
-        result = cursor.fetchone()
-        count = result[0] if result[0] else 0
-        conn.close()
-        return count
+            cursor.execute("SELECT COUNT(*) FROM products")
+            result = cursor.fetchone()
+            count = result[0] if result[0] else 0
+            return count
 
+    @cached('orders', 'customers')
+    @columnar_capable
     def get_best_customer(self):
         """Лучший клиент по сумме заказов"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT c.name, SUM(o.total_amount) as total_spent
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.id
-            WHERE o.status = 'completed'
-            GROUP BY c.id, c.name
-            ORDER BY total_spent DESC
-            LIMIT 1
-        ''')
-
-        result = cursor.fetchone()
-        conn.close()
-        return result if result else ("Нет данных", 0)
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-    def get_orders_by_month(self):
-        """Количество заказов по месяцам"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT 
-                strftime('%Y-%m', created_date) as month,
-                COUNT(*) as order_count
-            FROM orders
-            GROUP BY month
-            ORDER BY month
-        ''')
-
-        monthly_orders = cursor.fetchall()
-        conn.close()
-        return monthly_orders
+            cursor.execute('''
+                SELECT c.name, s.completed_total as total_spent
+                FROM stats_customer_spend s
+                JOIN customers c ON s.customer_id = c.id
+                WHERE s.completed_total > 0
+                ORDER BY s.completed_total DESC
+                LIMIT 1
+            ''')
 
-    def get_revenue_by_month(self):
-        """Выручка по месяцам"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT 
-                strftime('%Y-%m', created_date) as month,
-                SUM(total_amount) as monthly_revenue
-            FROM orders
-            WHERE status = 'completed'
-            GROUP BY month
-            ORDER BY month
-        ''')
-
-        monthly_revenue = cursor.fetchall()
-        conn.close()
-        return monthly_revenue
+            result = cursor.fetchone()
+            return result if result else ("Нет данных", 0)
 
-    def clear_database(self):
-        """Полная очистка базы данных"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    @cached('orders', 'customers')
+    @columnar_capable
+    def get_top_customers(self, limit=5):
+        """Топ клиентов по сумме выполненных заказов"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            # Отключаем foreign keys для очистки
-            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute('''
+                SELECT c.name, s.completed_total as total_spent
+                FROM stats_customer_spend s
+                JOIN customers c ON s.customer_id = c.id
+                WHERE s.completed_total > 0
+                ORDER BY s.completed_total DESC
+                LIMIT ?
+            ''', (limit,))
+
+            return cursor.fetchall()
+
+    @cached('orders')
+    @columnar_capable
+    def get_orders_by_month(self):
+        """Количество заказов по месяцам"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                SELECT month, order_count
+                FROM stats_monthly
+                WHERE order_count > 0
+                ORDER BY month
+            ''')
 
-            # Очищаем таблицы в правильном порядке
-            cursor.execute("DELETE FROM order_items")
-            cursor.execute("DELETE FROM orders")
-            cursor.execute("DELETE FROM products")
-            cursor.execute("DELETE FROM customers")
+            monthly_orders = cursor.fetchall()
+            return monthly_orders
 
-            # Сбрасываем автоинкремент
-            cursor.execute("DELETE FROM sqlite_sequence")
+    @cached('orders')
+    @columnar_capable
+    def get_revenue_by_month(self):
+        """Выручка по месяцам"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-            # Включаем foreign keys обратно
-            cursor.execute("PRAGMA foreign_keys = ON")
+            cursor.execute('''
+                SELECT month, completed_revenue as monthly_revenue
+                FROM stats_monthly
+                WHERE completed_count > 0
+                ORDER BY month
+            ''')
+
+            monthly_revenue = cursor.fetchall()
+            return monthly_revenue
+
+    @cached('orders')
+    @columnar_capable
+    def get_period_totals(self, start, end, granularity='day'):
+        """(период, количество заказов, выручка завершенных) за [start, end) по hour/day/week/month, включая пустые"""
+        with self.connection() as conn:
+            return period_totals(conn, start, end, granularity)
+
+    def get_orders_by_period(self, start, end, granularity='day'):
+        """Количество заказов за [start, end) по периодам"""
+        return [(label, count) for label, count, _ in self.get_period_totals(start, end, granularity)]
+
+    def get_revenue_by_period(self, start, end, granularity='day'):
+        """Выручка завершенных заказов за [start, end) по периодам"""
+        return [(label, revenue) for label, _, revenue in self.get_period_totals(start, end, granularity)]
+
+    @cached('orders', 'customers', 'products')
+    @columnar_capable
+    def get_dashboard_snapshot(self):
+        """Общая статистика для главного экрана аналитики одним запросом"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-            conn.commit()
-            return True, "База данных успешно очищена"
-        except Exception as e:
-            conn.rollback()
-            return False, f"Ошибка при очистке базы данных: {str(e)}"
-        finally:
-            conn.close()
+            cursor.execute('''
+                SELECT
+                    (SELECT SUM(order_count) FROM stats_status),
+                    (SELECT COUNT(*) FROM customers),
+                    (SELECT COUNT(*) FROM products),
+                    (SELECT total_amount FROM stats_status
+                     WHERE status = 'completed' AND order_count > 0),
+                    (SELECT SUM(total_amount) / SUM(order_count) FROM stats_status
+                     WHERE status != 'cancelled' AND order_count > 0),
+                    (SELECT order_count FROM stats_status WHERE status = 'completed'),
+                    (SELECT order_count FROM stats_status WHERE status = 'pending'),
+                    (SELECT order_count FROM stats_status WHERE status = 'cancelled'),
+                    top.id, top.total_amount, top.customer_name
+                FROM (SELECT 1)
+                LEFT JOIN (
+                    SELECT o.id, o.total_amount, c.name as customer_name
+                    FROM orders o
+                    JOIN customers c ON o.customer_id = c.id
+                    ORDER BY o.total_amount DESC
+                    LIMIT 1
+                ) top
+            ''')
+            row = cursor.fetchone()
+
+            return {
+                'orders_count': row[0] or 0,
+                'customers_count': row[1] or 0,
+                'products_count': row[2] or 0,
+                'total_revenue': row[3] or 0,
+                'average_order_value': row[4] or 0,
+                'status_counts': {
+                    'completed': row[5] or 0,
+                    'pending': row[6] or 0,
+                    'cancelled': row[7] or 0,
+                },
+                'top_order': {
+                    'id': row[8],
+                    'total_amount': row[9],
+                    'customer_name': row[10],
+                } if row[8] is not None else None,
+            }
 
-    def fill_test_data(self):
-        """Заполнение тестовыми данными"""
+    @invalidates('customers', 'products', 'orders', 'order_items')
+    def rebuild_summaries(self):
+        """Пересчет сводных таблиц аналитики по исходным данным"""
+        with self.connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                rebuild_summaries(conn)
+                conn.commit()
+                return True, "Сводные таблицы пересчитаны"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Ошибка при пересчете сводных таблиц: {str(e)}"
+
+    def check_summaries(self):
+        """Проверка согласованности сводных таблиц; возвращает список расхождений"""
+        with self.connection() as conn:
+            # Чтение в одной транзакции, чтобы сравнение шло по одному снимку данных
+            conn.execute("BEGIN")
+            try:
+                return check_summaries(conn)
+            finally:
+                conn.rollback()
+
+    @invalidates('customers', 'products', 'orders', 'order_items')
+    def clear_database(self):
+        """Полная очистка базы данных"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                # Отключаем foreign keys для очистки
+                cursor.execute("PRAGMA foreign_keys = OFF")
+                cursor.execute("BEGIN IMMEDIATE")
+
+                # Очищаем таблицы в правильном порядке; поисковые индексы - одним перестроением
+                with search_triggers_suspended(conn):
+                    cursor.execute("DELETE FROM order_items")
+                    cursor.execute("DELETE FROM orders")
+                    cursor.execute("DELETE FROM products")
+                    cursor.execute("DELETE FROM customers")
+                for table in SUMMARY_SOURCES:
+                    cursor.execute(f"DELETE FROM {table}")
+
+                # Сбрасываем автоинкремент
+                cursor.execute("DELETE FROM sqlite_sequence")
+
+                # Включаем foreign keys обратно
+                cursor.execute("PRAGMA foreign_keys = ON")
+
+                conn.commit()
+                if self.catalog is not None:
+                    self.catalog.invalidate()
+                return True, "База данных успешно очищена"
+            except Exception as e:
+                conn.rollback()
+                return False, f"Ошибка при очистке базы данных: {str(e)}"
+
+    def fill_test_data(self, customers=50, products=30, orders=200, seed=42):
+        """Заполнение тестовыми данными (детерминированный генератор data_generator)"""
         try:
-            # Добавляем клиентов
-            customers = [
-                ("Иван Иванов", "ivan@mail.ru", "+79161234567"),
-                ("Петр Петров", "petr@mail.ru", "+79167654321"),
-                ("Мария Сидорова", "maria@mail.ru", "+79169998877"),
-                ("Анна Козлова", "anna@mail.ru", "+79165554433"),
-                ("Сергей Смирнов", "sergey@mail.ru", "+79167776655")
-            ]
-
-            customer_ids = []
-            for customer in customers:
-                customer_id = self.add_customer(*customer)
-                if customer_id:
-                    customer_ids.append(customer_id)
-
-            # Добавляем товары
-            products = [
-                ("Ноутбук HP", 50000, 10),
-                ("Мышь беспроводная", 1500, 50),
-                ("Клавиатура механическая", 7000, 20),
-                ("Монитор 24'", 15000, 15),
-                ("Наушники Sony", 8000, 30),
-                ("Веб-камера", 3000, 25),
-                ("Микрофон", 4500, 15),
-                ("Коврик для мыши", 500, 100)
-            ]
-
-            product_ids = []
-            for product in products:
-                product_id = self.add_product(*product)
-                if product_id:
-                    product_ids.append(product_id)
-
-            # Создаем заказы
-            import random
-            orders_data = []
-            for i in range(20):
-                customer_id = random.choice(customer_ids)
-                num_products = random.randint(1, 4)
-                products_list = []
-                for j in range(num_products):
-                    product_id = random.choice(product_ids)
-                    quantity = random.randint(1, 3)
-                    products_list.append({'product_id': product_id, 'quantity': quantity})
-                orders_data.append((customer_id, products_list))
-
-            for customer_id, products in orders_data:
-                self.create_order(customer_id, products)
-
-            # Обновляем некоторые заказы в статус completed
-            for i in range(1, 16):
-                if random.random() > 0.3:  # 70% заказов completed
-                    self.update_order_status(i, 'completed')
-
-            return True, f"Добавлено: {len(customer_ids)} клиентов, {len(product_ids)} товаров, {len(orders_data)} заказов"
+            report = generate_data(self, customers, products, orders, seed=seed)
+            return True, format_report(report)
 
         except Exception as e:
             return False, f"Ошибка при заполнении тестовыми данными: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,303 @@
+"""Профилирование запросов DatabaseManager (включается явно)
+
+Собирает по методам DatabaseManager и по SQL-запросам количество вызовов,
+суммарное время, перцентили задержек и число возвращенных строк, а также время
+ожидания соединения в пуле. Объем работы запроса оценивается по числу шагов
+виртуальной машины SQLite (progress handler). Запросы дольше порога попадают в
+журнал медленных запросов вместе с EXPLAIN QUERY PLAN (выполняется в отдельном
+соединении, чтобы не мешать транзакции) и в logging на уровне INFO.
+
+Время запроса - это execute плюс чтение всех его строк.
+"""
+import functools
+import inspect
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Шагов виртуальной машины между вызовами progress handler
+PROGRESS_STEPS = 1000
+
+# Методы DatabaseManager, которые не профилируются
+SKIPPED_METHODS = {'connection', 'close', 'init_database'}
+
+_SPACES = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalize_sql(sql):
+    """Ключ запроса: без лишних пробелов, списки "?, ?, ?" свернуты"""
+    return _PLACEHOLDER_LIST.sub("?, ...", _SPACES.sub(" ", sql).strip())
+
+
+def percentile(ordered, p):
+    """Перцентиль отсортированной выборки по методу ближайшего ранга"""
+    # p * n / 100 без промежуточной дроби p / 100: для целых p ранг вычисляется точно
+    index = max(0, min(len(ordered) - 1, math.ceil(p * len(ordered) / 100) - 1))
+    return ordered[index]
+
+
+class _Stats:
+    def __init__(self, max_samples):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.vm_steps = 0
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, seconds, rows=0, vm_steps=0):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        self.vm_steps += vm_steps
+        self.samples.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': percentile(ordered, 50) * 1000 if ordered else 0.0,
+            'p90_ms': percentile(ordered, 90) * 1000 if ordered else 0.0,
+            'p99_ms': percentile(ordered, 99) * 1000 if ordered else 0.0,
+            'max_ms': self.max * 1000,
+            'rows': self.rows,
+            'vm_steps': self.vm_steps,
+        }
+
+
+class _InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, замеряющий execute и чтение строк"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._pending = None
+
+    def _start(self, sql, parameters, many):
+        self._finish()
+        self._pending = [sql, parameters, 0.0, 0, many, self.connection.vm_steps]
+
+    def _add(self, started, rows, done):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - started
+            self._pending[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        if self._pending is None:
+            return
+        sql, parameters, seconds, rows, many, steps = self._pending
+        self._pending = None
+        self.connection.instrumentation.record_statement(
+            self.connection.database, sql, parameters, seconds, rows, many, self.connection.vm_steps - steps)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters, False)
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except BaseException:
+            self._add(started, 0, True)
+            raise
+        # Запрос без результирующих строк (INSERT, UPDATE...) уже выполнен полностью
+        self._add(started, 0, self.description is None)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None, True)
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(started, max(self.rowcount, 0), True)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._add(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(started, 0, True)
+            raise
+        self._add(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # conn.execute(...).fetchone() - запрос завершается при удалении курсора
+        self._finish()
+
+
+class _InstrumentedConnection(sqlite3.Connection):
+    instrumentation = None
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self.database = database
+        self.vm_steps = 0
+        self.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+
+    def _on_progress(self):
+        self.vm_steps += PROGRESS_STEPS
+        return 0
+
+    def cursor(self, factory=None):
+        if factory is not None:
+            return super().cursor(factory)
+        return _InstrumentedCursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class Instrumentation:
+    """Счетчики и задержки методов, SQL-запросов и ожидания соединений"""
+
+    def __init__(self, slow_threshold=0.1, max_samples=1000, slow_log_size=100):
+        self.slow_threshold = slow_threshold
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._statements = {}
+        self._wait = _Stats(max_samples)
+        self._slow = deque(maxlen=slow_log_size)
+        self.connection_factory = type('InstrumentedConnection', (_InstrumentedConnection,),
+                                       {'instrumentation': self})
+
+    def _stats(self, table, key):
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = _Stats(self.max_samples)
+        return stats
+
+    def record_method(self, name, seconds):
+        with self._lock:
+            self._stats(self._methods, name).add(seconds)
+
+    def record_wait(self, seconds):
+        """Время ожидания соединения в пуле"""
+        with self._lock:
+            self._wait.add(seconds)
+
+    def explain(self, database, sql, parameters=()):
+        """EXPLAIN QUERY PLAN запроса; None, если план получить нельзя"""
+        try:
+            # Без ожидания: блокировку может держать транзакция, в которой выполнялся запрос
+            conn = sqlite3.connect(database, timeout=0)
+        except sqlite3.Error:
+            return None
+        try:
+            return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, parameters or ())]
+        except sqlite3.Error:
+            return None
+        finally:
+            conn.close()
+
+    def record_statement(self, database, sql, parameters, seconds, rows, many, vm_steps):
+        key = normalize_sql(sql)
+        with self._lock:
+            self._stats(self._statements, key).add(seconds, rows, vm_steps)
+        if self.slow_threshold is None or seconds < self.slow_threshold:
+            return
+
+        plan = None if many else self.explain(database, sql, parameters)
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'sql': key,
+            'ms': seconds * 1000,
+            'rows': rows,
+            'plan': plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        logger.info("Медленный запрос (%.1f мс): %s; план: %s", entry['ms'], key, plan)
+
+    def wrap_method(self, name, method):
+        """Обертка метода, записывающая время вызова (для генераторов - время всех шагов)"""
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(*args, **kwargs):
+                elapsed = 0.0
+                generator = method(*args, **kwargs)
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - started
+                        yield item
+                finally:
+                    generator.close()
+                    self.record_method(name, elapsed)
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record_method(name, time.perf_counter() - started)
+        return wrapper
+
+    def instrument(self, db):
+        """Подменяет публичные методы экземпляра db профилирующими обертками"""
+        for name, member in inspect.getmembers(type(db), inspect.isfunction):
+            if not name.startswith('_') and name not in SKIPPED_METHODS:
+                setattr(db, name, self.wrap_method(name, getattr(db, name)))
+
+    def snapshot(self):
+        """Текущая статистика: methods, statements, connection_wait, slow_queries"""
+        with self._lock:
+            return {
+                'methods': {name: stats.summary() for name, stats in self._methods.items()},
+                'statements': {sql: stats.summary() for sql, stats in self._statements.items()},
+                'connection_wait': self._wait.summary(),
+                'slow_queries': list(self._slow),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self._statements.clear()
+            self._wait = _Stats(self.max_samples)
+            self._slow.clear()
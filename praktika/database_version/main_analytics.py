@@ -1,11 +1,17 @@
+import argparse
+
 from console_analytics import ConsoleAnalyticsInterface
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Аналитика и отчеты")
+    parser.add_argument('--profile', action='store_true', help="Профилирование запросов (пункт меню 9)")
+    args = parser.parse_args()
+
     print("=== СИСТЕМА УЧЕТА ЗАКАЗОВ - АНАЛИТИКА ===")
     print("Версия 2: Вычислительный эксперимент (аналитика и отчеты)")
 
-    interface = ConsoleAnalyticsInterface()
+    interface = ConsoleAnalyticsInterface(profile=args.profile)
     interface.run()
 
 
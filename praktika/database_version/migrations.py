@@ -0,0 +1,200 @@
+"""Версионные миграции схемы базы данных
+
+Каждая миграция - (версия, описание, шаги). Шаг - SQL-строка или функция,
+принимающая соединение. Применённые версии хранятся в таблице schema_version.
+"""
+from search import SEARCH_TABLES, SEARCH_TRIGGERS, rebuild_search
+from summaries import SUMMARY_TABLES, SUMMARY_TRIGGERS, rebuild_summaries
+
+
+def _initial_schema():
+    return [
+        '''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            phone TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER,
+            total_amount REAL NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+        ''',
+    ]
+
+
+def _secondary_indexes():
+    return [
+        # delete_customer, get_orders_by_customer, лучшие клиенты
+        "CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders (customer_id, status, total_amount)",
+        # выручка, средний чек, выручка по месяцам
+        "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, created_date, total_amount)",
+        # список заказов от новых к старым, заказы по месяцам
+        "CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_date)",
+        # товары заказа, delete_order
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id, product_id, quantity)",
+        # delete_product, популярные товары
+        "CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items (product_id, quantity)",
+    ]
+
+
+def _dashboard_indexes():
+    return [
+        # самый дорогой заказ для сводки на главном экране аналитики
+        "CREATE INDEX IF NOT EXISTS idx_orders_total ON orders (total_amount)",
+    ]
+
+
+def _order_status_transitions():
+    return [
+        # Допустимые переходы статусов заказа; restock = 1 - товары возвращаются на склад
+        '''
+        CREATE TABLE IF NOT EXISTS order_status_transitions (
+            from_status TEXT NOT NULL,
+            to_status TEXT NOT NULL,
+            restock INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (from_status, to_status)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR IGNORE INTO order_status_transitions (from_status, to_status, restock)
+        VALUES ('pending', 'completed', 0), ('pending', 'cancelled', 1)
+        ''',
+    ]
+
+
+def _backfill_line_prices(conn):
+    """Цены позиций существующих заказов.
+
+    Цена на момент заказа раньше не сохранялась, поэтому берется текущая цена
+    товара, приведенная пропорционально к сумме заказа: для заказа из одной позиции
+    цена восстанавливается точно, а сумма line_total равна total_amount.
+    """
+    conn.execute("CREATE TEMP TABLE order_price_scale (order_id INTEGER PRIMARY KEY, scale REAL NOT NULL)")
+    conn.execute('''
+        INSERT INTO order_price_scale (order_id, scale)
+        SELECT oi.order_id, o.total_amount / SUM(oi.quantity * p.price)
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        JOIN products p ON p.id = oi.product_id
+        GROUP BY oi.order_id
+        HAVING SUM(oi.quantity * p.price) > 0
+    ''')
+    conn.execute('''
+        UPDATE order_items SET unit_price =
+            (SELECT p.price FROM products p WHERE p.id = order_items.product_id)
+            * COALESCE((SELECT s.scale FROM order_price_scale s WHERE s.order_id = order_items.order_id), 1)
+        WHERE unit_price IS NULL
+    ''')
+    conn.execute("UPDATE order_items SET line_total = unit_price * quantity WHERE line_total IS NULL")
+    conn.execute("DROP TABLE temp.order_price_scale")
+
+
+def _order_line_prices():
+    return [
+        "ALTER TABLE order_items ADD COLUMN unit_price REAL",
+        "ALTER TABLE order_items ADD COLUMN line_total REAL",
+        _backfill_line_prices,
+        # Позиции заказа читаются из индекса без обращения к таблице
+        "DROP INDEX IF EXISTS idx_order_items_order",
+        "CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id, product_id, quantity, unit_price)",
+    ]
+
+
+def _order_timestamps():
+    return [
+        # Время заказа в секундах Unix. Виртуальный столбец не требует изменений в коде записи
+        # и не может разойтись с created_date; значения хранятся только в индексе
+        "ALTER TABLE orders ADD COLUMN created_ts INTEGER "
+        "GENERATED ALWAYS AS (CAST(strftime('%s', created_date) AS INTEGER)) VIRTUAL",
+        # аналитика за произвольный период: количество и выручка по диапазону индекса
+        "CREATE INDEX IF NOT EXISTS idx_orders_created_ts ON orders (created_ts, status, total_amount)",
+    ]
+
+
+MIGRATIONS = [
+    (1, "Начальная схема", _initial_schema()),
+    (2, "Вторичные индексы для частых запросов", _secondary_indexes()),
+    (3, "Сводные таблицы аналитики", SUMMARY_TABLES + SUMMARY_TRIGGERS + [rebuild_summaries]),
+    (4, "Индекс по сумме заказа", _dashboard_indexes()),
+    (5, "Переходы статусов заказа", _order_status_transitions()),
+    (6, "Полнотекстовый поиск клиентов и товаров", SEARCH_TABLES + SEARCH_TRIGGERS + [rebuild_search]),
+    (7, "Цена и сумма позиции заказа на момент оформления", _order_line_prices()),
+    (8, "Время заказа в секундах Unix с индексом", _order_timestamps()),
+]
+
+
+def get_schema_version(conn):
+    """Текущая версия схемы (0 - миграции не применялись)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=None):
+    """Применяет недостающие миграции по порядку; возвращает список применённых версий.
+
+    Каждая миграция выполняется в своей транзакции (BEGIN IMMEDIATE), поэтому
+    одновременный запуск из нескольких процессов применит её только один раз.
+    Версия сначала читается без блокировки записи: при актуальной схеме
+    подключение не ждет активного писателя.
+    """
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m[0])
+    current = get_schema_version(conn)
+    conn.commit()
+
+    applied = []
+    for version, description, steps in migrations:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+            applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
@@ -1,26 +1,75 @@
-from dataclasses import dataclass
-from datetime import datetime
+"""Модели данных
+
+Классы со __slots__: у объектов нет __dict__, поэтому массовая загрузка заказов
+занимает заметно меньше памяти. Frozen-варианты запрещают изменение атрибутов
+(список products у заказа при этом остается изменяемым).
+"""
+from dataclasses import MISSING, dataclass, field, fields, make_dataclass
+from types import SimpleNamespace
 from typing import List, Optional
 
-@dataclass
+
+@dataclass(slots=True)
 class Customer:
     id: int
     name: str
     email: str
     phone: str
 
-@dataclass
+
+@dataclass(slots=True)
 class Product:
     id: int
     name: str
     price: float
     quantity: int
 
-@dataclass
+
+@dataclass(slots=True)
+class OrderItem:
+    name: str
+    quantity: int
+    price: float
+
+
+@dataclass(slots=True)
 class Order:
+    # Порядок полей совпадает с колонками запросов заказов - объект строится прямо из строки
     id: int
     customer_id: int
-    products: List[dict]
     total_amount: float
     status: str
-    created_date: datetime
\ No newline at end of file
+    created_date: str
+    customer_name: Optional[str] = None
+    products: List[OrderItem] = field(default_factory=list)
+
+
+def _frozen(cls):
+    """Неизменяемая копия модели cls с именем Frozen<cls>"""
+    spec = []
+    for f in fields(cls):
+        if f.default_factory is not MISSING:
+            spec.append((f.name, f.type, field(default_factory=f.default_factory)))
+        elif f.default is not MISSING:
+            spec.append((f.name, f.type, field(default=f.default)))
+        else:
+            spec.append((f.name, f.type))
+    frozen = make_dataclass(f"Frozen{cls.__name__}", spec, slots=True, frozen=True)
+    # Для pickle класс должен находиться по имени в этом модуле
+    frozen.__module__ = __name__
+    return frozen
+
+
+FrozenCustomer = _frozen(Customer)
+FrozenProduct = _frozen(Product)
+FrozenOrderItem = _frozen(OrderItem)
+FrozenOrder = _frozen(Order)
+
+MODELS = SimpleNamespace(Customer=Customer, Product=Product, OrderItem=OrderItem, Order=Order)
+FROZEN_MODELS = SimpleNamespace(Customer=FrozenCustomer, Product=FrozenProduct,
+                                OrderItem=FrozenOrderItem, Order=FrozenOrder)
+
+
+def row_factory(cls):
+    """row_factory для курсора sqlite3: объект cls создается прямо из строки результата"""
+    return lambda cursor, row: cls(*row)
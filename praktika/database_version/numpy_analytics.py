@@ -0,0 +1,115 @@
+"""Распределение сумм заказов на NumPy
+
+Суммы заказов читаются из БД порциями сразу в массив NumPy, статистика и
+гистограмма считаются векторными операциями. Если NumPy не установлен,
+используется однопроходный вариант на чистом Python.
+"""
+import bisect
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Границы диапазонов сумм: [0, 1000), [1000, 5000), ..., [50000, inf)
+DEFAULT_EDGES = (0, 1000, 5000, 10000, 50000, math.inf)
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def bucket_label(low, high):
+    """Подпись диапазона в стиле консоли аналитики"""
+    if math.isinf(high):
+        return f"свыше {low:,.0f}"
+    if low == 0:
+        return f"до {high:,.0f}"
+    return f"{low:,.0f}-{high:,.0f}"
+
+
+def _values_query(status):
+    if status is None:
+        return "SELECT total_amount FROM orders", ()
+    return "SELECT total_amount FROM orders WHERE status = ?", (status,)
+
+
+def load_order_values(db, status='completed', chunk_size=100000):
+    """Суммы заказов в виде массива float64, чтение порциями через fetchmany"""
+    query, params = _values_query(status)
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks.append(np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows)))
+    if not chunks:
+        return np.empty(0, dtype=np.float64)
+    return np.concatenate(chunks)
+
+
+def _numpy_distribution(values, edges, percentiles):
+    edges_array = np.asarray(edges, dtype=np.float64)
+    # Номер диапазона [edges[i], edges[i + 1]) для каждой суммы
+    index = np.searchsorted(edges_array, values, side='right') - 1
+    inside = (index >= 0) & (index < len(edges) - 1)
+    counts = np.bincount(index[inside], minlength=len(edges) - 1)
+    return {
+        'count': int(values.size),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'percentiles': {p: float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))},
+        'histogram': [int(c) for c in counts],
+    }
+
+
+def _python_distribution(values, edges, percentiles):
+    values = sorted(values)
+    counts = [0] * (len(edges) - 1)
+    for value in values:
+        i = bisect.bisect_right(edges, value) - 1
+        if 0 <= i < len(counts):
+            counts[i] += 1
+
+    def percentile(p):
+        # Линейная интерполяция, как в numpy.percentile по умолчанию
+        position = (len(values) - 1) * p / 100
+        low = math.floor(position)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    return {
+        'count': len(values),
+        'min': values[0],
+        'max': values[-1],
+        'mean': math.fsum(values) / len(values),
+        'percentiles': {p: percentile(p) for p in percentiles},
+        'histogram': counts,
+    }
+
+
+def order_value_distribution(db, edges=DEFAULT_EDGES, percentiles=DEFAULT_PERCENTILES,
+                             status='completed', chunk_size=100000):
+    """Статистика сумм заказов: count, min, max, mean, percentiles и histogram.
+
+    histogram - список (нижняя граница, верхняя граница, количество) по edges.
+    Возвращает None, если подходящих заказов нет.
+    """
+    edges = tuple(edges)
+    if np is not None:
+        values = load_order_values(db, status, chunk_size)
+        if not values.size:
+            return None
+        result = _numpy_distribution(values, edges, percentiles)
+    else:
+        query, params = _values_query(status)
+        with db.connection() as conn:
+            values = [row[0] for row in conn.execute(query, params)]
+        if not values:
+            return None
+        result = _python_distribution(values, edges, percentiles)
+
+    result['histogram'] = [(edges[i], edges[i + 1], count) for i, count in enumerate(result['histogram'])]
+    return result
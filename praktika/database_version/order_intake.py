@@ -0,0 +1,112 @@
+"""Прием заказов с групповой фиксацией (group commit)
+
+Каждый create_order - отдельная транзакция со своим fsync, поэтому поток заказов
+упирается в число синхронизаций диска в секунду. OrderIntake принимает заказы из
+любых потоков и передает их одному потоку-писателю. Писатель собирает пакет: до
+max_batch заказов, но ждет новых не дольше max_latency секунд после первого, и
+создает весь пакет одной транзакцией через create_orders_bulk. Проверки клиента,
+товаров и остатков выполняются для каждого заказа отдельно, как в create_order:
+отклоненный заказ не мешает остальным. Результат (order_id, сообщение) каждый
+вызывающий получает через свой Future.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class OrderIntake:
+    """Очередь заказов с одним потоком-писателем и групповой фиксацией"""
+
+    def __init__(self, db, max_batch=64, max_latency=0.002):
+        if max_batch < 1:
+            raise ValueError("Размер пакета должен быть не меньше 1")
+        if max_latency < 0:
+            raise ValueError("Время ожидания пакета не может быть отрицательным")
+        self.db = db
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        # Зафиксировано пакетов и заказов в них (включая отклоненные проверкой)
+        self.batches = 0
+        self.orders = 0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="order-intake", daemon=True)
+        self._writer.start()
+
+    def submit(self, customer_id, products):
+        """Ставит заказ в очередь; Future вернет (order_id, сообщение), как create_order"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Прием заказов остановлен")
+            self._queue.put((future, customer_id, products))
+        return future
+
+    def create_order(self, customer_id, products, timeout=None):
+        """Блокирующий вариант submit"""
+        return self.submit(customer_id, products).result(timeout)
+
+    def _collect(self, first):
+        """Пакет, начинающийся с first; второй элемент - встречен ли сигнал остановки"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, stop = self._collect(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        # Отмененные до начала записи заказы не создаются
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.db.create_orders_bulk([(customer_id, products) for _, customer_id, products in batch])
+        except Exception:
+            # Пакет откатился целиком; по одному, чтобы ошибка досталась только своему заказу
+            for future, customer_id, products in batch:
+                try:
+                    future.set_result(self.db.create_order(customer_id, products))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.orders += len(batch)
+        for (future, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def close(self):
+        """Останавливает прием; заказы, уже стоящие в очереди, будут созданы"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._writer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
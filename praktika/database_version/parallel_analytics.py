@@ -0,0 +1,131 @@
+"""Параллельный расчет тяжелых отчетов по исходным таблицам
+
+Таблицы делятся на диапазоны id (orders - по id заказа, order_items - по id товара,
+чтобы использовать покрывающий индекс по product_id), частичные агрегаты считаются
+в пуле процессов на соединениях только для чтения (mode=ro) и затем сливаются.
+Границы диапазонов фиксируются в начале отчета, поэтому заказы, добавленные во
+время расчета, в отчет по месяцам не попадают.
+"""
+import os
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.request import pathname2url
+
+
+def _connect_ro(db_name):
+    uri = f"file:{pathname2url(os.path.abspath(db_name))}?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def _revenue_by_month_part(db_name, low, high):
+    conn = _connect_ro(db_name)
+    try:
+        rows = conn.execute('''
+            SELECT strftime('%Y-%m', created_date), SUM(total_amount)
+            FROM orders
+            WHERE id BETWEEN ? AND ? AND status = 'completed'
+            GROUP BY 1
+        ''', (low, high)).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def _orders_by_month_part(db_name, low, high):
+    conn = _connect_ro(db_name)
+    try:
+        rows = conn.execute('''
+            SELECT strftime('%Y-%m', created_date), COUNT(*)
+            FROM orders
+            WHERE id BETWEEN ? AND ?
+            GROUP BY 1
+        ''', (low, high)).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def _product_sales_part(db_name, low, high):
+    conn = _connect_ro(db_name)
+    try:
+        rows = conn.execute('''
+            SELECT product_id, SUM(quantity)
+            FROM order_items
+            WHERE product_id BETWEEN ? AND ?
+            GROUP BY product_id
+        ''', (low, high)).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+class ParallelAnalytics:
+    """Отчеты по orders/order_items, рассчитываемые в нескольких процессах"""
+
+    def __init__(self, db_name="orders.db", workers=None, partitions_per_worker=4):
+        self.db_name = db_name
+        self.workers = workers or os.cpu_count() or 1
+        self.partitions_per_worker = partitions_per_worker
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def _partitions(self, table):
+        """Диапазоны id таблицы примерно равного размера"""
+        conn = _connect_ro(self.db_name)
+        try:
+            low, high = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+        finally:
+            conn.close()
+        if low is None:
+            return []
+        count = self.workers * self.partitions_per_worker
+        step = max(1, (high - low + count) // count)
+        return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+    def _map(self, func, table):
+        ranges = self._partitions(table)
+        futures = [self._executor.submit(func, self.db_name, low, high) for low, high in ranges]
+        return [future.result() for future in futures]
+
+    def get_revenue_by_month(self):
+        """Выручка по месяцам (как DatabaseManager.get_revenue_by_month)"""
+        total = Counter()
+        for part in self._map(_revenue_by_month_part, 'orders'):
+            total.update(part)
+        return sorted(total.items())
+
+    def get_orders_by_month(self):
+        """Количество заказов по месяцам (как DatabaseManager.get_orders_by_month)"""
+        total = Counter()
+        for part in self._map(_orders_by_month_part, 'orders'):
+            total.update(part)
+        return sorted(total.items())
+
+    def get_popular_products(self, limit=5):
+        """Самые популярные товары (как DatabaseManager.get_popular_products)"""
+        total = Counter()
+        for part in self._map(_product_sales_part, 'products'):
+            total.update(part)
+        top = total.most_common(limit)
+        if not top:
+            return []
+
+        conn = _connect_ro(self.db_name)
+        try:
+            placeholders = ", ".join("?" * len(top))
+            names = dict(conn.execute(
+                f"SELECT id, name FROM products WHERE id IN ({placeholders})",
+                [product_id for product_id, _ in top]
+            ).fetchall())
+        finally:
+            conn.close()
+        return [(names[product_id], sold) for product_id, sold in top if product_id in names]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
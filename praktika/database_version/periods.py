@@ -0,0 +1,91 @@
+"""Разбиение диапазона времени [from, to) на периоды для аналитики
+
+Время заказов хранится в UTC, поэтому и границы периодов считаются в UTC.
+Неделя начинается с понедельника. Первый и последний периоды обрезаются
+границами диапазона, подпись периода - его календарное начало.
+"""
+import functools
+import json
+from datetime import date, datetime, timedelta, timezone
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+_LABELS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'week': '%Y-%m-%d', 'month': '%Y-%m'}
+
+
+def to_datetime(value):
+    """datetime, date или строка ISO ('2024-01-31', '2024-01-31 12:00:00') -> datetime без часового пояса"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(value)
+
+
+def to_epoch(value):
+    return int(to_datetime(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _period_start(moment, granularity):
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        return start - timedelta(days=start.weekday())
+    if granularity == 'month':
+        return start.replace(day=1)
+    return start
+
+
+def _next_period(start, granularity):
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(weeks=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+@functools.lru_cache(maxsize=256)
+def period_bounds(start, end, granularity):
+    """Подписи периодов и границы в секундах Unix: len(bounds) == len(labels) + 1.
+
+    Результат кэшируется: отчеты обычно запрашивают одни и те же диапазоны.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Неизвестная гранулярность: {granularity}. Доступны: {', '.join(GRANULARITIES)}")
+    start, end = to_datetime(start), to_datetime(end)
+    if end <= start:
+        return (), ()
+
+    labels = []
+    bounds = [to_epoch(start)]
+    period = _period_start(start, granularity)
+    while period < end:
+        labels.append(period.strftime(_LABELS[granularity]))
+        period = _next_period(period, granularity)
+        bounds.append(to_epoch(min(period, end)))
+    return tuple(labels), tuple(bounds)
+
+
+# Один проход по индексу на период; пустые периоды остаются в результате благодаря LEFT JOIN
+PERIOD_TOTALS_QUERY = '''
+    WITH bounds(i, t) AS (SELECT key, value FROM json_each(?)),
+    periods(i, start, stop) AS (SELECT a.i, a.t, b.t FROM bounds a JOIN bounds b ON b.i = a.i + 1)
+    SELECT COUNT(o.created_ts),
+           TOTAL(CASE WHEN o.status = 'completed' THEN o.total_amount END)
+    FROM periods p
+    LEFT JOIN orders o ON o.created_ts >= p.start AND o.created_ts < p.stop
+    GROUP BY p.i
+    ORDER BY p.i
+'''
+
+
+def period_totals(conn, start, end, granularity):
+    """(подпись, количество заказов, выручка завершенных заказов) по каждому периоду"""
+    labels, bounds = period_bounds(start, end, granularity)
+    if not labels:
+        return []
+    rows = conn.execute(PERIOD_TOTALS_QUERY, (json.dumps(bounds),)).fetchall()
+    return [(label, count, revenue) for label, (count, revenue) in zip(labels, rows)]
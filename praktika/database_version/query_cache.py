@@ -0,0 +1,153 @@
+"""Кэш результатов аналитических запросов
+
+Каждая запись запоминает "поколения" таблиц, от которых зависит результат.
+Методы записи DatabaseManager увеличивают поколения изменённых таблиц, и записи,
+построенные по старым данным, перестают считаться действительными.
+
+Записи других соединений и процессов (например, консоли управления) видны через
+PRAGMA data_version, как в catalog.ProductCatalog: перед чтением кэша значение
+сравнивается с последним увиденным в этом соединении, и при изменении устаревают
+все записи. TTL лишь дополнительно ограничивает время жизни записи.
+
+Вызывающий получает копию сохраненного результата и может изменять ее свободно.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def _copy(value):
+    """Копия списков и словарей результата; кортежи строк и значения неизменяемы и не копируются"""
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    return value
+
+
+class QueryCache:
+    """LRU-кэш с ограничением по размеру и времени жизни записей"""
+
+    def __init__(self, max_size=256, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        # Изменения БД другими соединениями; id(соединения) -> (соединение, data_version)
+        self._external = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'expirations': 0}
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def bump(self, *tables):
+        """Отмечает изменение таблиц"""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def sync(self, conn):
+        """Учитывает изменения БД, сделанные с прошлого обращения другими соединениями"""
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            seen = self._versions.get(id(conn))
+            self._versions[id(conn)] = (conn, version)
+            if seen is None or seen[1] != version:
+                self._external += 1
+
+    def _current(self, tables):
+        return (self._external, *(self._generations.get(table, 0) for table in tables))
+
+    def get(self, key, tables):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return _MISSING
+            value, generations, expires = entry
+            if generations != self._current(tables):
+                del self._entries[key]
+                self._stats['invalidations'] += 1
+                self._stats['misses'] += 1
+                return _MISSING
+            if self.ttl is not None and time.monotonic() > expires:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def generations(self, tables):
+        """Поколения таблиц; снимаются до выполнения запроса, чтобы не закэшировать устаревший результат"""
+        with self._lock:
+            return self._current(tables)
+
+    def put(self, key, value, generations):
+        with self._lock:
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, generations, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Счетчики попаданий, промахов и вытеснений"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['max_size'] = self.max_size
+            total = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / total if total else 0.0
+            return stats
+
+
+def cached(*tables):
+    """Кэширует результат метода DatabaseManager, зависящего от таблиц tables"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self.query_cache
+            if not cache.enabled:
+                return method(self, *args, **kwargs)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            with self.connection() as conn:
+                cache.sync(conn)
+                try:
+                    value = cache.get(key, tables)
+                except TypeError:
+                    # Нехэшируемые аргументы - кэш не используется
+                    return method(self, *args, **kwargs)
+                if value is not _MISSING:
+                    return _copy(value)
+                generations = cache.generations(tables)
+                value = method(self, *args, **kwargs)
+            cache.put(key, _copy(value), generations)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Отмечает таблицы tables измененными после вызова метода записи"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.query_cache.bump(*tables)
+        return wrapper
+    return decorator
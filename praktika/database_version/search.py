@@ -0,0 +1,108 @@
+"""Полнотекстовый поиск клиентов и товаров (SQLite FTS5)
+
+Индексы customers_fts и products_fts - external content: текст хранится только в
+исходных таблицах, индекс поддерживается триггерами. Триггер UPDATE срабатывает
+лишь при изменении индексируемых колонок, поэтому списание остатков товаров
+индекс не трогает. Каждое слово запроса ищется как префикс, совпадения
+упорядочены по bm25 (имя весит больше email и телефона).
+"""
+import re
+from contextlib import contextmanager
+
+# Таблица -> (индекс FTS5, индексируемые колонки, веса колонок для bm25)
+SEARCH_INDEXES = {
+    'customers': ('customers_fts', ('name', 'email', 'phone'), (10.0, 5.0, 1.0)),
+    'products': ('products_fts', ('name',), (1.0,)),
+}
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _index_sql(table):
+    index, columns, _ = SEARCH_INDEXES[table]
+    new = ", ".join(f"NEW.{column}" for column in columns)
+    old = ", ".join(f"OLD.{column}" for column in columns)
+    names = ", ".join(columns)
+    # remove_diacritics 2: "ё" и "е" совпадают; prefix - готовые индексы для коротких префиксов
+    table_sql = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+        {names}, content='{table}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    '''
+    triggers = [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{index}_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {index} (rowid, {names}) VALUES (NEW.id, {new});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{index}_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {index} ({index}, rowid, {names}) VALUES ('delete', OLD.id, {old});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{index}_update AFTER UPDATE OF {names} ON {table}
+        BEGIN
+            INSERT INTO {index} ({index}, rowid, {names}) VALUES ('delete', OLD.id, {old});
+            INSERT INTO {index} (rowid, {names}) VALUES (NEW.id, {new});
+        END
+        ''',
+    ]
+    return table_sql, triggers
+
+
+_SEARCH_SQL = [_index_sql(table) for table in SEARCH_INDEXES]
+SEARCH_TABLES = [table_sql for table_sql, _ in _SEARCH_SQL]
+SEARCH_TRIGGERS = [sql for _, triggers in _SEARCH_SQL for sql in triggers]
+SEARCH_TRIGGER_NAMES = [re.search(r"TRIGGER IF NOT EXISTS (\w+)", sql).group(1) for sql in SEARCH_TRIGGERS]
+
+
+def rebuild_search(conn):
+    """Полное перестроение поисковых индексов по исходным таблицам (вызывать внутри транзакции)"""
+    for index, _, _ in SEARCH_INDEXES.values():
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+
+@contextmanager
+def search_triggers_suspended(conn):
+    """Массовая загрузка или очистка без построчного обновления индексов (вызывать внутри транзакции).
+
+    После загрузки триггеры создаются заново, а индексы перестраиваются целиком.
+    """
+    for name in SEARCH_TRIGGER_NAMES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    yield
+    for sql in SEARCH_TRIGGERS:
+        conn.execute(sql)
+    rebuild_search(conn)
+
+
+def match_expression(text):
+    """Запрос MATCH из пользовательского ввода: все слова как префиксы; None, если слов нет.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе не интерпретируются.
+    """
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_query(table):
+    """SELECT строк table по MATCH с ранжированием и страницами: параметры (match, limit, offset).
+
+    Страница выбирается внутри индекса, строки исходной таблицы читаются только для нее.
+    """
+    index, _, weights = SEARCH_INDEXES[table]
+    return f'''
+        SELECT t.* FROM (
+            SELECT rowid, bm25({index}, {", ".join(map(str, weights))}) AS score FROM {index}
+            WHERE {index} MATCH ?
+            ORDER BY score, rowid
+            LIMIT ? OFFSET ?
+        ) f JOIN {table} t ON t.id = f.rowid
+        ORDER BY f.score, t.id
+    '''
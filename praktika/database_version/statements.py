@@ -0,0 +1,72 @@
+"""Реестр SQL-запросов одиночных CRUD-операций
+
+Модуль sqlite3 кэширует скомпилированные запросы в каждом соединении по тексту SQL
+(параметр cached_statements у sqlite3.connect). Соединения пула живут долго, поэтому
+запрос с неизменным текстом компилируется один раз на соединение. Текст частичного
+UPDATE определяется только набором изменяемых колонок (в порядке UPDATABLE_COLUMNS) и
+строится один раз: на таблицу из трех колонок приходится не больше 7 вариантов.
+Вариант "SET колонка = COALESCE(?, колонка)" для всех колонок сразу дал бы один текст,
+но заставил бы SQLite при каждом обновлении перезаписывать индексы всех колонок
+(например, уникальный индекс email).
+"""
+import functools
+
+# Колонки, изменяемые update_customer/update_product, в порядке параметров
+UPDATABLE_COLUMNS = {
+    'customers': ('name', 'email', 'phone'),
+    'products': ('name', 'price', 'quantity'),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def update_statement(table, columns):
+    """Текст UPDATE таблицы для набора колонок columns (кортеж)"""
+    return f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?"
+
+
+def canonical_update(table, record_id, values):
+    """(SQL, параметры) частичного UPDATE; None, если ни одно поле не передано.
+
+    Поля со значением None не изменяются.
+    """
+    columns = tuple(column for column in UPDATABLE_COLUMNS[table] if values.get(column) is not None)
+    if not columns:
+        return None
+    return update_statement(table, columns), [values[column] for column in columns] + [record_id]
+
+
+STATEMENTS = {
+    'insert_customer': "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?)",
+    'customer_by_id': "SELECT * FROM customers WHERE id = ?",
+    'customer_exists': "SELECT id FROM customers WHERE id = ?",
+    'customer_orders_count': "SELECT COUNT(*) FROM orders WHERE customer_id = ?",
+    'delete_customer': "DELETE FROM customers WHERE id = ?",
+
+    'insert_product': "INSERT INTO products (name, price, quantity) VALUES (?, ?, ?)",
+    'product_by_id': "SELECT * FROM products WHERE id = ?",
+    'product_price_stock': "SELECT price, quantity FROM products WHERE id = ?",
+    'reserve_stock': "UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?",
+    'restock': "UPDATE products SET quantity = quantity + ? WHERE id = ?",
+    'product_items_count': "SELECT COUNT(*) FROM order_items WHERE product_id = ?",
+    'delete_product': "DELETE FROM products WHERE id = ?",
+
+    'insert_order': "INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
+    'insert_order_item': '''
+        INSERT INTO order_items (order_id, product_id, quantity, unit_price, line_total) VALUES (?, ?, ?, ?, ?)
+    ''',
+    'order_transitions': "SELECT from_status, to_status, restock FROM order_status_transitions",
+    # Статус меняется, только если переход из текущего статуса разрешен
+    'transition_order_status': '''
+        UPDATE orders SET status = ?1
+        WHERE id = ?2 AND EXISTS (
+            SELECT 1 FROM order_status_transitions WHERE from_status = orders.status AND to_status = ?1
+        )
+    ''',
+    # Товары отмененного заказа уже возвращены на склад
+    'order_reserved_items': '''
+        SELECT oi.product_id, oi.quantity FROM order_items oi JOIN orders o ON o.id = oi.order_id
+        WHERE oi.order_id = ? AND o.status != 'cancelled'
+    ''',
+    'delete_order_items': "DELETE FROM order_items WHERE order_id = ?",
+    'delete_order': "DELETE FROM orders WHERE id = ?",
+}
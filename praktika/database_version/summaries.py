@@ -0,0 +1,189 @@
+"""Сводные таблицы для аналитики
+
+Таблицы stats_* хранят готовые агрегаты и поддерживаются триггерами на orders и
+order_items, поэтому любые изменения (включая другие процессы) учитываются сразу.
+"""
+import re
+from contextlib import contextmanager
+
+SUMMARY_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS stats_product_sales (
+        product_id INTEGER PRIMARY KEY,
+        total_sold INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_stats_product_sales_sold ON stats_product_sales (total_sold)",
+    '''
+    CREATE TABLE IF NOT EXISTS stats_customer_spend (
+        customer_id INTEGER PRIMARY KEY,
+        completed_count INTEGER NOT NULL DEFAULT 0,
+        completed_total REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_stats_customer_spend_total ON stats_customer_spend (completed_total)",
+    '''
+    CREATE TABLE IF NOT EXISTS stats_monthly (
+        month TEXT PRIMARY KEY,
+        order_count INTEGER NOT NULL DEFAULT 0,
+        completed_count INTEGER NOT NULL DEFAULT 0,
+        completed_revenue REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_status (
+        status TEXT PRIMARY KEY,
+        order_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0
+    )
+    ''',
+]
+
+
+def _order_delta(row, sign):
+    """Операторы, добавляющие (sign='+') или вычитающие (sign='-') вклад заказа row (NEW/OLD)"""
+    one = f"{sign}1"
+    amount = f"{sign}{row}.total_amount"
+    completed = f"({row}.status = 'completed')"
+    return f'''
+        INSERT INTO stats_status (status, order_count, total_amount)
+        VALUES ({row}.status, {one}, {amount})
+        ON CONFLICT (status) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_amount = total_amount + excluded.total_amount;
+
+        INSERT INTO stats_monthly (month, order_count, completed_count, completed_revenue)
+        VALUES (strftime('%Y-%m', {row}.created_date), {one},
+                {sign}{completed}, CASE WHEN {completed} THEN {amount} ELSE 0 END)
+        ON CONFLICT (month) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            completed_count = completed_count + excluded.completed_count,
+            completed_revenue = completed_revenue + excluded.completed_revenue;
+
+        INSERT INTO stats_customer_spend (customer_id, completed_count, completed_total)
+        SELECT {row}.customer_id, {one}, {amount}
+        WHERE {completed}
+        ON CONFLICT (customer_id) DO UPDATE SET
+            completed_count = completed_count + excluded.completed_count,
+            completed_total = completed_total + excluded.completed_total;
+    '''
+
+
+def _item_delta(row, sign):
+    return f'''
+        INSERT INTO stats_product_sales (product_id, total_sold)
+        VALUES ({row}.product_id, {sign}{row}.quantity)
+        ON CONFLICT (product_id) DO UPDATE SET
+            total_sold = total_sold + excluded.total_sold;
+    '''
+
+
+SUMMARY_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_orders_insert AFTER INSERT ON orders
+    BEGIN
+        {_order_delta('NEW', '+')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_orders_delete AFTER DELETE ON orders
+    BEGIN
+        {_order_delta('OLD', '-')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_orders_update
+    AFTER UPDATE OF customer_id, total_amount, status, created_date ON orders
+    BEGIN
+        {_order_delta('OLD', '-')}
+        {_order_delta('NEW', '+')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_items_insert AFTER INSERT ON order_items
+    BEGIN
+        {_item_delta('NEW', '+')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_items_delete AFTER DELETE ON order_items
+    BEGIN
+        {_item_delta('OLD', '-')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_items_update AFTER UPDATE OF product_id, quantity ON order_items
+    BEGIN
+        {_item_delta('OLD', '-')}
+        {_item_delta('NEW', '+')}
+    END
+    ''',
+]
+
+SUMMARY_TRIGGER_NAMES = [re.search(r"TRIGGER IF NOT EXISTS (\w+)", sql).group(1) for sql in SUMMARY_TRIGGERS]
+
+# Запросы, вычисляющие содержимое сводных таблиц по исходным данным
+SUMMARY_SOURCES = {
+    'stats_product_sales': '''
+        SELECT product_id, SUM(quantity)
+        FROM order_items
+        GROUP BY product_id
+    ''',
+    'stats_customer_spend': '''
+        SELECT customer_id, COUNT(*), SUM(total_amount)
+        FROM orders
+        WHERE status = 'completed'
+        GROUP BY customer_id
+    ''',
+    'stats_monthly': '''
+        SELECT strftime('%Y-%m', created_date), COUNT(*),
+               SUM(status = 'completed'),
+               TOTAL(CASE WHEN status = 'completed' THEN total_amount END)
+        FROM orders
+        GROUP BY 1
+    ''',
+    'stats_status': '''
+        SELECT status, COUNT(*), SUM(total_amount)
+        FROM orders
+        GROUP BY status
+    ''',
+}
+
+
+def rebuild_summaries(conn):
+    """Полный пересчет сводных таблиц (вызывать внутри транзакции)"""
+    for table, source in SUMMARY_SOURCES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} {source}")
+
+
+@contextmanager
+def summary_triggers_suspended(conn):
+    """Массовая загрузка без построчных триггеров (вызывать внутри транзакции).
+
+    Триггеры удаляются, после загрузки создаются заново и сводные таблицы
+    пересчитываются целиком. При откате транзакции триггеры восстанавливаются.
+    """
+    for name in SUMMARY_TRIGGER_NAMES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    yield
+    for sql in SUMMARY_TRIGGERS:
+        conn.execute(sql)
+    rebuild_summaries(conn)
+
+
+def check_summaries(conn, tolerance=0.01):
+    """Сравнивает сводные таблицы с пересчетом; возвращает список расхождений"""
+    problems = []
+    for table, source in SUMMARY_SOURCES.items():
+        expected = {row[0]: row[1:] for row in conn.execute(source)}
+        actual = {row[0]: row[1:] for row in conn.execute(f"SELECT * FROM {table}")}
+        for key in sorted(set(expected) | set(actual), key=str):
+            exp = expected.get(key)
+            act = actual.get(key)
+            # Строки с нулевыми значениями равнозначны отсутствующим
+            if exp is None and act is not None and not any(act):
+                continue
+            if exp is None or act is None or any(abs((a or 0) - (e or 0)) > tolerance for a, e in zip(act, exp)):
+                problems.append((table, key, exp, act))
+    return problems
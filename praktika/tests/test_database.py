@@ -1,8 +1,12 @@
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), 'database_version'))
+import re
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database_version'))
 
 from database import DatabaseManager
+from migrations import MIGRATIONS, get_schema_version, migrate
+from models import OrderItem
+from statements import STATEMENTS
 
 def test_database_operations():
     """Тестирование операций с базой данных"""
@@ -52,5 +56,1185 @@ def test_database_operations():
 
     print("\n🎉 Все тесты пройдены успешно!")
 
+
+def test_connection_pool_reuses_connections(tmp_path):
+    """Пул выдает одни и те же соединения, а не открывает новые на каждый вызов"""
+    db = DatabaseManager(str(tmp_path / "pool.db"), pool_size=2)
+
+    customer_id = db.add_customer("Клиент", "pool@example.com", "")
+    for _ in range(50):
+        assert db.get_customer_by_id(customer_id).email == "pool@example.com"
+
+    stats = db.pool.stats()
+    assert stats['created'] == 1
+    assert stats['in_use'] == 0
+
+    # Вложенный запрос в том же потоке получает то же соединение
+    with db.connection() as outer:
+        with db.connection() as inner:
+            assert inner is outer
+    db.close()
+
+
+def test_partial_updates_use_canonical_statements(tmp_path):
+    """Частичный UPDATE меняет только переданные поля, текст запроса зависит только от их набора"""
+    import pytest
+    from statements import canonical_update
+
+    db = DatabaseManager(str(tmp_path / "statements.db"), cached_statements=16)
+    assert db.pool.cached_statements == 16
+    customer_id = db.add_customer("Клиент", "old@example.com", "+7000")
+    product_id = db.add_product("Товар", 100, 5)
+
+    assert db.update_customer(customer_id, email="new@example.com")
+    assert db.update_customer(customer_id, name="", phone="+7111")
+    assert not db.update_customer(customer_id)
+    customer = db.get_customer_by_id(customer_id)
+    assert (customer.name, customer.email, customer.phone) == ("Клиент", "new@example.com", "+7111")
+
+    assert db.update_product(product_id, quantity=0)
+    assert db.update_product(product_id, price=250.0)
+    product = db.get_product_by_id(product_id)
+    assert (product.name, product.price, product.quantity) == ("Товар", 250.0, 0)
+
+    # Один и тот же объект строки для одного набора колонок, порядок аргументов не важен
+    first = canonical_update('customers', 1, {'phone': "1", 'name': "a"})
+    second = canonical_update('customers', 2, {'name': "b", 'phone': "2"})
+    assert first[0] is second[0]
+    assert first[1] == ["a", "1", 1]
+    db.close()
+
+    with pytest.raises(ValueError):
+        DatabaseManager(str(tmp_path / "statements.db"), cached_statements=-1)
+
+
+def test_search_customers_and_products(tmp_path):
+    """FTS5-поиск: префиксы, ранжирование, страницы и синхронизация триггерами"""
+    db = DatabaseManager(str(tmp_path / "search.db"))
+    anna = db.add_customer("Anna Petrova", "anna@example.com", "+79001112233")
+    petr = db.add_customer("Петр Сидоров", "petrova.fan@example.com", "+79005556677")
+    for i in range(25):
+        db.add_product(f"Ноутбук Модель {i}", 1000 + i, 5)
+    mouse = db.add_product("Мышь беспроводная", 500, 5)
+
+    # Совпадение в имени весит больше, чем в email; регистр не важен
+    assert [c.id for c in db.search_customers("PETROV")] == [anna, petr]
+    assert [c.id for c in db.search_customers("79005")] == [petr]
+    assert [c.id for c in db.search_customers("anna petr")] == [anna]
+    assert db.search_customers('" OR *') == []
+
+    first = db.search_products("ноут", limit=20)
+    second = db.search_products("ноут", limit=20, offset=20)
+    assert len(first) == 20 and len(second) == 5
+    assert not {p.id for p in first} & {p.id for p in second}
+
+    # Индексы следуют за изменениями, списание остатков их не затрагивает
+    db.update_customer(anna, name="Анна Смирнова")
+    assert [c.id for c in db.search_customers("смирн")] == [anna]
+    assert [c.id for c in db.search_customers("petrov")] == [petr]
+    order_id, _ = db.create_order(anna, [{'product_id': mouse, 'quantity': 1}])
+    assert [p.id for p in db.search_products("беспров")] == [mouse]
+    db.delete_order(order_id)
+    db.delete_product(mouse)
+    assert db.search_products("мышь") == []
+
+    db.clear_database()
+    assert db.search_customers("анна") == []
+    db.fill_test_data(customers=20, products=10, orders=0)
+    assert db.search_customers(db.get_customer_by_id(1).email.split("@")[0])[0].id == 1
+    with db.connection() as conn:
+        conn.execute("INSERT INTO customers_fts (customers_fts) VALUES ('integrity-check')")
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('integrity-check')")
+    db.close()
+
+
+def test_connection_pool_threads(tmp_path):
+    """Потоки получают разные соединения, пул не превышает заданный размер"""
+    import threading
+
+    db = DatabaseManager(str(tmp_path / "pool_threads.db"), pool_size=3)
+    product_id = db.add_product("Товар", 100, 10)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(100):
+                assert db.get_product_by_id(product_id).price == 100
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert db.pool.stats()['created'] <= 3
+    db.close()
+
+
+def test_get_all_orders_groups_products(tmp_path):
+    """Товары распределяются по своим заказам"""
+    db = DatabaseManager(str(tmp_path / "orders.db"))
+    customer_id = db.add_customer("Клиент", "orders@example.com", "")
+    first = db.add_product("Первый", 100, 10)
+    second = db.add_product("Второй", 250, 10)
+
+    order_a, _ = db.create_order(customer_id, [{'product_id': first, 'quantity': 2}])
+    order_b, _ = db.create_order(customer_id, [{'product_id': first, 'quantity': 1},
+                                               {'product_id': second, 'quantity': 3}])
+
+    orders = {o.id: o for o in db.get_all_orders()}
+    assert orders[order_a].products == [OrderItem("Первый", 2, 100)]
+    assert orders[order_b].products == [OrderItem("Первый", 1, 100), OrderItem("Второй", 3, 250)]
+    assert orders[order_b].total_amount == 850
+    assert orders[order_b].customer_name == "Клиент"
+
+    without_products = db.get_all_orders(with_products=False)
+    assert all(o.products == [] for o in without_products)
+    db.close()
+
+
+def test_models_are_slotted_and_optionally_frozen(tmp_path):
+    """Модели без __dict__; frozen_models=True запрещает изменение атрибутов"""
+    import dataclasses
+    import pytest
+
+    db = DatabaseManager(str(tmp_path / "models.db"))
+    customer_id = db.add_customer("Клиент", "models@example.com", "")
+    product_id = db.add_product("Товар", 100, 10)
+    db.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}])
+
+    order = db.get_all_orders()[0]
+    for obj in (order, order.products[0], db.get_customer_by_id(customer_id), db.get_product_by_id(product_id)):
+        assert not hasattr(obj, '__dict__')
+    order.status = 'completed'
+
+    frozen = DatabaseManager(db.db_name, frozen_models=True)
+    frozen_order = frozen.get_all_orders()[0]
+    assert dataclasses.asdict(frozen_order) == dataclasses.asdict(db.get_all_orders()[0])
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        frozen_order.status = 'completed'
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        frozen.get_customer_by_id(customer_id).name = "Другое имя"
+    assert frozen.get_customer_by_id(999) is None
+    frozen.close()
+    db.close()
+
+
+def test_iterators_match_full_listing(tmp_path):
+    """Постраничные итераторы возвращают те же записи, что и get_all_*"""
+    db = DatabaseManager(str(tmp_path / "iter.db"))
+    customer_ids = [db.add_customer(f"Клиент {i}", f"c{i}@example.com", "") for i in range(7)]
+    product_ids = [db.add_product(f"Товар {i}", 10 * (i + 1), 100) for i in range(5)]
+    for i in range(11):
+        db.create_order(customer_ids[i % 7], [{'product_id': product_ids[i % 5], 'quantity': 1},
+                                              {'product_id': product_ids[(i + 1) % 5], 'quantity': 2}])
+
+    assert list(db.iter_customers(batch_size=3)) == db.get_all_customers()
+    assert list(db.iter_products(batch_size=2)) == db.get_all_products()
+
+    # Все заказы созданы в одну секунду: порядок внутри страницы определяется id
+    paged = list(db.iter_orders(batch_size=4))
+    assert [o.id for o in paged] == list(range(11, 0, -1))
+    full = {o.id: o for o in db.get_all_orders()}
+    assert all(order == full[order.id] for order in paged)
+    db.close()
+
+
+def test_iter_orders_includes_orders_without_date(tmp_path):
+    """Заказы с created_date = NULL не теряются и идут последними, на любой границе страниц"""
+    db = DatabaseManager(str(tmp_path / "iter_null.db"))
+    customer_id = db.add_customer("Клиент", "null@example.com", "")
+    product_id = db.add_product("Товар", 10, 100)
+    for _ in range(11):
+        db.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}])
+    with db.connection() as conn:
+        conn.execute("UPDATE orders SET created_date = NULL WHERE id IN (2, 5, 9)")
+        conn.commit()
+
+    expected = [11, 10, 8, 7, 6, 4, 3, 1, 9, 5, 2]
+    for batch_size in range(1, 13):
+        assert [o.id for o in db.iter_orders(batch_size=batch_size)] == expected, batch_size
+    db.close()
+
+
+def test_create_orders_bulk(tmp_path):
+    """Пакетное создание: по результату на заказ, остатки учитываются между заказами"""
+    db = DatabaseManager(str(tmp_path / "bulk.db"))
+    customer_id = db.add_customer("Клиент", "bulk@example.com", "")
+    product_id = db.add_product("Товар", 100, 5)
+    existing_id, _ = db.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}])
+
+    results = db.create_orders_bulk([
+        (customer_id, [{'product_id': product_id, 'quantity': 2}]),
+        (999, [{'product_id': product_id, 'quantity': 1}]),
+        (customer_id, [{'product_id': 999, 'quantity': 1}]),
+        (customer_id, [{'product_id': product_id, 'quantity': 3}]),
+        (customer_id, [{'product_id': product_id, 'quantity': 1}, {'product_id': product_id, 'quantity': 1}]),
+    ])
+
+    assert results[0] == (existing_id + 1, "Заказ успешно создан")
+    assert results[1] == (None, "Клиент не найден")
+    assert results[2] == (None, "Товар с ID 999 не найден")
+    assert results[3] == (None, "Недостаточно товара с ID 1. Доступно: 2")
+    assert results[4] == (existing_id + 2, "Заказ успешно создан")
+
+    assert db.get_product_by_id(product_id).quantity == 0
+    orders = {o.id: o for o in db.get_all_orders()}
+    assert orders[existing_id + 1].total_amount == 200
+    assert len(orders[existing_id + 2].products) == 2
+    # Новые заказы после пакета получают следующие id
+    next_id, _ = db.create_order(customer_id, [])
+    assert next_id == existing_id + 3
+    db.close()
+
+
+def test_create_order_rejects_insufficient_stock(tmp_path):
+    """Неудачный заказ не списывает остатки и не создает записей"""
+    db = DatabaseManager(str(tmp_path / "stock.db"))
+    customer_id = db.add_customer("Клиент", "stock@example.com", "")
+    first = db.add_product("Первый", 100, 5)
+    second = db.add_product("Второй", 100, 1)
+
+    order_id, message = db.create_order(customer_id, [{'product_id': first, 'quantity': 3},
+                                                      {'product_id': second, 'quantity': 2}])
+    assert order_id is None
+    assert message == f"Недостаточно товара с ID {second}. Доступно: 1"
+    assert db.get_product_by_id(first).quantity == 5
+    assert db.get_orders_count() == 0
+    db.close()
+
+
+def test_update_order_statuses_state_machine(tmp_path):
+    """Пакетная смена статусов: только pending -> completed/cancelled, отмена возвращает товары"""
+    db = DatabaseManager(str(tmp_path / "statuses.db"))
+    customer_id = db.add_customer("Клиент", "statuses@example.com", "")
+    product_id = db.add_product("Товар", 100, 10)
+    first, second, third = [db.create_order(customer_id, [{'product_id': product_id, 'quantity': 2}])[0]
+                            for _ in range(3)]
+    assert db.get_product_by_id(product_id).quantity == 4
+
+    results = db.update_order_statuses([
+        (first, 'completed'),
+        (second, 'cancelled'),
+        (second, 'completed'),
+        (first, 'pending'),
+        (999, 'completed'),
+        (third, 'shipped'),
+    ])
+    assert [success for success, _ in results] == [True, True, False, False, False, False]
+    assert results[2][1] == "Недопустимая смена статуса: cancelled -> completed"
+    assert results[4][1] == "Заказ не найден"
+
+    statuses = {order.id: order.status for order in db.get_all_orders(with_products=False)}
+    assert statuses == {first: 'completed', second: 'cancelled', third: 'pending'}
+    assert db.get_product_by_id(product_id).quantity == 6
+
+    # Одиночный вызов подчиняется тем же правилам
+    assert not db.update_order_status(first, 'cancelled')
+    assert db.update_order_status(third, 'cancelled')
+    assert db.get_product_by_id(product_id).quantity == 8
+
+    # Товары отмененного заказа не возвращаются повторно при удалении
+    assert db.delete_order(second)[0]
+    assert db.get_product_by_id(product_id).quantity == 8
+    assert db.check_summaries() == []
+    db.close()
+
+
+def test_order_intake_group_commit(tmp_path):
+    """Заказы из многих потоков создаются пакетами, каждый получает свой результат"""
+    import threading
+    import pytest
+    from order_intake import OrderIntake
+
+    db = DatabaseManager(str(tmp_path / "intake.db"))
+    customer_id = db.add_customer("Клиент", "intake@example.com", "")
+    product_id = db.add_product("Товар", 100, 30)
+
+    results = []
+    lock = threading.Lock()
+    with OrderIntake(db, max_batch=16, max_latency=0.05) as intake:
+        def client():
+            for _ in range(5):
+                result = intake.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}])
+                with lock:
+                    results.append(result)
+
+        threads = [threading.Thread(target=client) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # Проверки выполняются для каждого заказа отдельно
+        unknown = intake.submit(999, [{'product_id': product_id, 'quantity': 1}])
+        malformed = intake.submit(customer_id, [{'product_id': product_id}])
+        assert unknown.result() == (None, "Клиент не найден")
+        with pytest.raises(KeyError):
+            malformed.result()
+
+    created = [order_id for order_id, _ in results if order_id]
+    assert len(created) == 30 and len(set(created)) == 30
+    assert [message for order_id, message in results if not order_id] == \
+        [f"Недостаточно товара с ID {product_id}. Доступно: 0"] * 10
+    assert db.get_product_by_id(product_id).quantity == 0
+    assert db.get_orders_count() == 30
+    assert intake.batches < intake.orders
+    with pytest.raises(RuntimeError):
+        intake.submit(customer_id, [])
+    db.close()
+
+
+def test_product_catalog_write_through(tmp_path):
+    """Каталог товаров: изменения этого процесса переносятся в него, чужие - сбрасывают его"""
+    db = DatabaseManager(str(tmp_path / "catalog.db"), catalog=True)
+    other = DatabaseManager(db.db_name)
+    customer_id = db.add_customer("Клиент", "catalog@example.com", "")
+    first = db.add_product("Первый", 100, 10)
+    second = db.add_product("Второй", 250, 3)
+
+    assert db.get_product_by_id(first) == other.get_product_by_id(first)
+    loads = db.catalog.stats()['loads']
+
+    order_id, _ = db.create_order(customer_id, [{'product_id': first, 'quantity': 4},
+                                                {'product_id': second, 'quantity': 1}])
+    assert db.create_order(customer_id, [{'product_id': second, 'quantity': 1},
+                                         {'product_id': second, 'quantity': 2}]) == \
+        (None, f"Недостаточно товара с ID {second}. Доступно: 1")
+    assert db.create_orders_bulk([(customer_id, [{'product_id': first, 'quantity': 1}])])[0][0]
+    assert db.update_product(second, price=300)
+    assert db.update_order_status(order_id, 'cancelled')
+    third = db.add_product("Третий", 50, 1)
+    assert db.delete_product(third)[0]
+
+    # Все изменения записаны в каталог без перезагрузки и совпадают с БД
+    assert db.get_all_products() == other.get_all_products()
+    assert db.get_product_by_id(first).quantity == 9
+    assert db.get_product_by_id(third) is None
+    assert db.catalog.stats()['loads'] == loads
+
+    # Запись другого соединения обнаруживается через data_version
+    other.update_product(first, quantity=42)
+    assert db.get_product_by_id(first).quantity == 42
+    stats = db.catalog.stats()
+    assert stats['invalidations'] >= 1 and stats['loads'] == loads + 1
+    assert stats['size'] == 2 and stats['memory_bytes'] > 0 and 0 < stats['hit_rate'] < 1
+
+    db.clear_database()
+    assert db.get_all_products() == []
+    other.close()
+    db.close()
+
+
+def test_delete_order_restocks_once(tmp_path):
+    """Отмена и удаление заказа, параллельные удаления - товары возвращаются один раз"""
+    import threading
+
+    db = DatabaseManager(str(tmp_path / "delete_order.db"))
+    customer_id = db.add_customer("Клиент", "delete@example.com", "")
+    product_id = db.add_product("Товар", 100, 10)
+
+    cancelled, _ = db.create_order(customer_id, [{'product_id': product_id, 'quantity': 3}])
+    assert db.update_order_status(cancelled, 'cancelled')
+    assert db.delete_order(cancelled) == (True, "Заказ удален")
+    assert db.get_product_by_id(product_id).quantity == 10
+
+    pending, _ = db.create_order(customer_id, [{'product_id': product_id, 'quantity': 4}])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(db.delete_order(pending))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(success for success, _ in results) == [False, False, False, True]
+    assert db.get_product_by_id(product_id).quantity == 10
+    assert db.delete_order(pending) == (False, "Заказ не найден")
+    db.close()
+
+
+def test_concurrent_orders_never_oversell(tmp_path):
+    """Несколько процессов одновременно раскупают товар без ухода остатка в минус"""
+    from benchmarks import run_order_writers
+
+    db = DatabaseManager(str(tmp_path / "oversell.db"))
+    customer_id = db.add_customer("Клиент", "race@example.com", "")
+    product_id = db.add_product("Дефицит", 100, 50)
+
+    created = run_order_writers(db.db_name, customer_id, product_id, writers=4, attempts=30)
+
+    assert sum(created) == 50
+    assert db.get_product_by_id(product_id).quantity == 0
+    assert db.get_orders_count() == 50
+    assert db.get_popular_products() == [("Дефицит", 50)]
+    db.close()
+
+
+def test_benchmark_suite_covers_hot_paths(tmp_path):
+    """Набор бенчмарков замеряет все горячие пути и сравнивает прогоны"""
+    import json
+    from benchmarks import SUITE_ANALYTICS, compare_results, run_suite
+
+    results = run_suite([300], ops=5, max_seconds=0.05, directory=str(tmp_path))
+    cases = results['sizes']['300']
+    for name in ['add_customer', 'delete_customer', 'create_order', 'get_all_orders',
+                 'update_order_status', 'delete_order'] + SUITE_ANALYTICS:
+        assert cases[name]['iterations'] > 0, name
+        assert cases[name]['p50_ms'] <= cases[name]['p99_ms'] <= cases[name]['max_ms']
+    assert results['meta']['sqlite']
+
+    baseline = json.loads(json.dumps(results))
+    baseline['sizes']['300']['get_orders_count']['p50_ms'] /= 10
+    regressions = [row[1] for row in compare_results(baseline, results) if row[5]]
+    assert regressions == ['get_orders_count']
+
+
+def test_pragma_profiles(tmp_path):
+    """Профиль применяется к каждому соединению пула"""
+    import pytest
+
+    db = DatabaseManager(str(tmp_path / "throughput.db"), profile="throughput")
+    with db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+    db.close()
+
+    with pytest.raises(ValueError):
+        DatabaseManager(str(tmp_path / "bad.db"), profile="fastest")
+    with pytest.raises(ValueError):
+        DatabaseManager(str(tmp_path / "bad.db"), profile={'synchronous': 'OFF; DROP TABLE orders'})
+
+
+def test_wal_readers_not_blocked_by_writer(tmp_path):
+    """В режиме WAL чтение идет, пока другой процесс держит транзакцию записи"""
+    path = str(tmp_path / "wal.db")
+    writer = DatabaseManager(path)
+    reader = DatabaseManager(path, profile={'journal_mode': 'WAL', 'busy_timeout': 100})
+    writer.add_product("Товар", 100, 1)
+
+    with writer.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO products (name, price, quantity) VALUES ('Новый', 1, 1)")
+        # Незафиксированная запись не видна, но и не блокирует читателя
+        assert reader.get_products_count() == 1
+        conn.commit()
+
+    assert reader.get_products_count() == 2
+    writer.close()
+    reader.close()
+
+
+def test_summary_tables_follow_writes(tmp_path):
+    """Сводные таблицы совпадают с пересчетом после любых изменений заказов"""
+    import random
+
+    db = DatabaseManager(str(tmp_path / "summaries.db"))
+    rng = random.Random(7)
+    customer_ids = [db.add_customer(f"Клиент {i}", f"s{i}@example.com", "") for i in range(5)]
+    product_ids = [db.add_product(f"Товар {i}", 100 * (i + 1), 1000) for i in range(6)]
+
+    order_ids = []
+    for _ in range(30):
+        items = [{'product_id': rng.choice(product_ids), 'quantity': rng.randint(1, 3)}
+                 for _ in range(rng.randint(1, 3))]
+        order_id, _ = db.create_order(rng.choice(customer_ids), items)
+        order_ids.append(order_id)
+    db.create_orders_bulk([(customer_ids[0], [{'product_id': product_ids[0], 'quantity': 2}])] * 5)
+    for order_id in order_ids[:20]:
+        db.update_order_status(order_id, rng.choice(['completed', 'cancelled', 'pending']))
+    for order_id in order_ids[20:25]:
+        db.delete_order(order_id)
+
+    assert db.check_summaries() == []
+
+    with db.connection() as conn:
+        expected_revenue = conn.execute(
+            "SELECT TOTAL(total_amount) FROM orders WHERE status = 'completed'").fetchone()[0]
+        expected_avg = conn.execute(
+            "SELECT AVG(total_amount) FROM orders WHERE status != 'cancelled'").fetchone()[0]
+        expected_by_month = conn.execute(
+            "SELECT strftime('%Y-%m', created_date), COUNT(*) FROM orders GROUP BY 1").fetchall()
+    assert db.get_total_revenue() == expected_revenue
+    assert abs(db.get_average_order_value() - expected_avg) < 1e-6
+    assert db.get_orders_count() == 30
+    assert db.get_orders_by_month() == expected_by_month
+
+    # Порча сводной таблицы обнаруживается и исправляется пересчетом
+    with db.connection() as conn:
+        conn.execute("UPDATE stats_status SET order_count = order_count + 1")
+        conn.commit()
+    assert db.check_summaries()
+    assert db.rebuild_summaries()[0]
+    assert db.check_summaries() == []
+
+    db.clear_database()
+    assert db.get_orders_count() == 0
+    assert db.get_popular_products() == []
+    db.close()
+
+
+def test_dashboard_snapshot(tmp_path):
+    """Снимок статистики совпадает с отдельными аналитическими методами"""
+    db = DatabaseManager(str(tmp_path / "dashboard.db"))
+    empty = db.get_dashboard_snapshot()
+    assert empty['orders_count'] == 0 and empty['top_order'] is None
+
+    db.fill_test_data()
+    db.update_order_status(20, 'cancelled')
+    snapshot = db.get_dashboard_snapshot()
+    orders = db.get_all_orders(with_products=False)
+
+    assert snapshot['orders_count'] == db.get_orders_count() == len(orders)
+    assert snapshot['customers_count'] == db.get_customers_count()
+    assert snapshot['products_count'] == db.get_products_count()
+    assert snapshot['total_revenue'] == db.get_total_revenue()
+    assert snapshot['average_order_value'] == db.get_average_order_value()
+    for status, count in snapshot['status_counts'].items():
+        assert count == len([o for o in orders if o.status == status])
+    assert snapshot['top_order']['total_amount'] == max(o.total_amount for o in orders)
+    db.close()
+
+
+def test_query_cache_invalidated_by_writes(tmp_path):
+    """Кэш аналитики отдает сохраненный результат до записи в зависимые таблицы"""
+    db = DatabaseManager(str(tmp_path / "cache.db"), cache_size=2, cache_ttl=None)
+    customer_id = db.add_customer("Клиент", "cache@example.com", "")
+    product_id = db.add_product("Товар", 100, 10)
+
+    assert db.get_orders_count() == 0
+    assert db.get_orders_count() == 0
+    stats = db.query_cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+    # Запись в другие таблицы не сбрасывает результат
+    db.add_customer("Другой", "other@example.com", "")
+    assert db.get_orders_count() == 0
+    assert db.query_cache.stats()['hits'] == 2
+
+    db.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}])
+    assert db.get_orders_count() == 1
+    assert db.query_cache.stats()['invalidations'] == 1
+
+    # Размер ограничен: самая старая запись вытесняется
+    db.get_customers_count()
+    db.get_products_count()
+    assert db.query_cache.stats()['evictions'] == 1
+    assert db.query_cache.stats()['size'] == 2
+    db.close()
+
+
+def test_query_cache_sees_other_connections(tmp_path):
+    """Запись через другое соединение (консоль управления в другом процессе) сбрасывает кэш без TTL"""
+    path = str(tmp_path / "cache_shared.db")
+    db = DatabaseManager(path, cache_size=8, cache_ttl=None)
+    crud = DatabaseManager(path)
+
+    assert db.get_customers_count() == 0
+    assert db.get_customers_count() == 0
+    crud.add_customer("Клиент", "shared@example.com", "")
+    assert db.get_customers_count() == 1
+    assert db.get_customers_count() == 1
+    stats = db.query_cache.stats()
+    assert (stats['hits'], stats['invalidations']) == (2, 1)
+
+    # Вызывающий получает копию: ее изменение не портит кэш
+    snapshot = db.get_dashboard_snapshot()
+    snapshot['status_counts']['completed'] = 100
+    db.get_orders_by_month().append(("2000-01", 1))
+    assert db.get_dashboard_snapshot()['status_counts']['completed'] == 0
+    assert db.get_orders_by_month() == []
+    crud.close()
+    db.close()
+
+
+def test_query_cache_ttl(tmp_path):
+    """Записи с истекшим сроком жизни не используются"""
+    import time
+
+    db = DatabaseManager(str(tmp_path / "cache_ttl.db"), cache_size=8, cache_ttl=0.05)
+    db.get_products_count()
+    time.sleep(0.1)
+    db.get_products_count()
+    stats = db.query_cache.stats()
+    assert (stats['hits'], stats['expirations']) == (0, 1)
+    db.close()
+
+
+def test_async_database_manager(tmp_path):
+    """Асинхронные методы дают те же результаты, что и синхронные"""
+    import asyncio
+    from async_database import AsyncDatabaseManager
+
+    async def scenario():
+        async with AsyncDatabaseManager(str(tmp_path / "async.db"), readers=2) as db:
+            customer_ids = await asyncio.gather(
+                *(db.add_customer(f"Клиент {i}", f"a{i}@example.com", "") for i in range(5)))
+            product_id = await db.add_product("Товар", 100, 100)
+            results = await asyncio.gather(
+                *(db.create_order(customer_id, [{'product_id': product_id, 'quantity': 2}])
+                  for customer_id in customer_ids))
+            assert all(order_id for order_id, _ in results)
+
+            assert await db.get_orders_count() == 5
+            assert (await db.get_product_by_id(product_id)).quantity == 90
+            assert await db.get_popular_products() == [("Товар", 10)]
+            ids = [order.id async for order in db.iter_orders(batch_size=2)]
+            assert sorted(ids) == sorted(order_id for order_id, _ in results)
+
+    asyncio.run(scenario())
+
+
+def test_async_cancelled_write_is_not_applied(tmp_path):
+    """Отмененная до начала выполнения запись не попадает в БД"""
+    import asyncio
+    import contextlib
+    import threading
+    from async_database import AsyncDatabaseManager
+
+    async def scenario():
+        async with AsyncDatabaseManager(str(tmp_path / "async_cancel.db")) as db:
+            customer_id = await db.add_customer("Клиент", "cancel@example.com", "")
+            product_id = await db.add_product("Товар", 100, 10)
+
+            # Занимаем поток записи, чтобы следующая операция ждала в очереди
+            release = threading.Event()
+            blocker = asyncio.ensure_future(db._run(db._writer, release.wait))
+            pending = asyncio.ensure_future(
+                db.create_order(customer_id, [{'product_id': product_id, 'quantity': 1}]))
+            await asyncio.sleep(0.05)
+            pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await pending
+            release.set()
+            await blocker
+
+            assert await db.get_orders_count() == 0
+            assert (await db.get_product_by_id(product_id)).quantity == 10
+
+    asyncio.run(scenario())
+
+
+def test_async_iteration_cancelled_mid_page(tmp_path):
+    """Отмена async for во время чтения страницы дает CancelledError, генератор закрывается после чтения"""
+    import asyncio
+    import pytest
+    import threading
+    from async_database import AsyncDatabaseManager
+
+    reading, release, closed = threading.Event(), threading.Event(), threading.Event()
+
+    def slow_pages(batch_size=500):
+        try:
+            yield "первая страница"
+            # Чтение следующей страницы блокирует поток до release
+            reading.set()
+            release.wait(5)
+            yield "вторая страница"
+        finally:
+            closed.set()
+
+    async def scenario():
+        async with AsyncDatabaseManager(str(tmp_path / "async_iter.db"), readers=1) as db:
+            db.db.iter_customers = slow_pages
+            seen = []
+
+            async def consume():
+                async for item in db.iter_customers():
+                    seen.append(item)
+
+            task = asyncio.ensure_future(consume())
+            while not reading.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert seen == ["первая страница"] and not closed.is_set()
+
+            release.set()
+            assert await asyncio.get_running_loop().run_in_executor(None, closed.wait, 5)
+            assert await db.get_customers_count() == 0
+
+    asyncio.run(scenario())
+
+
+def test_parallel_analytics_matches_database(tmp_path):
+    """Параллельные отчеты совпадают с результатами DatabaseManager"""
+    from parallel_analytics import ParallelAnalytics
+
+    db = DatabaseManager(str(tmp_path / "parallel.db"))
+    db.fill_test_data()
+
+    with ParallelAnalytics(db.db_name, workers=2, partitions_per_worker=3) as engine:
+        assert engine.get_orders_by_month() == db.get_orders_by_month()
+        revenue = engine.get_revenue_by_month()
+        expected = db.get_revenue_by_month()
+        assert [month for month, _ in revenue] == [month for month, _ in expected]
+        assert all(abs(a[1] - b[1]) < 1e-6 for a, b in zip(revenue, expected))
+        assert sorted(s for _, s in engine.get_popular_products(3)) == \
+            sorted(s for _, s in db.get_popular_products(3))
+    db.close()
+
+
+def test_order_value_distribution(tmp_path):
+    """Векторный расчет совпадает с вариантом на чистом Python"""
+    import math
+    import random
+    from numpy_analytics import (DEFAULT_EDGES, DEFAULT_PERCENTILES, _python_distribution,
+                                 bucket_label, order_value_distribution)
+
+    db = DatabaseManager(str(tmp_path / "distribution.db"))
+    assert order_value_distribution(db) is None
+
+    rng = random.Random(5)
+    values = [float(rng.choice([500, 1000, 4999.5, 7000, 20000, 50000, 120000])) for _ in range(200)]
+    with db.connection() as conn:
+        conn.executemany("INSERT INTO orders (customer_id, total_amount, status) VALUES (1, ?, 'completed')",
+                         [(v,) for v in values])
+        conn.execute("INSERT INTO orders (customer_id, total_amount, status) VALUES (1, 1e9, 'cancelled')")
+        conn.commit()
+
+    result = order_value_distribution(db)
+    expected = _python_distribution(values, DEFAULT_EDGES, DEFAULT_PERCENTILES)
+    assert result['count'] == 200
+    assert (result['min'], result['max']) == (expected['min'], expected['max'])
+    assert math.isclose(result['mean'], expected['mean'])
+    for p in DEFAULT_PERCENTILES:
+        assert math.isclose(result['percentiles'][p], expected['percentiles'][p])
+    assert [count for _, _, count in result['histogram']] == expected['histogram']
+    # Границы: нижняя включается, верхняя нет
+    assert result['histogram'][1] == (1000, 5000, values.count(1000) + values.count(4999.5))
+
+    custom = order_value_distribution(db, edges=(0, 10000, math.inf), status=None)
+    assert [count for _, _, count in custom['histogram']] == [
+        len([v for v in values if v < 10000]), len([v for v in values if v >= 10000]) + 1]
+    assert [bucket_label(lo, hi) for lo, hi, _ in custom['histogram']] == ["до 10,000", "свыше 10,000"]
+    db.close()
+
+
+def test_columnar_export_matches_database(tmp_path):
+    """Аналитика по колоночному экспорту совпадает с SQLite, импорт восстанавливает данные"""
+    import math
+    from columnar import import_columnar
+
+    db = DatabaseManager(str(tmp_path / "source.db"))
+    db.fill_test_data()
+    db.add_customer("Клиент «Юникод» ✓", "u@example.com", None)
+    manifest = db.export_columnar(str(tmp_path / "columns"))
+    assert manifest['tables']['orders']['rows'] == db.get_orders_count()
+
+    methods = ['get_orders_count', 'get_customers_count', 'get_products_count', 'get_orders_by_month']
+    expected = {name: getattr(db, name)() for name in methods}
+    best_customer = db.get_best_customer()
+    top_customers = db.get_top_customers()
+    revenue = db.get_revenue_by_month()
+    popular = db.get_popular_products(3)
+    snapshot = db.get_dashboard_snapshot()
+
+    db.attach_columnar(str(tmp_path / "columns"))
+    for name in methods:
+        assert getattr(db, name)() == expected[name], name
+    assert db.get_best_customer()[0] == best_customer[0]
+    assert math.isclose(db.get_best_customer()[1], best_customer[1])
+    assert [(n, round(v, 6)) for n, v in db.get_top_customers()] == [(n, round(v, 6)) for n, v in top_customers]
+    assert math.isclose(db.get_total_revenue(), snapshot['total_revenue'])
+    assert math.isclose(db.get_average_order_value(), snapshot['average_order_value'])
+    assert [m for m, _ in db.get_revenue_by_month()] == [m for m, _ in revenue]
+    assert sorted(s for _, s in db.get_popular_products(3)) == sorted(s for _, s in popular)
+    columnar_snapshot = db.get_dashboard_snapshot()
+    assert columnar_snapshot['status_counts'] == snapshot['status_counts']
+    assert columnar_snapshot['top_order']['total_amount'] == snapshot['top_order']['total_amount']
+    db.detach_columnar()
+    assert db.get_orders_count() == expected['get_orders_count']
+
+    target = DatabaseManager(str(tmp_path / "target.db"))
+    success, message = import_columnar(str(tmp_path / "columns"), target)
+    assert success, message
+    assert target.get_all_orders() == db.get_all_orders()
+    assert [c.name for c in target.get_all_customers()] == [c.name for c in db.get_all_customers()]
+    assert target.get_revenue_by_month() == revenue
+    assert not import_columnar(str(tmp_path / "columns"), target)[0]
+    db.close()
+    target.close()
+
+
+def test_columnar_round_trip_keeps_nulls(tmp_path):
+    """NULL в product_id, created_date и строках переживает экспорт и импорт и не мешает аналитике"""
+    from columnar import import_columnar
+
+    db = DatabaseManager(str(tmp_path / "source.db"))
+    db.fill_test_data(customers=10, products=5, orders=30)
+    db.add_customer("Без телефона", "nophone@example.com", None)
+    with db.connection() as conn:
+        conn.execute("UPDATE order_items SET product_id = NULL WHERE id IN (1, 2)")
+        conn.execute("UPDATE orders SET created_date = NULL WHERE id IN (3, 4)")
+        # -1 - обычное значение, а не NULL
+        conn.execute("UPDATE products SET quantity = -1 WHERE id = 1")
+        conn.commit()
+        dated_orders = conn.execute("SELECT COUNT(*) FROM orders WHERE created_date IS NOT NULL").fetchone()[0]
+        sold = dict(conn.execute('''
+            SELECT p.name, SUM(oi.quantity) FROM order_items oi JOIN products p ON p.id = oi.product_id
+            GROUP BY p.id
+        '''))
+
+    manifest = db.export_columnar(str(tmp_path / "columns"))
+    assert manifest['tables']['customers']['columns']['phone']['nulls']
+    assert 'nulls' not in manifest['tables']['customers']['columns']['name']
+    assert manifest['tables']['order_items']['columns']['product_id']['nulls']
+    assert 'nulls' not in manifest['tables']['products']['columns']['quantity']
+
+    db.attach_columnar(str(tmp_path / "columns"))
+    assert sum(count for _, count in db.get_orders_by_month()) == dated_orders
+    assert all(sold[name] == total for name, total in db.get_popular_products(5))
+    db.get_revenue_by_month()
+    db.detach_columnar()
+
+    target = DatabaseManager(str(tmp_path / "target.db"))
+    success, message = import_columnar(str(tmp_path / "columns"), target)
+    assert success, message
+    queries = ["SELECT * FROM order_items ORDER BY id",
+               "SELECT id, customer_id, total_amount, status, created_date FROM orders ORDER BY id",
+               "SELECT * FROM customers ORDER BY id", "SELECT * FROM products ORDER BY id"]
+    with db.connection() as source_conn, target.connection() as target_conn:
+        for sql in queries:
+            assert target_conn.execute(sql).fetchall() == source_conn.execute(sql).fetchall(), sql
+        assert target_conn.execute("SELECT COUNT(*) FROM order_items WHERE product_id IS NULL").fetchone()[0] == 2
+        assert target_conn.execute("SELECT COUNT(*) FROM orders WHERE created_date IS NULL").fetchone()[0] == 2
+        assert target_conn.execute("SELECT COUNT(*) FROM customers WHERE phone IS NULL").fetchone()[0] == 1
+    db.close()
+    target.close()
+
+
+def test_period_analytics(tmp_path):
+    """Заказы и выручка за [from, to) по часам, дням, неделям и месяцам, пустые периоды заполнены"""
+    import math
+    import pytest
+    from collections import Counter
+    from datetime import date, datetime, timedelta
+
+    db = DatabaseManager(str(tmp_path / "periods.db"))
+    db.fill_test_data(customers=20, products=10, orders=500)
+    orders = db.get_all_orders(with_products=False)
+    created = [datetime.fromisoformat(order.created_date) for order in orders]
+
+    start, end = datetime(2024, 2, 10, 6, 30), datetime(2024, 5, 1)
+    inside = [(moment, order) for moment, order in zip(created, orders) if start <= moment < end]
+    for granularity, key in (('hour', lambda m: m.strftime('%Y-%m-%d %H:00')),
+                             ('day', lambda m: m.strftime('%Y-%m-%d')),
+                             ('week', lambda m: (m.date() - timedelta(days=m.weekday())).isoformat()),
+                             ('month', lambda m: m.strftime('%Y-%m'))):
+        by_period = db.get_orders_by_period(start, end, granularity)
+        expected = Counter(key(moment) for moment, _ in inside)
+        assert {label: count for label, count in by_period if count} == expected, granularity
+        # Периоды идут подряд без пропусков
+        assert [label for label, _ in by_period] == sorted(label for label, _ in by_period)
+        assert len(by_period) >= len(expected)
+    assert db.get_orders_by_period(start, end, 'week')[0][0] == "2024-02-05"
+    assert len(db.get_orders_by_period("2024-01-01", "2024-01-02", 'hour')) == 24
+
+    revenue = dict(db.get_revenue_by_period(start, end, 'month'))
+    assert math.isclose(revenue["2024-03"], sum(o.total_amount for m, o in inside
+                                                if o.status == 'completed' and m.month == 3))
+    assert db.get_orders_by_period(date(2030, 1, 1), date(2030, 3, 1), 'month') == [("2030-01", 0), ("2030-02", 0)]
+    assert db.get_orders_by_period(end, start) == []
+    with pytest.raises(ValueError):
+        db.get_orders_by_period(start, end, 'year')
+
+    # Колоночный экспорт дает те же периоды
+    expected_orders = db.get_orders_by_period(start, end, 'day')
+    expected_revenue = db.get_revenue_by_period(start, end, 'week')
+    db.export_columnar(str(tmp_path / "columns"))
+    db.attach_columnar(str(tmp_path / "columns"))
+    assert db.get_orders_by_period(start, end, 'day') == expected_orders
+    assert all(label == other and math.isclose(a, b, abs_tol=1e-6) for (label, a), (other, b)
+               in zip(db.get_revenue_by_period(start, end, 'week'), expected_revenue))
+    db.close()
+
+
+def test_data_generator_is_deterministic(tmp_path):
+    """Одинаковый seed дает одинаковые данные при любом числе процессов"""
+    from collections import Counter
+    from data_generator import generate_data
+
+    def dump(db):
+        with db.connection() as conn:
+            return [conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+                    for table in ('customers', 'products', 'orders', 'order_items')]
+
+    single = DatabaseManager(str(tmp_path / "single.db"))
+    report = generate_data(single, customers=300, products=100, orders=25000, seed=7)
+    sharded = DatabaseManager(str(tmp_path / "sharded.db"))
+    generate_data(sharded, customers=300, products=100, orders=25000, seed=7, shards=2)
+    other = DatabaseManager(str(tmp_path / "other.db"))
+    generate_data(other, customers=300, products=100, orders=100, seed=8)
+
+    assert dump(single) == dump(sharded)
+    assert dump(single)[2][:100] != dump(other)[2]
+    assert report['orders'] == 25000 and report['rows_per_sec'] > 0
+    assert report['rows'] == 300 + 100 + 25000 + report['order_items']
+
+    customers, products, orders, items = dump(single)
+    # Даты растут вместе с id, сезонный пик - в декабре
+    dates = [order[4] for order in orders]
+    assert dates == sorted(dates)
+    months = Counter(date[5:7] for date in dates)
+    assert months['12'] > months['02']
+    # Ципф: самый популярный товар продается заметно чаще среднего
+    sales = Counter(item[2] for item in items)
+    assert sales.most_common(1)[0][1] > 5 * len(items) / len(products)
+    statuses = Counter(order[3] for order in orders)
+    assert statuses['completed'] > statuses['pending'] > statuses['cancelled']
+
+    # Сводные таблицы пересчитаны, триггеры восстановлены
+    assert single.check_summaries() == []
+    single.create_order(1, [{'product_id': 1, 'quantity': 1}])
+    assert single.check_summaries() == []
+    for db in (single, sharded, other):
+        db.close()
+
+
+def test_data_generator_reserves_stock_and_respects_sequence(tmp_path):
+    """Сгенерированные заказы списывают остатки; id из sqlite_sequence не используются повторно"""
+    from data_generator import generate_data
+
+    db = DatabaseManager(str(tmp_path / "generated_stock.db"))
+    generate_data(db, customers=50, products=10, orders=2000, seed=3)
+    with db.connection() as conn:
+        on_hand = dict(conn.execute("SELECT id, quantity FROM products"))
+        reserved = dict(conn.execute('''
+            SELECT oi.product_id, SUM(oi.quantity) FROM order_items oi JOIN orders o ON o.id = oi.order_id
+            WHERE o.status != 'cancelled' GROUP BY oi.product_id
+        '''))
+        order_ids = [row[0] for row in conn.execute("SELECT id FROM orders ORDER BY id")]
+    assert min(on_hand.values()) >= 0
+
+    # Отмена и удаление возвращают ровно списанное: запас равен начальному, а не больше
+    pending = [order.id for order in db.get_all_orders(with_products=False) if order.status == 'pending']
+    assert all(success for success, _ in db.update_order_statuses([(order_id, 'cancelled') for order_id in pending]))
+    for order_id in order_ids:
+        assert db.delete_order(order_id)[0]
+    assert {product.id: product.quantity for product in db.get_all_products()} == \
+        {product_id: quantity + reserved.get(product_id, 0) for product_id, quantity in on_hand.items()}
+
+    # Последние заказы удалены, но новые id продолжают последовательность AUTOINCREMENT
+    generate_data(db, customers=5, products=2, orders=10, seed=4)
+    with db.connection() as conn:
+        assert conn.execute("SELECT MIN(id) FROM orders").fetchone()[0] == order_ids[-1] + 1
+        assert conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'orders'").fetchone()[0] == order_ids[-1] + 10
+    assert db.check_summaries() == []
+    db.close()
+
+
+def test_instrumentation_snapshot(tmp_path):
+    """Профилирование считает методы, запросы, строки и пишет медленные запросы с планом"""
+    from instrumentation import Instrumentation
+
+    assert DatabaseManager(str(tmp_path / "plain.db")).instrumentation is None
+
+    db = DatabaseManager(str(tmp_path / "instrumented.db"), instrument=Instrumentation(slow_threshold=0.0))
+    customer_id = db.add_customer("Клиент", "profile@example.com", "")
+    for _ in range(3):
+        db.get_customer_by_id(customer_id)
+    assert len(list(db.iter_customers(batch_size=1))) == 1
+    db.get_orders_count()
+
+    snapshot = db.instrumentation.snapshot()
+    assert snapshot['methods']['get_customer_by_id']['count'] == 3
+    assert snapshot['methods']['iter_customers']['count'] == 1
+    assert 'connection' not in snapshot['methods']
+    select = snapshot['statements']["SELECT * FROM customers WHERE id = ?"]
+    assert select['count'] == 3 and select['rows'] == 3
+    assert select['p50_ms'] <= select['p99_ms'] <= select['max_ms']
+    assert snapshot['connection_wait']['count'] >= 5
+
+    slow = [entry for entry in snapshot['slow_queries'] if entry['sql'] == "SELECT * FROM customers WHERE id = ?"]
+    assert slow and any('PRIMARY KEY' in step for step in slow[-1]['plan'])
+
+    db.instrumentation.reset()
+    assert db.instrumentation.snapshot()['methods'] == {}
+    db.close()
+
+
+def test_percentile_nearest_rank():
+    """Перцентиль по ближайшему рангу: наименьшее значение, не меньше которого p% выборки"""
+    from instrumentation import percentile
+
+    ten = list(range(1, 11))
+    assert [percentile(ten, p) for p in (50, 90, 99)] == [5, 9, 10]
+    hundred = list(range(1, 101))
+    assert [percentile(hundred, p) for p in (50, 90, 99)] == [50, 90, 99]
+    assert [percentile([7], p) for p in (0, 50, 100)] == [7, 7, 7]
+    assert percentile(ten, 0) == 1 and percentile(ten, 100) == 10
+    assert percentile([1, 2, 3], 50) == 2 and percentile([1, 2], 50) == 1
+
+
+def test_migrations_are_idempotent(tmp_path):
+    """Повторный запуск не применяет миграции заново, старая БД обновляется"""
+    import sqlite3
+
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    # Схема до появления миграций
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+                 "email TEXT UNIQUE NOT NULL, phone TEXT)")
+    conn.execute("INSERT INTO customers (name, email, phone) VALUES ('Старый', 'old@example.com', '')")
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(path)
+    latest = max(m[0] for m in MIGRATIONS)
+    with db.connection() as conn:
+        assert get_schema_version(conn) == latest
+        assert migrate(conn) == []
+    assert db.get_customers_count() == 1
+
+    # При актуальной схеме новое подключение не ждет блокировки записи
+    writer = sqlite3.connect(path, timeout=0)
+    writer.execute("BEGIN IMMEDIATE")
+    other = DatabaseManager(path, profile={'busy_timeout': 0})
+    assert other.get_customers_count() == 1
+    writer.rollback()
+    writer.close()
+    other.close()
+    db.close()
+
+
+def test_order_lines_keep_price_at_order_time(tmp_path):
+    """Позиции хранят цену на момент заказа; миграция заполняет цены старых позиций"""
+    import sqlite3
+
+    db = DatabaseManager(str(tmp_path / "lines.db"))
+    customer_id = db.add_customer("Клиент", "lines@example.com", "")
+    product_id = db.add_product("Товар", 100, 10)
+    order_id, _ = db.create_order(customer_id, [{'product_id': product_id, 'quantity': 2}])
+    db.create_orders_bulk([(customer_id, [{'product_id': product_id, 'quantity': 1}])])
+    db.update_product(product_id, price=150)
+
+    orders = {order.id: order for order in db.get_all_orders()}
+    assert orders[order_id].products == [OrderItem("Товар", 2, 100)]
+    assert [order.products for order in db.iter_orders(1)] == [order.products for order in db.get_all_orders()]
+    with db.connection() as conn:
+        assert conn.execute("SELECT line_total FROM order_items WHERE order_id = ?", (order_id,)).fetchone()[0] == 200
+
+        # Названия читаются только для товаров из позиций, а не всей таблицей
+        db.add_product("Не заказанный товар", 1, 1)
+        executed = []
+        conn.set_trace_callback(executed.append)
+        db.get_all_orders()
+        conn.set_trace_callback(None)
+    product_reads = [sql for sql in executed if "FROM products" in sql]
+    assert product_reads and all("WHERE id IN" in sql for sql in product_reads)
+    db.close()
+
+    # БД до появления цен в позициях: цены восстанавливаются по сумме заказа
+    path = str(tmp_path / "lines_legacy.db")
+    conn = sqlite3.connect(path)
+    migrate(conn, [m for m in MIGRATIONS if m[0] < 7])
+    conn.execute("INSERT INTO customers (name, email, phone) VALUES ('Клиент', 'legacy@example.com', '')")
+    conn.executemany("INSERT INTO products (name, price, quantity) VALUES (?, ?, 10)", [("A", 120), ("B", 50)])
+    conn.execute("INSERT INTO orders (customer_id, total_amount) VALUES (1, 200)")
+    conn.execute("INSERT INTO orders (customer_id, total_amount) VALUES (1, 300)")
+    conn.executemany("INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)",
+                     [(1, 1, 2), (2, 1, 1), (2, 2, 2)])
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(path)
+    with db.connection() as conn:
+        lines = conn.execute("SELECT order_id, unit_price, line_total FROM order_items ORDER BY id").fetchall()
+        totals = conn.execute('''SELECT o.total_amount, SUM(oi.line_total) FROM orders o
+                                 JOIN order_items oi ON oi.order_id = o.id GROUP BY o.id''').fetchall()
+    assert lines[0] == (1, 100.0, 200.0)
+    assert all(abs(total - lines_total) < 1e-9 for total, lines_total in totals)
+    db.close()
+
+
+# Таблицы, растущие вместе с данными (и их псевдонимы в запросах): чтение только по индексу
+INDEXED_TABLES = {'orders', 'o', 'order_items', 'oi', 'stats_customer_spend', 'stats_product_sales', 's'}
+
+# Упорядоченные списки, которым разрешен обход индекса (SCAN ... USING INDEX) вместо SEARCH
+ORDERED_SCANS = {
+    'get_all_orders': "полный список заказов по created_date с позициями всех заказов",
+    'get_dashboard_snapshot': "самый крупный заказ: индекс total_amount читается с конца до первого заказа с клиентом",
+}
+
+
+def _statement_params(sql):
+    """Параметры-заглушки для запроса из STATEMENTS (? или ?N)"""
+    numbered = [int(n) for n in re.findall(r"\?(\d+)", sql)]
+    return (1,) * (max(numbered) if numbered else sql.count("?"))
+
+
+def _assert_indexed(conn, sql, params=(), ordered_scan=False):
+    """Большие таблицы читаются поиском по индексу; ordered_scan - допустим и обход индекса по порядку"""
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    for detail in plan:
+        words = detail.split()
+        if words[0] not in ("SCAN", "SEARCH") or words[1] not in INDEXED_TABLES:
+            continue
+        if words[0] == "SEARCH":
+            assert ("INDEX" in detail or "PRIMARY KEY" in detail) and "AUTOMATIC" not in detail, (sql, plan)
+        else:
+            assert ordered_scan and " USING " in detail and "INDEX" in detail, (sql, plan)
+    if ordered_scan:
+        # Порядок дает индекс, а не сортировка всех строк (досортировка внутри группы допустима)
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, (sql, plan)
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    """Точечные и диапазонные запросы ищут по индексу; обход индекса - только у списков из ORDERED_SCANS"""
+    db = DatabaseManager(str(tmp_path / "plans.db"), pool_size=1)
+    db.fill_test_data(customers=20, products=10, orders=50)
+    workload = {
+        'get_popular_products': db.get_popular_products,
+        'get_average_order_value': db.get_average_order_value,
+        'get_total_revenue': db.get_total_revenue,
+        'get_orders_count': db.get_orders_count,
+        'get_best_customer': db.get_best_customer,
+        'get_top_customers': db.get_top_customers,
+        'get_orders_by_month': db.get_orders_by_month,
+        'get_revenue_by_month': db.get_revenue_by_month,
+        'get_dashboard_snapshot': db.get_dashboard_snapshot,
+        'get_period_totals': lambda: db.get_period_totals("2024-01-01", "2024-02-01"),
+        'get_orders_by_customer': lambda: db.get_orders_by_customer(1),
+        'get_all_orders': db.get_all_orders,
+        'iter_orders': lambda: list(db.iter_orders(batch_size=10)),
+        'update_order_statuses': lambda: db.update_order_statuses([(1, 'cancelled')]),
+    }
+    assert set(ORDERED_SCANS) <= set(workload)
+    with db.connection() as conn:
+        for sql in STATEMENTS.values():
+            _assert_indexed(conn, sql, _statement_params(sql))
+
+        # Реально выполняемые запросы (со сводными таблицами) - через трассировку соединения
+        for name, call in workload.items():
+            executed = []
+            conn.set_trace_callback(executed.append)
+            try:
+                call()
+            finally:
+                conn.set_trace_callback(None)
+            queries = [sql for sql in dict.fromkeys(executed) if sql.split()[0].upper() in ("SELECT", "WITH", "UPDATE")]
+            assert queries, name
+            for sql in queries:
+                _assert_indexed(conn, sql, ordered_scan=name in ORDERED_SCANS)
+    db.close()
+
+
+def test_connection_pool_rollback_on_error(tmp_path):
+    """Незавершенная транзакция откатывается при исключении"""
+    import pytest
+
+    db = DatabaseManager(str(tmp_path / "pool_rollback.db"), pool_size=1)
+    with pytest.raises(RuntimeError):
+        with db.connection() as conn:
+            conn.execute("INSERT INTO products (name, price, quantity) VALUES ('X', 1, 1)")
+            raise RuntimeError("сбой")
+
+    assert db.get_products_count() == 0
+    db.close()
+
 if __name__ == "__main__":
     test_database_operations()
\ No newline at end of file